@@ -0,0 +1,134 @@
+"""
+Chat-completions agent engine (AGENT_ENGINE=chat).
+
+Instead of the Assistants API (thread create, message create, assistant
+create, run create, N run polls, message list), each model step is a single
+streamed chat-completions call with function calling. Conversation history
+lives in a ConversationStore keyed by thread_id (in-process, or in the shared
+state backend) and is compacted to a token budget before every turn (see
+history.py), so there is no polling loop at all.
+"""
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from agent_fixed import (AGENT_INSTRUCTIONS, AGENT_MODEL, ASSISTANT_TOOLS, TOOL_FUNCTIONS, AgentRequest,
+                         AgentResponse, openai_client, run_tool, start_knowledge_prefetch, state)
+from conversation_store import ConversationStore
+from history import ConversationHistory
+from metrics import stage_timer
+from tracing import current_trace_id, span
+
+MAX_MODEL_STEPS = 10
+
+# Histories are shared through the state backend when it is networked, so turns can land on any worker
+conversation_store = ConversationStore(state=None if state.name == "memory" else state)
+
+
+def stream_model_step(messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Run one streamed chat-completions call and assemble the reply and tool calls"""
+    stream = openai_client.chat.completions.create(
+        model=AGENT_MODEL,
+        messages=messages,
+        tools=ASSISTANT_TOOLS,
+        stream=True,
+    )
+
+    content_parts = []
+    tool_calls: Dict[int, Dict[str, Any]] = {}
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content_parts.append(delta.content)
+        # Tool calls arrive as fragments keyed by index; names and arguments are concatenated
+        for fragment in delta.tool_calls or []:
+            call = tool_calls.setdefault(fragment.index, {
+                "id": None, "type": "function", "function": {"name": "", "arguments": ""},
+            })
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function:
+                if fragment.function.name:
+                    call["function"]["name"] += fragment.function.name
+                if fragment.function.arguments:
+                    call["function"]["arguments"] += fragment.function.arguments
+
+    return "".join(content_parts), [tool_calls[i] for i in sorted(tool_calls)]
+
+
+async def process_agent_request_chat(request: AgentRequest, collection, embedding_model, synthesize_answer_func,
+                                     count_tokens_func: Callable[[str], int],
+                                     traceparent: Optional[str] = None, instructions: Optional[str] = None,
+                                     knowledge_scope: Optional[str] = None) -> AgentResponse:
+    """Process agent request with streamed chat completions and local conversation history"""
+    with span("agent.turn", traceparent=traceparent, engine="chat", new_thread=not request.thread_id) as turn:
+        prefetch = start_knowledge_prefetch(request.message, collection, embedding_model, request.priority)
+        try:
+            thread_id = request.thread_id or ConversationStore.new_thread_id()
+            history = conversation_store.get(thread_id, lambda: ConversationHistory(count_tokens_func))
+            new_messages: List[Dict[str, Any]] = [{"role": "user", "content": request.message}]
+            actions_performed = []
+            reply = None
+
+            # Make room for the new message; the turn is only added to the history once it completes
+            dropped = history.compact(reserve_tokens=count_tokens_func(request.message))
+            context = [{"role": "system", "content": instructions or AGENT_INSTRUCTIONS}] + history.context()
+
+            for step in range(MAX_MODEL_STEPS):
+                messages = context + new_messages
+                with stage_timer("openai", "chat.completions"), span("openai.chat.completions", step=step,
+                                                                    history_tokens=history.tokens):
+                    # The client and its stream are blocking; keep them off the event loop
+                    content, tool_calls = await asyncio.get_running_loop().run_in_executor(
+                        None, stream_model_step, messages)
+
+                if not tool_calls:
+                    reply = content
+                    new_messages.append({"role": "assistant", "content": content})
+                    break
+
+                new_messages.append({"role": "assistant", "content": content or None, "tool_calls": tool_calls})
+                for call in tool_calls:
+                    function_name = call["function"]["name"]
+                    try:
+                        function_args = json.loads(call["function"]["arguments"] or "{}")
+                    except json.JSONDecodeError:
+                        function_args = {}
+
+                    result = await run_tool(function_name, function_args, collection, embedding_model,
+                                            synthesize_answer_func, prefetch, knowledge_scope, request.priority)
+                    if function_name in TOOL_FUNCTIONS:
+                        actions_performed.append(f"{function_name}: {function_args}")
+                    new_messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+
+            if reply is None:
+                reply = "I'm sorry, I couldn't complete that request. Please call us at (555) 987-6543."
+                new_messages.append({"role": "assistant", "content": reply})
+
+            history.extend(new_messages)
+            conversation_store.save(thread_id, history)
+
+            if turn:
+                turn.set_attribute("thread_id", thread_id)
+                turn.set_attribute("history_messages_dropped", dropped)
+                turn.set_attribute("model_steps", step + 1)
+                turn.set_attribute("actions_performed", len(actions_performed))
+
+            return AgentResponse(
+                reply=reply,
+                thread_id=thread_id,
+                actions_performed=actions_performed,
+                trace_id=current_trace_id()
+            )
+
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Agent processing error: {str(e)} (trace_id={current_trace_id()})")
+
+        finally:
+            if prefetch:
+                prefetch.finish()
@@ -2,15 +2,27 @@ import os
 import json
 import asyncio
 import smtplib
+import uuid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import openai
 from fastapi import HTTPException
 from pydantic import BaseModel
 import resend
 
+from conversation_store import ConversationStore
+from history import ConversationHistory
+from dedup import diverse_query
+from metrics import stage_timer
+from prefetch import KnowledgePrefetch, start_prefetch
+from retrieval import SEARCH_TOP_K
+from scheduler import RequestPriority, WorkScheduler
+from state_backend import create_state_backend
+from tool_cache import ToolCache, ToolFailure, ToolPolicy
+from tracing import current_trace_id, span
+
 # Initialize OpenAI client
 openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -21,20 +33,39 @@ resend.api_key = "re_79wa8DVH_NYxwqcTRmBGQZRRMiFzLHXUm"
 class AgentRequest(BaseModel):
     message: str
     thread_id: Optional[str] = None  # FIXED: Make optional
+    idempotency_key: Optional[str] = None  # Retries with the same key get the first result
+    tenant_id: Optional[str] = None  # Knowledge base and instructions to use (default tenant if unset)
+    priority: RequestPriority = "text"  # Scheduling class of the turn's retrieval work
 
 class AgentResponse(BaseModel):
     reply: str
     thread_id: str
     actions_performed: List[str] = []
+    trace_id: Optional[str] = None
+
+# Appointments and availability live in the state backend so every worker sees the same bookings
+state = create_state_backend()
 
-# Mock database for appointments (replace with real database)
-appointments_db = []
+# Embedding/retrieval slots shared by /ask, agent knowledge searches and ingestion
+work_scheduler = WorkScheduler()
+
+# Initial availability, loaded into the state backend by the first worker to start
 availability_slots = {
     "2024-01-15": ["9:00 AM", "11:00 AM", "2:00 PM", "4:00 PM"],
     "2024-01-16": ["10:00 AM", "1:00 PM", "3:00 PM"],
     "2024-01-17": ["9:00 AM", "11:00 AM", "2:00 PM", "4:00 PM", "5:00 PM"],
 }
 
+def seed_availability():
+    """Load availability_slots into the state backend unless another worker already has"""
+    if state.set_if_absent("availability:seeded", True):
+        for date, times in availability_slots.items():
+            state.list_append("availability:dates", date)
+            for slot in times:
+                state.list_append(f"availability:{date}", slot)
+
+seed_availability()
+
 async def book_appointment(args: dict) -> str:
     """Book an appointment"""
     try:
@@ -45,15 +76,16 @@ async def book_appointment(args: dict) -> str:
         client_email = args.get('client_email', '')
         
         # Check availability
-        if date not in availability_slots:
+        if date not in state.list_items("availability:dates"):
             return f"Sorry, we don't have availability on {date}. Please choose another date."
         
-        if time not in availability_slots[date]:
-            available = ", ".join(availability_slots[date])
+        # Reserve the slot: removal is atomic, so of concurrent bookings for it exactly one succeeds
+        if not state.list_remove(f"availability:{date}", time):
+            available = ", ".join(state.list_items(f"availability:{date}"))
             return f"Sorry, {time} is not available on {date}. Available times: {available}"
         
-        # Book the appointment
-        booking_id = f"BK{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        # Book the appointment (the suffix keeps IDs unique across workers booking in the same second)
+        booking_id = f"BK{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:4].upper()}"
         appointment = {
             "id": booking_id,
             "date": date,
@@ -64,10 +96,7 @@ async def book_appointment(args: dict) -> str:
             "created_at": datetime.now().isoformat()
         }
         
-        appointments_db.append(appointment)
-        
-        # Remove the slot from availability
-        availability_slots[date].remove(time)
+        state.list_append("appointments", appointment)
         
         return f"✅ Appointment booked successfully! Confirmation ID: {booking_id}. {service} scheduled for {date} at {time} for {client_name}. We'll send a confirmation email if provided."
         
@@ -107,7 +136,8 @@ async def send_email(args: dict) -> str:
         print(f"Subject: {subject}")
         
         # Send the email
-        email_response = resend.Emails.send(params)
+        with stage_timer("email_send"):
+            email_response = resend.Emails.send(params)
         print(f"✅ Email sent successfully! ID: {email_response.get('id', 'N/A')}")
         
         return f"✅ Email sent successfully to {to} with subject '{subject}'. Message delivered via Resend."
@@ -120,14 +150,15 @@ async def check_availability(args: dict) -> str:
     """Check appointment availability"""
     try:
         date = args.get('date')
+        known_dates = set(state.list_items("availability:dates"))
         
-        if date not in availability_slots:
+        if date not in known_dates:
             # Generate some future dates
             future_dates = []
             base_date = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now()
             for i in range(1, 8):
                 future_date = (base_date + timedelta(days=i)).strftime('%Y-%m-%d')
-                if future_date in availability_slots and availability_slots[future_date]:
+                if future_date in known_dates and state.list_items(f"availability:{future_date}"):
                     future_dates.append(future_date)
             
             if future_dates:
@@ -135,49 +166,64 @@ async def check_availability(args: dict) -> str:
             else:
                 return f"No availability on {date}. Please call (555) 123-4567 to check further dates."
         
-        available_slots = availability_slots[date]
+        available_slots = state.list_items(f"availability:{date}")
         if available_slots:
             return f"✅ Available time slots for {date}: {', '.join(available_slots)}"
         else:
             return f"❌ No available slots on {date}. Please choose another date."
             
     except Exception as e:
-        return f"Error checking availability: {str(e)}"
+        return ToolFailure(f"Error checking availability: {str(e)}")
 
-async def search_knowledge(args: dict, collection, embedding_model, synthesize_answer_func) -> str:
+def retrieve_knowledge_chunks(question: str, collection, embedding_model) -> Tuple[List[str], List[str]]:
+    """Embed the question and retrieve the relevant chunks and their sources (blocking)"""
+    # Generate embedding for the question
+    with stage_timer("embed", "search_knowledge"):
+        question_embedding = embedding_model.encode([question])[0]
+    
+    # Query ChromaDB
+    with stage_timer("vector_query", "search_knowledge"):
+        results = diverse_query(collection, question_embedding, SEARCH_TOP_K)
+    
+    if not results['documents'] or not results['documents'][0]:
+        return [], []
+    
+    relevant_chunks = results['documents'][0]
+    metadatas = results['metadatas'][0] if results['metadatas'] else []
+    sources = list(set([meta.get('source', 'Unknown') for meta in metadatas if meta]))
+    return relevant_chunks, sources
+
+def answer_knowledge(question: str, relevant_chunks: List[str], sources: List[str], synthesize_answer_func) -> str:
+    """Synthesize an answer from retrieved chunks (blocking; an LLM call with SYNTHESIS_MODE=llm)"""
+    if not relevant_chunks:
+        return "I don't have specific information about that. Please contact our office at (555) 123-4567 for more details."
+    
+    # Use existing synthesis function
+    with stage_timer("synthesize", "search_knowledge"):
+        return synthesize_answer_func(question, relevant_chunks, sources)
+
+async def search_knowledge(args: dict, collection, embedding_model, synthesize_answer_func,
+                           priority: str = "text") -> str:
     """Search the existing RAG knowledge base"""
+    if not collection:
+        return ToolFailure("Knowledge system not available. Please contact us at (555) 123-4567.")
+    
+    question = args.get('question', '')
     try:
-        question = args.get('question', '')
-        
-        if not collection:
-            return "Knowledge system not available. Please contact us at (555) 123-4567."
-        
-        # Generate embedding for the question
-        question_embedding = embedding_model.encode([question]).tolist()[0]
-        
-        # Query ChromaDB
-        results = collection.query(
-            query_embeddings=[question_embedding],
-            n_results=3
-        )
-        
-        if not results['documents'] or not results['documents'][0]:
-            return "I don't have specific information about that. Please contact our office at (555) 123-4567 for more details."
-        
-        # Use existing synthesis function
-        relevant_chunks = results['documents'][0]
-        metadatas = results['metadatas'][0] if results['metadatas'] else []
-        sources = list(set([meta.get('source', 'Unknown') for meta in metadatas if meta]))
-        
-        return synthesize_answer_func(question, relevant_chunks, sources)
-        
+        # Only embedding and retrieval hold a scheduler slot; synthesis (an LLM call with
+        # SYNTHESIS_MODE=llm) runs outside it so it can't use up voice/text capacity
+        relevant_chunks, sources = await work_scheduler.run(priority, retrieve_knowledge_chunks, question, collection,
+                                                            embedding_model)
+        return await asyncio.get_running_loop().run_in_executor(None, answer_knowledge, question, relevant_chunks,
+                                                                sources, synthesize_answer_func)
     except Exception as e:
-        return f"Error searching knowledge base: {str(e)}"
+        return ToolFailure(f"Error searching knowledge base: {str(e)}")
 
 async def get_appointments(args: dict) -> str:
     """Get scheduled appointments"""
     try:
         date = args.get('date', '')
+        appointments_db = state.list_items("appointments")
         
         if date:
             # Filter by date
@@ -200,7 +246,7 @@ async def get_appointments(args: dict) -> str:
                 return "No appointments currently scheduled"
                 
     except Exception as e:
-        return f"Error retrieving appointments: {str(e)}"
+        return ToolFailure(f"Error retrieving appointments: {str(e)}")
 
 # Function mapping
 TOOL_FUNCTIONS = {
@@ -211,6 +257,31 @@ TOOL_FUNCTIONS = {
     "get_appointments": get_appointments,
 }
 
+def availability_tags(args: dict) -> List[str]:
+    """Availability for a date; for unknown dates the answer lists the next 7 days, so tag those too"""
+    date = args.get('date') or ''
+    tags = [f"availability:{date}"]
+    try:
+        base_date = datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return tags
+    return tags + [f"availability:{(base_date + timedelta(days=i)).strftime('%Y-%m-%d')}" for i in range(1, 8)]
+
+def knowledge_tag(knowledge_scope: Optional[str] = None) -> str:
+    """Tag of cached search_knowledge answers for one tenant's knowledge base"""
+    return f"knowledge:{knowledge_scope}" if knowledge_scope else "knowledge"
+
+# Caching policy per tool: read-only tools are cached, mutating ones invalidate what they change
+TOOL_CACHE_POLICIES = {
+    "check_availability": ToolPolicy(pure=True, ttl=60, tags=availability_tags),
+    "get_appointments": ToolPolicy(pure=True, ttl=30, tags=lambda args: ["appointments"]),
+    "search_knowledge": ToolPolicy(pure=True, ttl=600, tags=lambda args: [knowledge_tag(args.get("knowledge_scope"))]),
+    "book_appointment": ToolPolicy(pure=False, tags=lambda args: [f"availability:{args.get('date')}", "appointments"]),
+    "send_email": ToolPolicy(pure=False),
+}
+
+tool_cache = ToolCache(TOOL_CACHE_POLICIES)
+
 # OpenAI Assistant Tools Definition
 ASSISTANT_TOOLS = [
     {
@@ -290,27 +361,57 @@ ASSISTANT_TOOLS = [
     }
 ]
 
-async def process_agent_request(request: AgentRequest, collection, embedding_model, synthesize_answer_func) -> AgentResponse:
-    """Process agent request with OpenAI function calling"""
-    try:
-        # Create or get thread
-        if request.thread_id:
-            thread_id = request.thread_id
-        else:
-            thread = openai_client.beta.threads.create()
-            thread_id = thread.id
-        
-        # Add user message
-        openai_client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=request.message
-        )
-        
-        # Create assistant
-        assistant = openai_client.beta.assistants.create(
-            name="Zuccess AI Receptionist",
-            instructions="""You are a professional AI receptionist for Zuccess, a cutting-edge AI automation company. 
+async def run_tool(function_name: str, function_args: dict, collection, embedding_model, synthesize_answer_func,
+                   prefetch: Optional[KnowledgePrefetch] = None, knowledge_scope: Optional[str] = None,
+                   priority: str = "text") -> str:
+    """Execute one tool call requested by the model"""
+    if function_name not in TOOL_FUNCTIONS:
+        return f"Function {function_name} not found"
+    
+    async def call():
+        if function_name == "search_knowledge":
+            return await search_knowledge(function_args, collection, embedding_model, synthesize_answer_func,
+                                          priority)
+        return await TOOL_FUNCTIONS[function_name](function_args)
+
+    with stage_timer("tool", function_name), span(f"tool.{function_name}",
+                                                    argument_keys=sorted(function_args)) as tool_span:
+        if function_name == "search_knowledge" and prefetch:
+            question = function_args.get('question', '')
+            retrieved = await prefetch.take(question)
+            if tool_span:
+                tool_span.set_attribute("prefetch_hit", retrieved is not None)
+            if retrieved is not None:
+                # Only retrieval was prefetched; synthesis runs now that the model asked for it
+                return await asyncio.get_running_loop().run_in_executor(None, answer_knowledge, question, *retrieved,
+                                                                        synthesize_answer_func)
+        # Knowledge answers are cached per tenant
+        cache_args = function_args
+        if function_name == "search_knowledge" and knowledge_scope:
+            cache_args = {**function_args, "knowledge_scope": knowledge_scope}
+        return await tool_cache.call(function_name, cache_args, call)
+
+def start_knowledge_prefetch(message: str, collection, embedding_model,
+                             priority: str = "text") -> Optional[KnowledgePrefetch]:
+    """Start retrieving chunks for the user's message while the model is still being set up.
+
+    Only embedding and retrieval are prefetched: synthesis (an LLM call with
+    SYNTHESIS_MODE=llm) waits until the model actually calls search_knowledge.
+    """
+    if not collection:
+        return None
+
+    def retrieve(question: str) -> Tuple[List[str], List[str]]:
+        with work_scheduler.slot(priority):
+            return retrieve_knowledge_chunks(question, collection, embedding_model)
+
+    return start_prefetch(message, retrieve)
+
+# Model used by both agent engines
+AGENT_MODEL = os.getenv("AGENT_MODEL", "gpt-4-1106-preview")
+
+# Receptionist instructions given to the assistant
+AGENT_INSTRUCTIONS = """You are a professional AI receptionist for Zuccess, a cutting-edge AI automation company. 
 
 You can help with:
 - Booking consultations and checking availability
@@ -322,81 +423,141 @@ Always be professional, friendly, and helpful. When booking appointments, confir
 When clients ask about AI automation services or company information, use the search_knowledge function to provide accurate information.
 For complex AI automation questions, suggest they speak with one of our AI specialists.
 
-Company contact: (555) 987-6543 | hello@zuccess.ai""",
-            tools=ASSISTANT_TOOLS,
-            model="gpt-4-1106-preview"
-        )
+Company contact: (555) 987-6543 | hello@zuccess.ai"""
+
+# Token counts of the user/assistant messages in each OpenAI thread, used to truncate long threads
+thread_histories = ConversationStore(state=None if state.name == "memory" else state)
+
+async def process_agent_request(request: AgentRequest, collection, embedding_model, synthesize_answer_func,
+                                traceparent: Optional[str] = None,
+                                count_tokens_func: Optional[Callable[[str], int]] = None,
+                                instructions: Optional[str] = None,
+                                knowledge_scope: Optional[str] = None) -> AgentResponse:
+    """Process agent request with OpenAI function calling"""
+    with span("agent.turn", traceparent=traceparent, new_thread=not request.thread_id) as turn:
+        prefetch = start_knowledge_prefetch(request.message, collection, embedding_model, request.priority)
+        try:
+            # Create or get thread
+            if request.thread_id:
+                thread_id = request.thread_id
+            else:
+                with stage_timer("openai", "threads.create"), span("openai.threads.create"):
+                    thread = openai_client.beta.threads.create()
+                thread_id = thread.id
         
-        # Run assistant
-        run = openai_client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant.id
-        )
+            # Add user message
+            with stage_timer("openai", "messages.create"), span("openai.messages.create"):
+                openai_client.beta.threads.messages.create(
+                    thread_id=thread_id,
+                    role="user",
+                    content=request.message
+                )
         
-        # Wait for completion and handle tool calls
-        actions_performed = []
-        max_iterations = 10
-        iteration = 0
+            # Create assistant
+            with stage_timer("openai", "assistants.create"), span("openai.assistants.create"):
+                assistant = openai_client.beta.assistants.create(
+                    name="Zuccess AI Receptionist",
+                    instructions=instructions or AGENT_INSTRUCTIONS,
+                    tools=ASSISTANT_TOOLS,
+                    model=AGENT_MODEL
+                )
         
-        while iteration < max_iterations:
-            iteration += 1
-            # FIXED: Correct API call syntax
-            run_status = openai_client.beta.threads.runs.retrieve(
-                thread_id=thread_id, 
-                run_id=run.id
-            )
+            # Budget the thread: only the most recent messages are sent to the model, earlier
+            # turns go in as a summary. Threads this process hasn't seen are sent as they are.
+            run_options = {}
+            history = None
+            if count_tokens_func:
+                history = thread_histories.get(thread_id, lambda: ConversationHistory(count_tokens_func))
+                history.compact(reserve_tokens=count_tokens_func(request.message))
+                if history.dropped_messages:
+                    run_options["truncation_strategy"] = {"type": "last_messages",
+                                                          "last_messages": len(history.messages) + 1}
+                    run_options["additional_instructions"] = history.summary_instructions()
+
+            # Run assistant
+            with stage_timer("openai", "runs.create"), span("openai.runs.create",
+                                                            truncated=bool(run_options)):
+                run = openai_client.beta.threads.runs.create(
+                    thread_id=thread_id,
+                    assistant_id=assistant.id,
+                    **run_options
+                )
+        
+            # Wait for completion and handle tool calls
+            actions_performed = []
+            max_iterations = 10
+            iteration = 0
+        
+            while iteration < max_iterations:
+                iteration += 1
+                # FIXED: Correct API call syntax
+                with stage_timer("openai", "runs.retrieve"), span("openai.runs.retrieve", iteration=iteration) as poll:
+                    run_status = openai_client.beta.threads.runs.retrieve(
+                        thread_id=thread_id, 
+                        run_id=run.id
+                    )
+                    if poll:
+                        poll.set_attribute("status", run_status.status)
             
-            if run_status.status == 'completed':
-                break
-            elif run_status.status == 'requires_action':
-                tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
-                tool_outputs = []
+                if run_status.status == 'completed':
+                    break
+                elif run_status.status == 'requires_action':
+                    tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
+                    tool_outputs = []
                 
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
+                    for tool_call in tool_calls:
+                        function_name = tool_call.function.name
+                        function_args = json.loads(tool_call.function.arguments)
                     
-                    # Execute the function
-                    if function_name in TOOL_FUNCTIONS:
-                        if function_name == "search_knowledge":
-                            result = await search_knowledge(function_args, collection, embedding_model, synthesize_answer_func)
-                        else:
-                            result = await TOOL_FUNCTIONS[function_name](function_args)
-                        
-                        actions_performed.append(f"{function_name}: {function_args}")
+                        # Execute the function
+                        result = await run_tool(function_name, function_args, collection, embedding_model,
+                                                synthesize_answer_func, prefetch, knowledge_scope, request.priority)
+                        if function_name in TOOL_FUNCTIONS:
+                            actions_performed.append(f"{function_name}: {function_args}")
                         
                         tool_outputs.append({
                             "tool_call_id": tool_call.id,
                             "output": result
                         })
-                    else:
-                        tool_outputs.append({
-                            "tool_call_id": tool_call.id,
-                            "output": f"Function {function_name} not found"
-                        })
                 
-                # Submit tool outputs
-                openai_client.beta.threads.runs.submit_tool_outputs(
-                    thread_id=thread_id,
-                    run_id=run.id,
-                    tool_outputs=tool_outputs
-                )
-            elif run_status.status in ['failed', 'cancelled', 'expired']:
-                raise HTTPException(status_code=500, detail=f"Assistant run failed: {run_status.status}")
+                    # Submit tool outputs
+                    with stage_timer("openai", "runs.submit_tool_outputs"), span("openai.runs.submit_tool_outputs", tool_calls=len(tool_outputs)):
+                        openai_client.beta.threads.runs.submit_tool_outputs(
+                            thread_id=thread_id,
+                            run_id=run.id,
+                            tool_outputs=tool_outputs
+                        )
+                elif run_status.status in ['failed', 'cancelled', 'expired']:
+                    raise HTTPException(status_code=500, detail=f"Assistant run failed: {run_status.status}")
             
-            # Wait a bit before checking again
-            await asyncio.sleep(1)
+                # Wait a bit before checking again
+                await asyncio.sleep(1)
         
-        # Get the assistant's response
-        messages = openai_client.beta.threads.messages.list(thread_id)
-        assistant_message = messages.data[0]
-        reply = assistant_message.content[0].text.value
+            # Get the assistant's response
+            with stage_timer("openai", "messages.list"), span("openai.messages.list"):
+                messages = openai_client.beta.threads.messages.list(thread_id)
+            assistant_message = messages.data[0]
+            reply = assistant_message.content[0].text.value
+            if history is not None:
+                history.extend([{"role": "user", "content": request.message},
+                                {"role": "assistant", "content": reply}])
+                thread_histories.save(thread_id, history)
         
-        return AgentResponse(
-            reply=reply,
-            thread_id=thread_id,
-            actions_performed=actions_performed
-        )
+            if turn:
+                turn.set_attribute("thread_id", thread_id)
+                turn.set_attribute("poll_iterations", iteration)
+                turn.set_attribute("actions_performed", len(actions_performed))
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Agent processing error: {str(e)}")
\ No newline at end of file
+            return AgentResponse(
+                reply=reply,
+                thread_id=thread_id,
+                actions_performed=actions_performed,
+                trace_id=current_trace_id()
+            )
+        
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Agent processing error: {str(e)} (trace_id={current_trace_id()})")
+
+        finally:
+            if prefetch:
+                prefetch.finish()
\ No newline at end of file
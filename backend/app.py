@@ -1,23 +1,45 @@
 import os
-import glob
-from typing import List, Dict, Any
+import json
+import itertools
+import time
+import asyncio
+import threading
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from pathlib import Path
+from dataclasses import asdict
+from datetime import datetime, timezone
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-# Simple text splitter implementation
-import re
 import tiktoken
 from dotenv import load_dotenv
 
+from embeddings import load_embedding_model
+from embedding_cache import create_embedding_cache
+from health import HealthChecker
+from loaders import (FileReport, document_patterns, find_documents, iter_files_chunks, iter_replacing_chunks,
+                     restore_chunks)
+from metrics import REQUESTS, REQUEST_LATENCY, register_queue, render_metrics, stage_timer
+from snapshot import SnapshotIndex, load_snapshot
+from synthesis import create_synthesizer
+from watcher import DataDirWatcher
+
 # Load environment variables
 load_dotenv()
 
+# Read their DEDUP_*/MMR_*/PROFILE_*/SCHEDULER_*/HNSW_* settings at import, so after .env is loaded
+from dedup import DEDUP_ENABLED, ChunkDeduplicator, dependent_sources, diverse_query, record_also_in
+from profiling import profiler, router as profiling_router
+from retrieval import ASK_TOP_K, open_collection
+from scheduler import PRIORITIES, SchedulerRejected, WorkScheduler
+
 app = FastAPI(title="HeyGen RAG Backend", version="1.0.0")
+# Admin-only /admin/profile endpoints (disabled unless ADMIN_TOKEN is set)
+app.include_router(profiling_router)
 
 # CORS middleware
 app.add_middleware(
@@ -28,81 +50,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    """Health check endpoint for system validation"""
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and record end-to-end latency per route"""
+    start = time.perf_counter()
+    status = 500
     try:
-        # Test database connection
-        collections = chroma_client.list_collections()
-        
-        # Test embedding model
-        test_embedding = embedding_model.encode(["test"]).tolist()
-        
-        return {
-            "status": "healthy",
-            "timestamp": "2024-01-01T00:00:00Z",
-            "components": {
-                "database": "operational",
-                "embedding_model": "operational",
-                "collections_count": len(collections)
-            },
-            "version": "1.0.0"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=503, detail={
-            "status": "unhealthy",
-            "error": str(e),
-            "timestamp": "2024-01-01T00:00:00Z"
-        })
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so unknown paths can't blow up cardinality
+        route = request.scope.get("route")
+        endpoint = route.path if route else "unmatched"
+        REQUESTS.inc(endpoint, str(status))
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint)
+        if profiler.active:
+            profiler.request_done(endpoint, time.perf_counter() - start)
+
+@app.exception_handler(SchedulerRejected)
+async def scheduler_rejected(request: Request, exc: SchedulerRejected):
+    """Shed (503) requests, with a Retry-After hint"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc), "reason": exc.reason},
+                        headers={"Retry-After": str(int(exc.retry_after))})
 
 # Configuration
 CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_db")
 DATA_DIR = os.getenv("DATA_DIR", "../data")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")  # torch | onnx | onnx-int8 | remote
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+WATCH_DATA_DIR = os.getenv("WATCH_DATA_DIR", "false").lower() in ("1", "true", "yes")
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "1"))
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "2"))
+DOCUMENT_PATTERNS = document_patterns()
+# Snapshot written by `ingest.py --snapshot`, served when the ChromaDB collection is empty
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+SNAPSHOT_VERIFY = os.getenv("SNAPSHOT_VERIFY", "true").lower() in ("1", "true", "yes")
+INDEX_VERSION_FILE = os.path.join(CHROMA_DIR, "index_version")
 
 # Initialize components
-embedding_model = SentenceTransformer(EMBED_MODEL)
+embedding_model = load_embedding_model(EMBED_MODEL, EMBED_BACKEND)
+# Embeddings of previously ingested chunk text (None with EMBED_CACHE_ENABLED=false)
+embedding_cache = create_embedding_cache(EMBED_MODEL, EMBED_BACKEND, embedding_model)
 chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-
-# Simple text splitter function
-def split_text_into_chunks(text: str, chunk_size: int = 800, chunk_overlap: int = 150) -> list[str]:
-    """Split text into overlapping chunks"""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + chunk_size
-        
-        # Try to break at sentence boundary
-        if end < len(text):
-            # Look for sentence endings
-            sentence_end = text.rfind('.', start, end)
-            if sentence_end > start + chunk_size // 2:
-                end = sentence_end + 1
-            else:
-                # Look for paragraph breaks
-                para_end = text.rfind('\n\n', start, end)
-                if para_end > start + chunk_size // 2:
-                    end = para_end + 2
-                else:
-                    # Look for line breaks
-                    line_end = text.rfind('\n', start, end)
-                    if line_end > start + chunk_size // 2:
-                        end = line_end + 1
-        
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        start = end - chunk_overlap
-        if start >= len(text):
-            break
-    
-    return chunks
+health_checker = HealthChecker(interval=HEALTH_CHECK_INTERVAL)
+data_watcher = DataDirWatcher(DATA_DIR, DOCUMENT_PATTERNS, lambda changed, removed: reindex_files(changed, removed),
+                              interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE)
+# Serializes full ingestion and watcher re-indexing
+index_lock = threading.Lock()
+# Embedding/retrieval slots: /ask runs as text work, ingestion as batch work that yields between batches
+work_scheduler = WorkScheduler()
 
 # Tokenizer for token counting
 tokenizer = tiktoken.get_encoding("cl100k_base")
@@ -111,6 +109,9 @@ def count_tokens(text: str) -> int:
     """Count tokens in text"""
     return len(tokenizer.encode(text))
 
+# Generative synthesis (SYNTHESIS_MODE=llm); None keeps the template answers
+synthesizer = create_synthesizer(count_tokens)
+
 # Request/Response models
 class AskRequest(BaseModel):
     question: str
@@ -123,74 +124,220 @@ class IngestResponse(BaseModel):
     message: str
     documents_processed: int
     chunks_created: int
+    duplicates_skipped: int = 0
+    embeddings_cached: int = 0
+    embedding_cache_hit_ratio: float = 0.0
+    files_failed: int = 0
+    # Per file: source, format, bytes, chunks, load_seconds and error (see loaders.FileReport)
+    files: List[Dict[str, Any]] = []
 
 # Global collection reference
 collection = None
+index_version = None
+
+def read_index_version():
+    """Read the version stamp written by the last ingestion"""
+    try:
+        with open(INDEX_VERSION_FILE) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def write_index_version() -> str:
+    """Stamp the index with a new version after ingestion"""
+    global index_version
+    index_version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    try:
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        with open(INDEX_VERSION_FILE, "w") as f:
+            f.write(index_version)
+    except OSError as e:
+        print(f"Could not persist index version: {e}")
+    return index_version
+
+def check_database() -> Dict[str, Any]:
+    """Readiness check for ChromaDB (cheap: heartbeat + count, no queries)"""
+    chroma_client.heartbeat()
+    if not collection:
+        raise RuntimeError("Collection not initialized")
+    return {"collections_count": len(chroma_client.list_collections()), "documents_count": collection.count()}
 
-def initialize_collection():
-    """Initialize or get the ChromaDB collection"""
+def check_embedding_model() -> Dict[str, Any]:
+    """Readiness check for the embedding model (reports warm-up, never runs inference)"""
+    if not health_checker.warmed_up:
+        raise RuntimeError("Embedding model is still warming up")
+    return {"backend": EMBED_BACKEND, "model": EMBED_MODEL}
+
+def register_health_checks():
+    """Register the components and queues reported by /readyz"""
+    health_checker.register_check("database", check_database)
+    health_checker.register_check("embedding_model", check_embedding_model)
+    health_checker.register_info("index_version", lambda: index_version)
+    if embedding_cache is not None:
+        health_checker.register_info("embedding_cache", lambda: dict(embedding_cache.stats))
+    if WATCH_DATA_DIR:
+        health_checker.register_info("watcher", lambda: dict(data_watcher.stats))
+    if EMBED_BACKEND == "remote":
+        health_checker.register_queue("embedding_server", lambda: embedding_model.stats()["queue_depth"])
+        # stats() is a round trip to the server; scrapes report the depth the background check last read
+        register_queue("embedding_server", lambda: health_checker.state["queues"].get("embedding_server"))
+    for priority in PRIORITIES:
+        health_checker.register_queue(f"scheduler_{priority}", lambda p=priority: work_scheduler.queued(p))
+        register_queue(f"scheduler_{priority}", lambda p=priority: work_scheduler.queued(p))
+    health_checker.register_info("scheduler", work_scheduler.info)
+
+def initialize_collection(rebuild: bool = False):
+    """Initialize or get the ChromaDB collection (recreated if `rebuild` and its HNSW settings are stale)"""
     global collection
+    collection = open_collection(chroma_client, "documents", rebuild)
+
+def load_index_snapshot():
+    """Serve the index from SNAPSHOT_PATH on a node whose ChromaDB collection is empty"""
+    global index_version, collection
+    if not SNAPSHOT_PATH or not os.path.exists(os.path.join(SNAPSHOT_PATH, "manifest.json")):
+        return
+    if collection.count() > 0:
+        print(f"ChromaDB already has an index, ignoring snapshot {SNAPSHOT_PATH}")
+        return
+    
+    start = time.perf_counter()
     try:
-        collection = chroma_client.get_collection("documents")
-    except:
-        collection = chroma_client.create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        with stage_timer("snapshot_load"):
+            snapshot = load_snapshot(SNAPSHOT_PATH, verify=SNAPSHOT_VERIFY)
+    except (OSError, ValueError) as e:
+        print(f"Could not load snapshot {SNAPSHOT_PATH}: {e}")
+        return
+    if snapshot.manifest.get("embed_model") != EMBED_MODEL:
+        print(f"Snapshot {SNAPSHOT_PATH} was built with {snapshot.manifest.get('embed_model')}, not {EMBED_MODEL}; ignoring it")
+        return
+    
+    collection = snapshot
+    index_version = snapshot.manifest.get("index_version")
+    print(f"Serving {snapshot.count()} chunks from snapshot {SNAPSHOT_PATH} "
+          f"(loaded in {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+def load_and_chunk_documents(reports: Optional[List[FileReport]] = None) -> Iterator[Dict[str, Any]]:
+    """Chunk entries of every supported document in DATA_DIR, produced lazily one file at a time.
 
-def load_and_chunk_documents() -> List[Dict[str, Any]]:
-    """Load documents from data directory and chunk them"""
-    documents = []
+    A FileReport per file (size, chunks, load time, error) is appended to `reports`.
+    """
     data_path = Path(DATA_DIR)
     
     if not data_path.exists():
         raise HTTPException(status_code=404, detail=f"Data directory {DATA_DIR} not found")
     
-    # Load markdown and text files
-    file_patterns = ["*.md", "*.txt"]
-    files = []
-    for pattern in file_patterns:
-        files.extend(glob.glob(os.path.join(DATA_DIR, pattern)))
+    files = find_documents(DATA_DIR)
     
     if not files:
         raise HTTPException(status_code=404, detail="No documents found in data directory")
     
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Split into chunks
-            chunks = split_text_into_chunks(content)
+    return iter_files_chunks(files, reports if reports is not None else [])
+
+def add_documents(documents: Iterable[Dict[str, Any]], detail: str) -> Tuple[int, int]:
+    """Embed chunk entries and add them to ChromaDB; returns how many were added and how many embeddings came from the cache.
+
+    `documents` is consumed lazily in batches of SCHEDULER_BATCH_SIZE, each
+    run as batch work, so /ask requests get the embedding model between
+    batches and only one batch of chunk text is held at a time.
+    """
+    added = cached = 0
+    documents = iter(documents)
+    while True:
+        batch = list(itertools.islice(documents, work_scheduler.batch_size))
+        if not batch:
+            break
+        
+        # Prepare data for ChromaDB
+        ids = [doc["id"] for doc in batch]
+        texts = [doc["text"] for doc in batch]
+        metadatas = [{"source": doc["source"], "chunk_index": doc["chunk_index"]} for doc in batch]
+        for doc, metadata in zip(batch, metadatas):
+            if doc.get("also_in"):
+                metadata["also_in"] = ",".join(doc["also_in"])
+        
+        with work_scheduler.slot("batch"):
+            # Generate embeddings
+            with stage_timer("embed", detail):
+                if embedding_cache is not None:
+                    vectors, hits = embedding_cache.encode(embedding_model, texts)
+                    cached += hits
+                else:
+                    vectors = embedding_model.encode(texts)
             
-            # Create document entries
-            filename = os.path.basename(file_path)
-            for i, chunk in enumerate(chunks):
-                if chunk.strip():  # Skip empty chunks
-                    documents.append({
-                        "id": f"{filename}_chunk_{i}",
-                        "text": chunk,
-                        "source": filename,
-                        "chunk_index": i
-                    })
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-            continue
-    
-    return documents
+            # Add to ChromaDB
+            with stage_timer("vector_add", detail):
+                collection.add(
+                    ids=ids,
+                    documents=texts,
+                    embeddings=vectors,
+                    metadatas=metadatas
+                )
+        added += len(batch)
+    return added, cached
+
+def index_documents(documents: Iterable[Dict[str, Any]], detail: str) -> Tuple[int, int, int]:
+    """Add a stream of chunk entries, skipping near-duplicates (DEDUP_ENABLED).
+
+    Returns the chunks added, duplicates skipped and embeddings taken from the cache.
+    """
+    # Skip near-duplicate chunks (repeated boilerplate) so they don't crowd the top-k
+    deduplicator = ChunkDeduplicator() if DEDUP_ENABLED else None
+    if deduplicator:
+        documents = deduplicator.filter(documents)
+    added, cached = add_documents(documents, detail)
+    if deduplicator:
+        # Duplicates can turn up after their original was indexed
+        record_also_in(collection, deduplicator.also_in)
+    return added, deduplicator.skipped if deduplicator else 0, cached
+
+def reindex_files(changed: List[str], removed: List[str]) -> List[str]:
+    """Re-index only the given files (called by the DATA_DIR watcher from a worker thread).
+
+    Near-duplicates are only detected within the changed files, not against
+    the rest of the index; a full /ingest re-checks everything. Files whose
+    duplicate chunks were skipped in favour of chunks of these files are
+    re-indexed with them, so their text doesn't leave the index. Files that
+    fail to load keep their previous chunks and are returned for a retry.
+    """
+    with index_lock:
+        if isinstance(collection, SnapshotIndex):
+            # The snapshot is read-only: move to the (empty) ChromaDB collection and index every file
+            initialize_collection()
+            changed = find_documents(DATA_DIR)
+            removed = []
+        
+        dependents = dependent_sources(collection, [os.path.basename(path) for path in removed + changed])
+        changed = changed + [path for path in (os.path.join(DATA_DIR, source) for source in sorted(dependents))
+                             if os.path.isfile(path) and path not in changed]
+        
+        for file_path in removed:
+            collection.delete(where={"source": os.path.basename(file_path)})
+        
+        reports: List[FileReport] = []
+        previous: Dict[str, Dict[str, Any]] = {}
+        added, _, _ = index_documents(iter_replacing_chunks(collection, changed, reports, previous), "reindex")
+        restore_chunks(collection, previous)
+        write_index_version()
+    failed = [path for path in changed if os.path.basename(path) in previous]
+    print(f"Re-indexed {len(changed) - len(failed)} changed and {len(removed)} removed files ({added} chunks)"
+          + (f"; {len(failed)} failed to load and kept their previous chunks" if failed else ""))
+    return failed
 
 def synthesize_answer(question: str, relevant_chunks: List[str], sources: List[str]) -> str:
     """Simple synthesis of answer from relevant chunks"""
     if not relevant_chunks:
         return "I don't have information about that topic. Please contact our office at (555) 123-4567 for more details."
     
+    if synthesizer:
+        return synthesizer.answer(question, relevant_chunks, sources)
+    
     # Join the most relevant chunks
     context = "\n\n".join(relevant_chunks[:3])  # Use top 3 chunks
     
     # Simple template-based synthesis for receptionist responses
-    if any(word in question.lower() for word in ['hours', 'time', 'open', 'closed']):
-        if 'hours' in context.lower() or 'monday' in context.lower():
-            return "Our business hours are Monday-Friday 8:00 AM - 6:00 PM PST, Saturday 9:00 AM - 2:00 PM PST, and we're closed on Sundays. You can reach us at (555) 123-4567."
+    if any(word in question.lower() for word in ['hours', 'time', 'open', 'closed']) and \
+            ('hours' in context.lower() or 'monday' in context.lower()):
+        return "Our business hours are Monday-Friday 8:00 AM - 6:00 PM PST, Saturday 9:00 AM - 2:00 PM PST, and we're closed on Sundays. You can reach us at (555) 123-4567."
     
     elif any(word in question.lower() for word in ['contact', 'phone', 'email', 'call']):
         return "You can contact us at (555) 123-4567 or email info@techcorpsolutions.com. Our main office is located in San Francisco with branches in New York, Austin, and Seattle."
@@ -218,7 +365,16 @@ def synthesize_answer(question: str, relevant_chunks: List[str], sources: List[s
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application"""
+    global index_version
     initialize_collection()
+    index_version = read_index_version()
+    load_index_snapshot()
+    register_health_checks()
+    
+    # Warm up the embedding model once so the first request (and readiness)
+    # doesn't pay for lazy initialisation; if it fails the health checker retries it
+    health_checker.register_warm_up(lambda: embedding_model.encode(["warm up"]))
+    await asyncio.get_running_loop().run_in_executor(None, health_checker.warm_up)
     
     # Check if collection is empty and ingest data if needed
     try:
@@ -228,11 +384,66 @@ async def startup_event():
             await ingest_documents()
     except Exception as e:
         print(f"Error during startup: {e}")
+    
+    await asyncio.get_running_loop().run_in_executor(None, health_checker.refresh)
+    health_checker.start()
+    
+    # Pick up changes to DATA_DIR without a full /ingest
+    if WATCH_DATA_DIR:
+        data_watcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks"""
+    await health_checker.stop()
+    await data_watcher.stop()
+
+@app.get("/livez")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_check():
+    """Readiness probe: cached component state from the background checker"""
+    state = health_checker.state
+    if not state["ready"]:
+        raise HTTPException(status_code=503, detail=state)
+    return state
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "HeyGen RAG Backend is running"}
+    state = health_checker.state
+    return {
+        "status": "healthy" if state["ready"] else "degraded",
+        "message": "HeyGen RAG Backend is running",
+        **state,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: request counts, stage latency histograms, cache and queue stats"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def retrieve_context(question: str, n_results: int = ASK_TOP_K) -> Tuple[List[str], List[str]]:
+    """Embed the question and return the most relevant chunks and their sources"""
+    # Generate embedding for the question
+    with stage_timer("embed"):
+        question_embedding = embedding_model.encode([question])[0]
+    
+    # Query ChromaDB
+    with stage_timer("vector_query"):
+        results = diverse_query(collection, question_embedding, n_results)
+    
+    if not results['documents'] or not results['documents'][0]:
+        return [], []
+    
+    # Extract relevant chunks and sources
+    relevant_chunks = results['documents'][0]
+    metadatas = results['metadatas'][0] if results['metadatas'] else []
+    sources = list(set([meta.get('source', 'Unknown') for meta in metadatas if meta]))
+    return relevant_chunks, sources
 
 @app.post("/ask", response_model=AskResponse)
 async def ask_question(request: AskRequest):
@@ -241,41 +452,58 @@ async def ask_question(request: AskRequest):
         raise HTTPException(status_code=500, detail="Collection not initialized")
     
     try:
-        # Generate embedding for the question
-        question_embedding = embedding_model.encode([request.question]).tolist()[0]
-        
-        # Query ChromaDB
-        results = collection.query(
-            query_embeddings=[question_embedding],
-            n_results=5
-        )
+        relevant_chunks, sources = await work_scheduler.run("text", retrieve_context, request.question)
         
-        if not results['documents'] or not results['documents'][0]:
-            return AskResponse(
-                answer="I don't have information about that topic. Please contact our office at (555) 123-4567 for more details.",
-                sources=[]
-            )
-        
-        # Extract relevant chunks and sources
-        relevant_chunks = results['documents'][0]
-        metadatas = results['metadatas'][0] if results['metadatas'] else []
-        sources = list(set([meta.get('source', 'Unknown') for meta in metadatas if meta]))
-        
-        # Synthesize answer
-        answer = synthesize_answer(request.question, relevant_chunks, sources)
+        # Synthesize answer (an OpenAI call with SYNTHESIS_MODE=llm), off the event loop
+        with stage_timer("synthesize"):
+            answer = await asyncio.get_running_loop().run_in_executor(None, synthesize_answer, request.question,
+                                                                      relevant_chunks, sources)
         
         return AskResponse(answer=answer, sources=sources)
         
+    except SchedulerRejected:
+        raise
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
-@app.post("/ingest", response_model=IngestResponse)
-async def ingest_documents():
-    """Ingest documents from the data directory into ChromaDB"""
+@app.post("/ask/stream")
+async def ask_question_stream(request: AskRequest):
+    """Ask a question and stream the answer as server-sent events.
+
+    The first event carries the sources, then `{"delta": ...}` events with
+    answer text, then `[DONE]`. Template answers arrive as a single delta.
+    """
     if not collection:
         raise HTTPException(status_code=500, detail="Collection not initialized")
     
     try:
+        relevant_chunks, sources = await work_scheduler.run("text", retrieve_context, request.question)
+    except SchedulerRejected:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+    
+    def events():
+        yield f"data: {json.dumps({'sources': sources})}\n\n"
+        with stage_timer("synthesize", "stream"):
+            if synthesizer and relevant_chunks:
+                deltas = synthesizer.stream_answer(request.question, relevant_chunks, sources)
+            else:
+                deltas = [synthesize_answer(request.question, relevant_chunks, sources)]
+            for delta in deltas:
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def ingest_all() -> IngestResponse:
+    """Rebuild the index from DATA_DIR (blocking; embedding runs as batch work)"""
+    # Keep the watcher from re-indexing files while the index is rebuilt
+    with index_lock:
+        # A snapshot is read-only, and changed HNSW_M/HNSW_CONSTRUCTION_EF need a new index; rebuild into ChromaDB
+        initialize_collection(rebuild=True)
+        
         # Clear existing documents
         try:
             # Get all IDs and delete them
@@ -285,38 +513,39 @@ async def ingest_documents():
         except Exception as e:
             # If collection is empty or doesn't exist, continue
             print(f"Note: {e}")
-        
-        # Load and chunk documents
-        documents = load_and_chunk_documents()
-        
-        if not documents:
+    
+        # Load, chunk and index the documents a batch at a time
+        reports: List[FileReport] = []
+        documents = load_and_chunk_documents(reports)
+        chunks_created, duplicates_skipped, embeddings_cached = index_documents(documents, "ingest")
+    
+        if not chunks_created:
             raise HTTPException(status_code=404, detail="No documents to ingest")
-        
-        # Prepare data for ChromaDB
-        ids = [doc["id"] for doc in documents]
-        texts = [doc["text"] for doc in documents]
-        metadatas = [{"source": doc["source"], "chunk_index": doc["chunk_index"]} for doc in documents]
-        
-        # Generate embeddings
-        embeddings = embedding_model.encode(texts).tolist()
-        
-        # Add to ChromaDB
-        collection.add(
-            ids=ids,
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=metadatas
-        )
-        
-        # Get unique document count
-        unique_sources = set(doc["source"] for doc in documents)
-        
+    
+        files_failed = sum(1 for report in reports if report.error)
+        write_index_version()
+    
         return IngestResponse(
-            message="Documents ingested successfully",
-            documents_processed=len(unique_sources),
-            chunks_created=len(documents)
+            message="Documents ingested successfully" if not files_failed
+            else f"Documents ingested; {files_failed} file(s) failed",
+            documents_processed=sum(1 for report in reports if report.chunks),
+            chunks_created=chunks_created,
+            duplicates_skipped=duplicates_skipped,
+            embeddings_cached=embeddings_cached,
+            embedding_cache_hit_ratio=round(embeddings_cached / chunks_created, 3),
+            files_failed=files_failed,
+            files=[asdict(report) for report in reports]
         )
-        
+
+@app.post("/ingest", response_model=IngestResponse)
+async def ingest_documents():
+    """Ingest documents from the data directory into ChromaDB"""
+    if not collection:
+        raise HTTPException(status_code=500, detail="Collection not initialized")
+    
+    try:
+        # Off the event loop: ingestion embeds as batch work and yields to /ask between batches
+        return await asyncio.get_running_loop().run_in_executor(None, ingest_all)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ingesting documents: {str(e)}")
 
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+/agent turn latency against the local mock OpenAI server.
+
+Starts benchmarks/mock_openai.py and app_enhanced (pointed at the mock via
+OPENAI_BASE_URL), then runs multi-turn conversations. Per-step timings come
+from the spans recorded for each turn (/traces/{trace_id}, read with a
+benchmark-only ADMIN_TOKEN).
+
+Usage: python benchmarks/bench_agent.py [--conversations 10] [--turns 3] [--concurrency 1]
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+from collections import defaultdict
+
+import httpx
+
+from common import (free_port, latency_summary, mock_openai_env, start_mock_openai, start_server, stop_server,
+                    write_results)
+
+CONVERSATION = [
+    "Hi, what services do you offer?",
+    "How much does an AI automation project cost?",
+    "Can you check availability on 2024-01-15?",
+    "What are your business hours?",
+]
+
+
+async def run_conversations(url: str, conversations: int, turns: int, concurrency: int, admin_token: str) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    turn_latencies = []
+    span_durations = defaultdict(list)
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        async def conversation():
+            nonlocal errors
+            async with semaphore:
+                thread_id = None
+                for turn in range(turns):
+                    start = time.perf_counter()
+                    response = await client.post("/agent", json={
+                        "message": CONVERSATION[turn % len(CONVERSATION)],
+                        "thread_id": thread_id,
+                    })
+                    if response.status_code != 200:
+                        errors += 1
+                        return
+                    turn_latencies.append((time.perf_counter() - start) * 1000)
+                    body = response.json()
+                    thread_id = body["thread_id"]
+
+                    trace_id = body.get("trace_id")
+                    if trace_id:
+                        trace = await client.get(f"/traces/{trace_id}", headers={"X-Admin-Token": admin_token})
+                        if trace.status_code == 200:
+                            for span in trace.json()["spans"]:
+                                span_durations[span["name"]].append(span["durationMs"])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(conversation() for _ in range(conversations)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "conversations": conversations,
+        "turns_per_conversation": turns,
+        "concurrency": concurrency,
+        "errors": errors,
+        "turns_per_sec": round(len(turn_latencies) / elapsed, 3),
+        "turn_latency_ms": latency_summary(turn_latencies),
+        "span_latency_ms": {name: latency_summary(values) for name, values in sorted(span_durations.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /agent turns against a mock OpenAI server")
+    parser.add_argument("--conversations", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mock-config", help="Latency/tool-call script for the mock (see mock_openai.py)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    mock_port, app_port = free_port(), free_port()
+    admin_token = secrets.token_urlsafe(16)
+    mock = start_mock_openai(mock_port, args.mock_config)
+    app = None
+    try:
+        app = start_server("app_enhanced", app_port, ready_path="/readyz",
+                           env={**mock_openai_env(mock_port), "TRACE_EXPORTER": "memory", "ADMIN_TOKEN": admin_token})
+        results = asyncio.run(run_conversations(
+            f"http://127.0.0.1:{app_port}", args.conversations, args.turns, args.concurrency, admin_token
+        ))
+    finally:
+        if app:
+            stop_server(app)
+        stop_server(mock)
+
+    latency = results["turn_latency_ms"]
+    print(f"{results['turns_per_sec']} turns/s, p50 {latency.get('p50')}ms p95 {latency.get('p95')}ms "
+          f"p99 {latency.get('p99')}ms, {results['errors']} errors")
+    for name, summary in results["span_latency_ms"].items():
+        print(f"  {name:<36} x{summary['count']:<4} mean {summary['mean']}ms p95 {summary['p95']}ms")
+
+    write_results("agent", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+/ask latency (p50/p95/p99) and throughput under concurrency.
+
+Starts the app with uvicorn on a free port (or targets --url) and sends a
+fixed number of questions at each concurrency level.
+
+Usage: python benchmarks/bench_ask.py [--concurrency 1 8 32] [--requests 200] [--url http://localhost:8000]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import free_port, latency_summary, start_server, stop_server, write_results
+
+QUESTIONS = [
+    "What are your business hours?",
+    "How can I contact you?",
+    "What services do you offer?",
+    "How much do your services cost?",
+    "Can I schedule a meeting?",
+    "Do you offer cloud migration?",
+    "Where are your offices located?",
+    "How long does an AI automation project take?",
+    "What results did your clients see from automation?",
+    "Which industries do you work with?",
+]
+
+
+async def run_level(url: str, concurrency: int, n_requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/ask", json={"question": QUESTIONS[i % len(QUESTIONS)]})
+                    if response.status_code != 200:
+                        errors += 1
+                        return
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        # Warm up the connection pool and the model
+        await asyncio.gather(*(one(i) for i in range(min(concurrency, 5))))
+        latencies.clear()
+        errors = 0
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /ask under concurrency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--app", default="app", help="App module to start (app or app_enhanced)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if not url:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        proc = start_server(args.app, port, ready_path="/readyz")
+
+    try:
+        results = {"url": url, "levels": []}
+        for concurrency in args.concurrency:
+            level = asyncio.run(run_level(url, concurrency, args.requests))
+            results["levels"].append(level)
+            latency = level["latency_ms"]
+            print(f"c={concurrency}: {level['throughput_rps']} req/s, p50 {latency.get('p50')}ms "
+                  f"p95 {latency.get('p95')}ms p99 {latency.get('p99')}ms, {level['errors']} errors")
+    finally:
+        if proc:
+            stop_server(proc)
+
+    write_results("ask", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Booking consistency and latency across workers sharing a state backend.
+
+Starts benchmarks/mock_redis.py (or uses --redis-url), then N worker
+processes with STATE_BACKEND=redis that all try to book every seeded slot at
+the same time, as uvicorn workers behind a load balancer would. Reports how
+many bookings each slot got (must be exactly 1), the appointments recorded
+and book_appointment latency.
+
+Usage: python benchmarks/bench_bookings.py [--workers 8] [--redis-url redis://host:6379/0] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import free_port, latency_summary, stop_server, write_results
+
+
+def child(start_at: float):
+    """Runs inside a worker process: book every seeded slot once, report outcomes as JSON"""
+    import agent_fixed
+
+    slots = [(date, slot) for date, times in agent_fixed.availability_slots.items() for slot in times]
+    # Start together so the workers really contend for each slot
+    time.sleep(max(0.0, start_at - time.time()))
+
+    async def book_all():
+        outcomes = []
+        for date, slot in slots:
+            start = time.perf_counter()
+            reply = await agent_fixed.book_appointment(
+                {"date": date, "time": slot, "client_name": f"worker-{os.getpid()}"})
+            outcomes.append({"slot": f"{date} {slot}", "booked": reply.startswith("✅"),
+                             "ms": (time.perf_counter() - start) * 1000})
+        return outcomes
+
+    print(json.dumps(asyncio.run(book_all())))
+
+
+def start_mock_redis(port: int) -> subprocess.Popen:
+    import redis
+
+    proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), "mock_redis.py"),
+                             "--port", str(port)])
+    client = redis.Redis(port=port)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            client.ping()
+            return proc
+        except redis.ConnectionError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("mock_redis.py did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent bookings through the state backend")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--redis-url", help="Use this Redis instead of starting mock_redis.py (must be empty)")
+    parser.add_argument("--output")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child)
+        return
+
+    mock = None
+    redis_url = args.redis_url
+    if not redis_url:
+        port = free_port()
+        mock = start_mock_redis(port)
+        redis_url = f"redis://127.0.0.1:{port}/0"
+
+    try:
+        # book_appointment makes no OpenAI calls, but importing the agent needs a key
+        env = {"OPENAI_API_KEY": "sk-mock", **os.environ, "STATE_BACKEND": "redis", "STATE_REDIS_URL": redis_url}
+        start_at = time.time() + 3
+        procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", str(start_at)],
+                                  env=env, stdout=subprocess.PIPE) for _ in range(args.workers)]
+        outcomes = []
+        for proc in procs:
+            output, _ = proc.communicate()
+            outcomes.extend(json.loads(output.decode().strip().splitlines()[-1]))
+
+        from state_backend import RedisStateBackend
+        appointments = RedisStateBackend(redis_url).list_items("appointments")
+    finally:
+        if mock:
+            stop_server(mock)
+
+    bookings_per_slot = {}
+    for outcome in outcomes:
+        bookings_per_slot[outcome["slot"]] = bookings_per_slot.get(outcome["slot"], 0) + outcome["booked"]
+    double_booked = sorted(slot for slot, count in bookings_per_slot.items() if count > 1)
+    unbooked = sorted(slot for slot, count in bookings_per_slot.items() if count == 0)
+
+    results = {
+        "workers": args.workers,
+        "slots": len(bookings_per_slot),
+        "attempts": len(outcomes),
+        "successful_bookings": sum(o["booked"] for o in outcomes),
+        "appointments_recorded": len(appointments),
+        "double_booked": double_booked,
+        "unbooked": unbooked,
+        "book_ms": latency_summary([o["ms"] for o in outcomes]),
+    }
+    print(json.dumps(results, indent=2))
+    write_results("bookings", results, args.output)
+    if double_booked or len(appointments) != len(bookings_per_slot):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
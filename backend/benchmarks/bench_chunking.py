@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Throughput of split_text_into_chunks on the real corpus and synthetic corpora.
+
+Usage: python benchmarks/bench_chunking.py [--scales 10000 100000] [--output results.json]
+"""
+
+import argparse
+import tempfile
+import time
+
+from common import write_results
+from corpus import generate_synthetic_corpus, load_real_corpus
+from chunking import split_text_into_chunks
+
+
+def measure(texts, repeats: int) -> dict:
+    total_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    best = None
+    chunks = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = sum(len(split_text_into_chunks(t)) for t in texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "documents": len(texts),
+        "bytes": total_bytes,
+        "chunks": chunks,
+        "best_seconds": round(best, 4),
+        "mb_per_sec": round(total_bytes / 1e6 / best, 2),
+        "chunks_per_sec": round(chunks / best, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the text chunker")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10000, 100000],
+                        help="Synthetic corpus sizes in chunks")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {"real": measure(list(load_real_corpus().values()), max(args.repeats, 20))}
+    print(f"real: {results['real']['mb_per_sec']} MB/s, {results['real']['chunks_per_sec']} chunks/s")
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_synthetic_corpus(tmp, scale)
+            texts = list(load_real_corpus(tmp).values())
+            results[f"synthetic_{scale}"] = measure(texts, args.repeats)
+        r = results[f"synthetic_{scale}"]
+        print(f"synthetic {scale}: {r['mb_per_sec']} MB/s, {r['chunks_per_sec']} chunks/s")
+
+    write_results("chunking", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
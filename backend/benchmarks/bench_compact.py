@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Recall and memory of compact snapshot vectors against full precision.
+
+Embeds the real data/ corpus (or a synthetic one of --chunks chunks) with the
+configured EMBED_MODEL/EMBED_BACKEND and the labeled questions of
+sweep_hnsw.py, then for every projection x dimension x storage type reports:
+
+- recall@k: overlap with the exact full-precision float32 top-k
+- hit@k: how often the labeled chunk is in the top-k
+- vector memory and p50/p99 query latency (projection + scoring + top-k)
+
+Usage: python benchmarks/bench_compact.py [--chunks 100000] [--dims 64 128 256] [--dtypes float32 float16 int8]
+                                          [--projections pca truncate] [--k 5 10] [--output results.json]
+"""
+
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import DATA_DIR, latency_summary, write_results
+from corpus import generate_synthetic_corpus, real_chunks
+from sweep_hnsw import embed, exact_top_k, labeled_questions
+from compact import CompactVectors, Projection, top_k
+
+
+def measure(vectors: CompactVectors, projection, queries: np.ndarray, labels, exact: dict) -> dict:
+    found = {k: [] for k in exact}
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        scores = vectors.scores(projection.apply(query) if projection else query)
+        top = top_k(scores, max(exact))
+        latencies.append((time.perf_counter() - start) * 1000)
+        for k in exact:
+            found[k].append(set(top[:k].tolist()))
+    latency = latency_summary(latencies)
+    return {
+        "vector_mb": round(vectors.nbytes / (1024 * 1024), 2),
+        "p50_ms": latency["p50"],
+        "p99_ms": latency["p99"],
+        "by_k": [{
+            "k": k,
+            "recall_at_k": round(float(np.mean([len(f & set(t.tolist())) / k for f, t in zip(found[k], exact[k])])), 4),
+            "hit_at_k": round(float(np.mean([label in f for label, f in zip(labels, found[k])])), 4),
+        } for k in exact],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark projected and quantized snapshot vectors")
+    parser.add_argument("--chunks", type=int, help="Synthetic corpus size in chunks (default: the real data/ corpus)")
+    parser.add_argument("--projections", nargs="+", default=["pca", "truncate"])
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", default=os.getenv("EMBED_BACKEND", "torch"))
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.chunks:
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_synthetic_corpus(tmp, args.chunks)
+            chunks = real_chunks(tmp)
+    else:
+        chunks = real_chunks(DATA_DIR)
+    questions = labeled_questions(chunks, args.questions)
+    ks = sorted(k for k in set(args.k) if k <= len(chunks))
+    print(f"Corpus: {len(chunks)} chunks, {len(questions)} questions, k: {ks}")
+
+    vectors = embed(chunks + [question for question, _ in questions], args.model, args.backend)
+    corpus, queries = vectors[:len(chunks)], vectors[len(chunks):]
+    labels = [label for _, label in questions]
+    exact = {k: exact_top_k(corpus, queries, k) for k in ks}
+
+    # Full precision first: the reference point for memory and latency
+    configs = [(None, corpus.shape[1], "float32")]
+    configs += [(method, dim, dtype) for method, dim, dtype in itertools.product(args.projections, args.dims, args.dtypes)
+                if dim < corpus.shape[1]]
+    configs += [(None, corpus.shape[1], dtype) for dtype in args.dtypes if dtype != "float32"]
+
+    runs = []
+    for method, dim, dtype in configs:
+        start = time.perf_counter()
+        projection = Projection.fit(method, corpus, dim) if method else None
+        compact = CompactVectors.encode(projection.apply(corpus) if projection else corpus, dtype)
+        run = {"projection": method, "dim": dim, "dtype": dtype, "build_seconds": round(time.perf_counter() - start, 2),
+               **measure(compact, projection, queries, labels, exact)}
+        runs.append(run)
+        print(f"{method or 'full':>8} {dim:>4} {dtype:>7}: {run['vector_mb']}MB, p50 {run['p50_ms']}ms p99 {run['p99_ms']}ms | "
+              + " | ".join(f"k={r['k']}: recall {r['recall_at_k']:.3f} hit {r['hit_at_k']:.3f}" for r in run["by_k"]))
+
+    write_results("compact", {
+        "chunks": len(chunks),
+        "questions": len(questions),
+        "model": args.model,
+        "backend": args.backend,
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark for the embedding backends.
+
+Each backend is loaded in a fresh process so RSS numbers are not polluted by
+the others. The vectors from every backend are compared against the torch
+(SentenceTransformer) reference.
+
+Usage: python benchmarks/bench_embeddings.py [--backends torch onnx onnx-int8] [--output results.json]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import current_rss_mb, latency_summary, peak_rss_mb, write_results
+from corpus import real_chunks
+
+SAMPLE_QUERIES = [
+    "What are your business hours?",
+    "How can I contact you?",
+    "What services do you offer?",
+    "How much do your services cost?",
+    "Can I schedule a meeting?",
+    "Do you offer cloud migration?",
+    "Where are your offices located?",
+    "How long does an AI automation project take?",
+]
+
+
+def run_backend(backend: str, model_name: str, corpus: list, repeats: int, out_path: str) -> dict:
+    """Load one backend, time it and dump its vectors (runs in a child process)"""
+    from embeddings import load_embedding_model
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model = load_embedding_model(model_name, backend)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    # Warm up so lazy initialisation doesn't count towards latency
+    model.encode(SAMPLE_QUERIES[:1])
+
+    latencies = []
+    for _ in range(repeats):
+        for query in SAMPLE_QUERIES:
+            t0 = time.perf_counter()
+            model.encode([query])
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    corpus_vectors = np.asarray(model.encode(corpus), dtype=np.float32)
+    batch_seconds = time.perf_counter() - t0
+    query_vectors = np.asarray(model.encode(SAMPLE_QUERIES), dtype=np.float32)
+
+    np.savez(out_path, corpus=corpus_vectors, queries=query_vectors)
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "query_latency_ms": latency_summary(latencies),
+        "throughput_texts_per_sec": round(len(corpus) / batch_seconds, 1),
+        "rss_mb": {
+            "before_load": round(rss_before, 1),
+            "after_load": round(rss_loaded, 1),
+            "peak": round(peak_rss_mb(), 1),
+        },
+    }
+
+
+def compare_vectors(reference: dict, candidate: dict, k: int = 5) -> dict:
+    """Cosine similarity to the reference vectors and top-k retrieval agreement"""
+    def normalize(m):
+        return m / np.clip(np.linalg.norm(m, axis=1, keepdims=True), 1e-12, None)
+
+    ref_corpus, cand_corpus = normalize(reference["corpus"]), normalize(candidate["corpus"])
+    ref_queries, cand_queries = normalize(reference["queries"]), normalize(candidate["queries"])
+
+    cosines = np.sum(ref_corpus * cand_corpus, axis=1)
+
+    ref_top = np.argsort(-ref_queries @ ref_corpus.T, axis=1)[:, :k]
+    cand_top = np.argsort(-cand_queries @ cand_corpus.T, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]
+
+    return {
+        "cosine_min": round(float(cosines.min()), 5),
+        "cosine_mean": round(float(cosines.mean()), 5),
+        f"top{k}_agreement": round(float(np.mean(overlap)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--repeats", type=int, default=10, help="Passes over the sample queries for latency")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    corpus = real_chunks()
+    backends = args.backends if "torch" in args.backends else ["torch"] + args.backends
+    print(f"Corpus: {len(corpus)} texts, backends: {', '.join(backends)}")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            out_path = os.path.join(tmp, f"{backend}.npz")
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_backend, (backend, args.model, corpus, args.repeats, out_path))
+            vectors[backend] = dict(np.load(out_path))
+            results.append(result)
+
+    for result in results:
+        result["parity_vs_torch"] = compare_vectors(vectors["torch"], vectors[result["backend"]])
+        latency = result["query_latency_ms"]
+        print(
+            f"{result['backend']:>10}: p50 {latency['p50']}ms p95 {latency['p95']}ms | "
+            f"{result['throughput_texts_per_sec']} texts/s | "
+            f"RSS {result['rss_mb']['after_load']}MB (peak {result['rss_mb']['peak']}MB) | "
+            f"cos min {result['parity_vs_torch']['cosine_min']}"
+        )
+
+    write_results("embeddings", {"model": args.model, "corpus_texts": len(corpus), "backends": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
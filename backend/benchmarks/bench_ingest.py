@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Ingestion wall time and peak memory.
+
+Each run happens in a fresh child process against a throwaway CHROMA_DIR so
+peak RSS reflects a single ingestion. The real data/ corpus is always run;
+synthetic corpora are generated for each requested scale.
+
+Usage: python benchmarks/bench_ingest.py [--scales 10000] [--app app] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import DATA_DIR, current_rss_mb, peak_rss_mb, write_results
+from corpus import generate_synthetic_corpus
+
+
+def child(app_module: str):
+    """Runs inside the child process: import the app, ingest, report as JSON"""
+    start = time.perf_counter()
+    app = __import__(app_module)
+    import_seconds = time.perf_counter() - start
+    rss_after_import = current_rss_mb()
+
+    app.initialize_collection()
+    start = time.perf_counter()
+    result = asyncio.run(app.ingest_documents())
+    ingest_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "import_seconds": round(import_seconds, 3),
+        "ingest_seconds": round(ingest_seconds, 3),
+        "documents": result.documents_processed,
+        "chunks": result.chunks_created,
+        "chunks_per_sec": round(result.chunks_created / ingest_seconds, 1),
+        "rss_after_import_mb": round(rss_after_import, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def run_ingest(app_module: str, data_dir: str) -> dict:
+    with tempfile.TemporaryDirectory() as chroma_dir:
+        env = {**os.environ, "DATA_DIR": data_dir, "CHROMA_DIR": chroma_dir}
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--child", "--app", app_module], env=env
+        ).decode()
+    # The app may print progress; the report is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document ingestion")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10000],
+                        help="Synthetic corpus sizes in chunks")
+    parser.add_argument("--app", default="app", help="App module to ingest with (app or app_enhanced)")
+    parser.add_argument("--output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.app)
+        return
+
+    results = {"real": run_ingest(args.app, DATA_DIR)}
+    print(f"real: {results['real']}")
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_synthetic_corpus(tmp, scale)
+            results[f"synthetic_{scale}"] = run_ingest(args.app, tmp)
+        print(f"synthetic {scale}: {results[f'synthetic_{scale}']}")
+
+    write_results("ingest", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Interactive latency while a bulk ingest runs.
+
+Starts app_enhanced over a synthetic corpus (its startup ingest builds the
+index), then measures voice and text /ask latency twice: with the server
+idle, and while a full /ingest re-embeds the corpus. Run once per
+SCHEDULER_BATCH_SIZE to see what chunked ingestion buys; a batch size larger
+than the corpus is equivalent to embedding it in one go.
+
+Usage: python benchmarks/bench_scheduler.py [--chunks 10000] [--batch-sizes 64 1000000] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from bench_ask import QUESTIONS
+from common import free_port, latency_summary, start_server, stop_server, write_results
+from corpus import generate_synthetic_corpus
+
+
+async def measure(client: httpx.AsyncClient, priority: str, until: float, interval: float,
+                  latencies: list, statuses: dict):
+    """Ask one question every `interval` seconds until `until`, recording latencies and status codes"""
+    i = 0
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        response = await client.post("/ask", json={"question": QUESTIONS[i % len(QUESTIONS)], "priority": priority})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+
+async def measure_classes(client: httpx.AsyncClient, until, interval: float) -> dict:
+    """Voice and text questions side by side until `until()` is true"""
+    samples = {priority: ([], {}) for priority in ("voice", "text")}
+    while not until():
+        window = time.perf_counter() + interval * 5
+        await asyncio.gather(*(measure(client, priority, window, interval, *samples[priority])
+                               for priority in samples))
+    return {priority: {"latency_ms": latency_summary(latencies), "statuses": statuses}
+            for priority, (latencies, statuses) in samples.items()}
+
+
+async def run_phases(url: str, duration: float, interval: float) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        await client.post("/ask", json={"question": QUESTIONS[0]})
+
+        idle_until = time.perf_counter() + duration
+        idle = await measure_classes(client, lambda: time.perf_counter() >= idle_until, interval)
+
+        ingest_start = time.perf_counter()
+        ingest = asyncio.create_task(client.post("/ingest"))
+        during_ingest = await measure_classes(client, ingest.done, interval)
+        response = await ingest
+        ingest_seconds = time.perf_counter() - ingest_start
+
+    return {
+        "idle": idle,
+        "during_ingest": during_ingest,
+        "ingest_status": response.status_code,
+        "ingest_seconds": round(ingest_seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /ask latency during ingestion")
+    parser.add_argument("--chunks", type=int, default=10000, help="Synthetic corpus size in chunks")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[64, 1000000],
+                        help="SCHEDULER_BATCH_SIZE values to compare")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of idle measurement")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between questions per class")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {"chunks": args.chunks, "runs": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        generate_synthetic_corpus(data_dir, args.chunks)
+        for batch_size in args.batch_sizes:
+            port = free_port()
+            env = {
+                "DATA_DIR": data_dir,
+                "CHROMA_DIR": os.path.join(tmp, f"chroma_{batch_size}"),
+                # Re-embed for real on every ingest
+                "EMBED_CACHE_ENABLED": "false",
+                # /ask makes no OpenAI calls, but importing the agent needs a key
+                "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-unused"),
+                "SCHEDULER_BATCH_SIZE": str(batch_size),
+            }
+            proc = start_server("app_enhanced", port, env=env, ready_path="/readyz", timeout=1800)
+            try:
+                run = asyncio.run(run_phases(f"http://127.0.0.1:{port}", args.duration, args.interval))
+            finally:
+                stop_server(proc)
+            run["batch_size"] = batch_size
+            results["runs"].append(run)
+            print(f"batch size {batch_size}: idle voice p95 {run['idle']['voice']['latency_ms'].get('p95')}ms, "
+                  f"during ingest {run['during_ingest']['voice']['latency_ms'].get('p95')}ms "
+                  f"(ingest {run['ingest_seconds']}s)")
+
+    write_results("scheduler", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Snapshot export and cold-start time.
+
+For the real data/ corpus and each synthetic scale, a ChromaDB collection is
+built with random unit vectors (the model isn't what's being measured), then:
+
+- export: `export_snapshot` wall time and snapshot size
+- snapshot cold start: a fresh process maps the snapshot (with and without
+  checksum verification) and answers its first query
+- chroma cold start: a fresh process opens the persisted ChromaDB directory
+  and answers its first query, i.e. the "copy chroma_db/ by hand" path
+- query latency over the snapshot (exact search) and ChromaDB (HNSW)
+
+Usage: python benchmarks/bench_snapshot.py [--scales 10000 100000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import DATA_DIR, latency_summary, write_results
+from corpus import generate_synthetic_corpus, real_chunks
+
+DIM = 384
+QUERIES = 200
+ADD_BATCH = 5000
+
+
+def random_vectors(n: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_collection(chroma_dir: str, chunks):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=chroma_dir)
+    collection = client.create_collection(name="documents", metadata={"hnsw:space": "cosine"})
+    vectors = random_vectors(len(chunks), seed=0)
+    for start in range(0, len(chunks), ADD_BATCH):
+        end = start + ADD_BATCH
+        collection.add(
+            ids=[f"chunk_{i}" for i in range(start, min(end, len(chunks)))],
+            documents=chunks[start:end],
+            embeddings=vectors[start:end].tolist(),
+            metadatas=[{"source": f"doc_{i // 50}.md", "chunk_index": i % 50}
+                       for i in range(start, min(end, len(chunks)))],
+        )
+    return collection
+
+
+def child(mode: str, path: str):
+    """Runs inside a fresh process: time to first query, then query latency"""
+    start = time.perf_counter()
+    if mode == "chroma":
+        import chromadb
+        index = chromadb.PersistentClient(path=path).get_collection("documents")
+    else:
+        from snapshot import load_snapshot
+        index = load_snapshot(path, verify=(mode == "snapshot_verified"))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    queries = random_vectors(QUERIES, seed=1)
+    start = time.perf_counter()
+    index.query(query_embeddings=[queries[0].tolist()], n_results=5)
+    first_query_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for query in queries[1:]:
+        start = time.perf_counter()
+        index.query(query_embeddings=[query.tolist()], n_results=5)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({
+        "load_ms": round(load_ms, 2),
+        "first_query_ms": round(first_query_ms, 2),
+        "time_to_first_answer_ms": round(load_ms + first_query_ms, 2),
+        "query_ms": latency_summary(latencies),
+    }))
+
+
+def run_child(mode: str, path: str) -> dict:
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", mode, "--path", path])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def bench_corpus(chunks) -> dict:
+    from snapshot import export_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chroma_dir = os.path.join(tmp, "chroma")
+        snapshot_dir = os.path.join(tmp, "snapshot")
+
+        start = time.perf_counter()
+        collection = build_collection(chroma_dir, chunks)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manifest = export_snapshot(collection, snapshot_dir, "bench", "random")
+        export_seconds = time.perf_counter() - start
+        snapshot_bytes = sum(os.path.getsize(os.path.join(snapshot_dir, name)) for name in os.listdir(snapshot_dir))
+
+        return {
+            "chunks": manifest["chunks"],
+            "build_collection_seconds": round(build_seconds, 2),
+            "export_seconds": round(export_seconds, 3),
+            "snapshot_mb": round(snapshot_bytes / 1e6, 1),
+            "snapshot_verified": run_child("snapshot_verified", snapshot_dir),
+            "snapshot": run_child("snapshot", snapshot_dir),
+            "chroma": run_child("chroma", chroma_dir),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot export and cold start")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10000],
+                        help="Synthetic corpus sizes in chunks")
+    parser.add_argument("--output")
+    parser.add_argument("--child", choices=["snapshot", "snapshot_verified", "chroma"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    results = {"real": bench_corpus(real_chunks(DATA_DIR))}
+    print(f"real: {results['real']}")
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_synthetic_corpus(tmp, scale)
+            chunks = real_chunks(tmp)
+        results[f"synthetic_{scale}"] = bench_corpus(chunks)
+        print(f"synthetic {scale}: {results[f'synthetic_{scale}']}")
+
+    write_results("snapshot", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Shared helpers for the benchmark scripts: stats, memory, process management and JSON results"""
+
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+DATA_DIR = os.path.join(REPO_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of a list of latencies in milliseconds"""
+    if not latencies_ms:
+        return {"count": 0}
+    return {
+        "count": len(latencies_ms),
+        "p50": round(percentile(latencies_ms, 50), 2),
+        "p95": round(percentile(latencies_ms, 95), 2),
+        "p99": round(percentile(latencies_ms, 99), 2),
+        "mean": round(sum(latencies_ms) / len(latencies_ms), 2),
+        "max": round(max(latencies_ms), 2),
+    }
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set size in MB (RUSAGE_SELF or RUSAGE_CHILDREN)"""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_http(url: str, timeout: float = 120.0) -> bool:
+    """Poll a URL until it answers with a non-5xx status"""
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_process(cmd: List[str], ready_url: str, env: Optional[Dict[str, str]] = None,
+                  timeout: float = 180.0) -> subprocess.Popen:
+    """Start a server process from the backend directory and wait until it answers"""
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, **(env or {})})
+    if not wait_for_http(ready_url, timeout):
+        proc.terminate()
+        raise RuntimeError(f"{' '.join(cmd)} did not come up at {ready_url}")
+    return proc
+
+
+def start_server(module: str, port: int, env: Optional[Dict[str, str]] = None,
+                 ready_path: str = "/livez", timeout: float = 180.0) -> subprocess.Popen:
+    """Start `uvicorn module:app` and wait until it answers on ready_path"""
+    # All benchmark traffic comes from one client, so the per-client rate limit would just reject it
+    env = {"SCHEDULER_CLIENT_RATE": "0", **(env or {})}
+    cmd = [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    return start_process(cmd, f"http://127.0.0.1:{port}{ready_path}", env, timeout)
+
+
+def start_mock_openai(port: int, config: Optional[str] = None) -> subprocess.Popen:
+    """Start benchmarks/mock_openai.py; see mock_openai_env() for pointing the backend at it"""
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "mock_openai.py"), "--port", str(port)]
+    if config:
+        cmd += ["--config", config]
+    return start_process(cmd, f"http://127.0.0.1:{port}/v1/models")
+
+
+def mock_openai_env(port: int) -> Dict[str, str]:
+    """Environment that routes the backend's OpenAI and Resend calls to the mock server"""
+    return {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        "OPENAI_API_KEY": "sk-mock",
+        "RESEND_API_URL": f"http://127.0.0.1:{port}",
+    }
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def write_results(name: str, results: Dict, output: Optional[str] = None) -> str:
+    """Write a benchmark report as JSON, tagged with the commit and machine it ran on"""
+    commit = git_commit()
+    report = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if output is None:
+        Path(RESULTS_DIR).mkdir(parents=True, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{commit or 'nocommit'}-{time.strftime('%Y%m%d%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return output
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files (e.g. from two commits).
+
+Every numeric leaf present in both reports is printed with its relative
+change. Latency-like keys (ms, seconds, rss) are better when lower; rates
+(per_sec, rps, throughput) are better when higher.
+
+Usage: python benchmarks/compare.py results/ask-abc123-....json results/ask-def456-....json
+"""
+
+import argparse
+import json
+from typing import Dict
+
+LOWER_IS_BETTER = ("ms", "seconds", "rss", "p50", "p95", "p99", "mean", "max", "errors")
+HIGHER_IS_BETTER = ("per_sec", "rps", "throughput", "agreement", "cosine", "recall", "hit")
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flat.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            # Lists of levels are keyed by their concurrency/backend when they have one
+            label = child.get("concurrency", child.get("backend", i)) if isinstance(child, dict) else i
+            flat.update(flatten(child, f"{prefix}[{label}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+
+def verdict(key: str, change: float) -> str:
+    if abs(change) < 0.02:
+        return ""
+    name = key.lower()
+    if any(token in name for token in HIGHER_IS_BETTER):
+        return "better" if change > 0 else "WORSE"
+    if any(token in name for token in LOWER_IS_BETTER):
+        return "better" if change < 0 else "WORSE"
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"{baseline.get('benchmark')}: {baseline.get('commit')} -> {candidate.get('commit')}")
+    base_flat = flatten(baseline.get("results", {}))
+    cand_flat = flatten(candidate.get("results", {}))
+    for key in sorted(set(base_flat) & set(cand_flat)):
+        old, new = base_flat[key], cand_flat[key]
+        change = (new - old) / old if old else 0.0
+        print(f"{key:<60} {old:>12.3f} {new:>12.3f} {change:>+8.1%} {verdict(key, change)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark corpora: the real data/ documents plus a synthetic generator that
+scales them to any number of chunks (10k-1M and beyond).
+
+Synthetic documents are built from shuffled sentences of the real corpus with
+random figures substituted in, so they have realistic sentence lengths and
+punctuation for the chunker without being exact duplicates.
+
+Usage: python benchmarks/corpus.py --chunks 100000 --out /tmp/synthetic_corpus
+"""
+
+import argparse
+import random
+import re
+from pathlib import Path
+from typing import Dict, List
+
+from common import DATA_DIR
+from chunking import split_text_into_chunks
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def load_real_corpus(data_dir: str = DATA_DIR) -> Dict[str, str]:
+    """The documents ingested by the app, keyed by filename"""
+    corpus = {}
+    for path in sorted(Path(data_dir).iterdir()):
+        if path.suffix in (".md", ".txt"):
+            corpus[path.name] = path.read_text(encoding="utf-8")
+    return corpus
+
+
+def real_chunks(data_dir: str = DATA_DIR) -> List[str]:
+    """Chunks of the real corpus exactly as ingestion produces them"""
+    chunks = []
+    for text in load_real_corpus(data_dir).values():
+        chunks.extend(c for c in split_text_into_chunks(text) if c.strip())
+    return chunks
+
+
+def _sentences(data_dir: str) -> List[str]:
+    sentences = []
+    for text in load_real_corpus(data_dir).values():
+        sentences.extend(s.strip() for s in _SENTENCE_RE.findall(text) if len(s.strip()) > 20)
+    return sentences
+
+
+def generate_synthetic_corpus(out_dir: str, n_chunks: int, chunks_per_file: int = 500,
+                              seed: int = 0, data_dir: str = DATA_DIR) -> Dict[str, int]:
+    """Write synthetic .md documents totalling at least `n_chunks` chunks"""
+    rng = random.Random(seed)
+    sentences = _sentences(data_dir)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    total_chunks = 0
+    total_bytes = 0
+    file_index = 0
+    while total_chunks < n_chunks:
+        target = min(chunks_per_file, n_chunks - total_chunks)
+        paragraphs = []
+        text = ""
+        produced = 0
+        # Grow the document until the chunker yields the number of chunks we want
+        while produced < target:
+            for _ in range(max(8, (target - produced) * 2)):
+                paragraph = " ".join(
+                    _NUMBER_RE.sub(lambda _: str(rng.randint(1, 999)), rng.choice(sentences))
+                    for _ in range(rng.randint(2, 6))
+                )
+                paragraphs.append(paragraph)
+            text = f"# Synthetic document {file_index}\n\n" + "\n\n".join(paragraphs)
+            produced = len(split_text_into_chunks(text))
+
+        path = out / f"synthetic_{file_index:05d}.md"
+        path.write_text(text, encoding="utf-8")
+        total_chunks += produced
+        total_bytes += len(text.encode("utf-8"))
+        file_index += 1
+
+    return {"files": file_index, "chunks": total_chunks, "bytes": total_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--chunks-per-file", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = generate_synthetic_corpus(args.out, args.chunks, args.chunks_per_file, args.seed)
+    print(f"Wrote {stats['files']} files, {stats['chunks']} chunks, {stats['bytes'] / 1e6:.1f} MB to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
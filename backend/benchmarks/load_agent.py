@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Load generator for /agent.
+
+Replays recorded conversations (JSON lines, one {"conversation": [...]} per
+line) at a target rate of turns per second. Conversations arrive open-loop
+(fixed or Poisson inter-arrival times) so a slow server builds up a backlog
+instead of silently lowering the offered load; turns within a conversation
+are sent back to back on the same thread_id, as the frontend does.
+
+By default the mock OpenAI/Resend server and app_enhanced are started
+locally; pass --url to load an already running backend instead.
+
+Usage: python benchmarks/load_agent.py --rps 5 --duration 60 [--traces traces/receptionist.jsonl]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from common import (BENCH_DIR, free_port, latency_summary, mock_openai_env, start_mock_openai, start_server,
+                    stop_server, write_results)
+
+DEFAULT_TRACES = os.path.join(BENCH_DIR, "traces", "receptionist.jsonl")
+DEFAULT_MOCK_CONFIG = os.path.join(BENCH_DIR, "mock_config.json")
+
+
+def load_traces(path: str) -> list:
+    conversations = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                conversations.append(json.loads(line)["conversation"])
+    if not conversations:
+        raise SystemExit(f"No conversations in {path}")
+    return conversations
+
+
+async def run_load(url: str, conversations: list, rps: float, duration: float, poisson: bool,
+                   seed: int, timeout: float) -> dict:
+    rng = random.Random(seed)
+    mean_turns = sum(len(c) for c in conversations) / len(conversations)
+    # Conversations arrive at rps / mean_turns so that turns arrive at ~rps
+    arrival_interval = mean_turns / rps
+
+    latencies = []
+    latencies_by_turn = defaultdict(list)
+    outcomes = Counter()
+    in_flight = 0
+    max_in_flight = 0
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def replay(messages: list):
+            nonlocal in_flight, max_in_flight
+            thread_id = None
+            for turn, message in enumerate(messages):
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/agent", json={"message": message, "thread_id": thread_id})
+                    outcome = str(response.status_code)
+                except httpx.TimeoutException:
+                    outcome = "timeout"
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                finally:
+                    in_flight -= 1
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                outcomes[outcome] += 1
+                if outcome != "200":
+                    # The rest of the conversation depends on this turn
+                    return
+                latencies.append(elapsed_ms)
+                latencies_by_turn[turn].append(elapsed_ms)
+                thread_id = response.json().get("thread_id")
+
+        tasks = []
+        planned_turns = 0
+        started = time.perf_counter()
+        next_arrival = started
+        while next_arrival - started < duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            messages = rng.choice(conversations)
+            planned_turns += len(messages)
+            tasks.append(asyncio.create_task(replay(messages)))
+            next_arrival += rng.expovariate(1 / arrival_interval) if poisson else arrival_interval
+        offered_seconds = time.perf_counter() - started
+
+        await asyncio.gather(*tasks)
+        total_seconds = time.perf_counter() - started
+
+    total = sum(outcomes.values())
+    errors = total - outcomes.get("200", 0)
+    return {
+        "target_rps": rps,
+        "duration_seconds": duration,
+        "arrivals": "poisson" if poisson else "uniform",
+        "conversations_started": len(tasks),
+        "turns_sent": total,
+        "offered_turns_per_sec": round(planned_turns / offered_seconds, 2) if offered_seconds else 0,
+        "throughput_turns_per_sec": round(outcomes.get("200", 0) / total_seconds, 2),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "outcomes": dict(outcomes),
+        "max_in_flight": max_in_flight,
+        "latency_ms": latency_summary(latencies),
+        "latency_ms_by_turn": {str(turn): latency_summary(values) for turn, values in sorted(latencies_by_turn.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay conversations against /agent at a target rate")
+    parser.add_argument("--rps", type=float, default=2.0, help="Target agent turns per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to keep starting conversations")
+    parser.add_argument("--traces", default=DEFAULT_TRACES, help="JSON lines of {\"conversation\": [...]}")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of evenly spaced")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-turn client timeout in seconds")
+    parser.add_argument("--url", help="Load an already running backend instead of starting mock + app")
+    parser.add_argument("--mock-config", default=DEFAULT_MOCK_CONFIG)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    conversations = load_traces(args.traces)
+    procs = []
+    url = args.url
+    try:
+        if not url:
+            mock_port, app_port = free_port(), free_port()
+            procs.append(start_mock_openai(mock_port, args.mock_config))
+            procs.append(start_server("app_enhanced", app_port, ready_path="/readyz",
+                                      env={**mock_openai_env(mock_port), "TRACE_EXPORTER": "none"}))
+            url = f"http://127.0.0.1:{app_port}"
+
+        results = asyncio.run(run_load(url, conversations, args.rps, args.duration, args.poisson,
+                                       args.seed, args.timeout))
+    finally:
+        for proc in reversed(procs):
+            stop_server(proc)
+
+    latency = results["latency_ms"]
+    print(f"offered {results['offered_turns_per_sec']} turns/s, served {results['throughput_turns_per_sec']} turns/s, "
+          f"error rate {results['error_rate']:.2%}, max in flight {results['max_in_flight']}")
+    print(f"latency p50 {latency.get('p50')}ms p95 {latency.get('p95')}ms p99 {latency.get('p99')}ms "
+          f"max {latency.get('max')}ms; outcomes {results['outcomes']}")
+
+    write_results("load_agent", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
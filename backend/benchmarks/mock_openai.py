@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI Assistants API endpoints used by
+process_agent_request (threads, messages, assistants, runs, tool outputs)
+and the streamed chat completions used by process_agent_request_chat,
+plus a Resend `/emails` stub, so /agent can be load tested without paying
+for or depending on either service.
+
+Point the backend at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+    RESEND_API_URL=http://127.0.0.1:<port>
+
+Behaviour is driven by a JSON config (--config):
+
+    {
+      "latency_ms": {"default": 40, "runs.retrieve": 15, "emails.send": 120},
+      "jitter_ms": 10,
+      "think_ms": 600,
+      "scripts": [
+        {"match": "book|appointment",
+         "steps": [[{"name": "check_availability", "arguments": {"date": "2024-01-15"}}],
+                   [{"name": "book_appointment", "arguments": {"date": "2024-01-15", "time": "9:00 AM",
+                                                               "service": "Consultation", "client_name": "Load Test"}}]],
+         "reply": "All booked. {tool_outputs}"}
+      ]
+    }
+
+`latency_ms` is added to every response of that operation, `think_ms` is how
+long a run stays `in_progress` before each step (simulated model time). The
+first script whose `match` regex matches the latest user message is used;
+in argument values `{message}` is replaced by that message. Without a match
+the run calls search_knowledge with the message and replies with its output.
+Chat completions with tools follow the same scripts: the step is the
+number of tool call rounds since the latest user message, and `think_ms` is
+the delay before the first streamed chunk. Without tools (answer synthesis)
+the reply is the start of the prompt's context.
+
+Usage: python benchmarks/mock_openai.py --port 8100 [--config mock.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+_ids = itertools.count(1)
+
+DEFAULT_SCRIPT = {
+    "steps": [[{"name": "search_knowledge", "arguments": {"question": "{message}"}}]],
+    "reply": "{tool_outputs}",
+}
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_mock{next(_ids):08d}"
+
+
+def _fill(value: Any, message: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{message}", message)
+    if isinstance(value, dict):
+        return {k: _fill(v, message) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, message) for v in value]
+    return value
+
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> FastAPI:
+    config = config or {}
+    latency_ms = config.get("latency_ms", {})
+    jitter_ms = config.get("jitter_ms", 0)
+    think_ms = config.get("think_ms", 0)
+    scripts = [dict(s, _re=re.compile(s.get("match", ".*"), re.IGNORECASE)) for s in config.get("scripts", [])]
+
+    app = FastAPI(title="Mock OpenAI / Resend")
+    threads = {}
+    assistants = {}
+    runs = {}
+    emails = []
+    stats = {}
+
+    async def simulate(operation: str):
+        """Count the call and wait for the configured latency of this operation"""
+        stats[operation] = stats.get(operation, 0) + 1
+        delay = latency_ms.get(operation, latency_ms.get("default", 0))
+        if jitter_ms:
+            delay += random.uniform(-jitter_ms, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def pick_script(message: str) -> Dict[str, Any]:
+        for script in scripts:
+            if script["_re"].search(message):
+                return script
+        return DEFAULT_SCRIPT
+
+    def message_object(thread_id: str, role: str, text: str, run_id=None, assistant_id=None) -> dict:
+        return {
+            "id": _new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "status": "completed",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "assistant_id": assistant_id,
+            "run_id": run_id,
+            "attachments": [],
+            "metadata": {},
+        }
+
+    def get_thread(thread_id: str) -> dict:
+        if thread_id not in threads:
+            raise HTTPException(status_code=404, detail={"error": {"message": f"No thread found with id '{thread_id}'"}})
+        return threads[thread_id]
+
+    def public_run(run: dict) -> dict:
+        return {k: v for k, v in run.items() if not k.startswith("_")}
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "created": 0, "owned_by": "mock"}]}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        """Call counts per operation and emails received"""
+        return {"calls": stats, "emails_sent": len(emails), "threads": len(threads), "runs": len(runs)}
+
+    @app.post("/v1/threads")
+    async def create_thread():
+        await simulate("threads.create")
+        thread_id = _new_id("thread")
+        threads[thread_id] = {"id": thread_id, "object": "thread", "created_at": int(time.time()),
+                              "metadata": {}, "messages": []}
+        return {k: v for k, v in threads[thread_id].items() if k != "messages"}
+
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        body = await request.json()
+        await simulate("messages.create")
+        content = body.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        message = message_object(thread_id, body.get("role", "user"), content or "")
+        get_thread(thread_id)["messages"].append(message)
+        return message
+
+    @app.get("/v1/threads/{thread_id}/messages")
+    async def list_messages(thread_id: str):
+        await simulate("messages.list")
+        # The API returns newest first by default
+        data = list(reversed(get_thread(thread_id)["messages"]))
+        return {"object": "list", "data": data, "first_id": data[0]["id"] if data else None,
+                "last_id": data[-1]["id"] if data else None, "has_more": False}
+
+    @app.post("/v1/assistants")
+    async def create_assistant(request: Request):
+        body = await request.json()
+        await simulate("assistants.create")
+        assistant_id = _new_id("asst")
+        assistants[assistant_id] = {"id": assistant_id, "object": "assistant", "created_at": int(time.time()),
+                                    "name": body.get("name"), "model": body.get("model"),
+                                    "instructions": body.get("instructions"), "tools": body.get("tools", []),
+                                    "metadata": {}}
+        return assistants[assistant_id]
+
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        body = await request.json()
+        await simulate("runs.create")
+        thread = get_thread(thread_id)
+        user_messages = [m for m in thread["messages"] if m["role"] == "user"]
+        last_user = user_messages[-1]["content"][0]["text"]["value"] if user_messages else ""
+        script = pick_script(last_user)
+        run_id = _new_id("run")
+        runs[run_id] = {
+            "id": run_id,
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id"),
+            "status": "queued",
+            "required_action": None,
+            "model": "mock",
+            "instructions": "",
+            "tools": [],
+            "metadata": {},
+            "_steps": _fill(list(script["steps"]), last_user),
+            "_reply": _fill(script.get("reply", "{tool_outputs}"), last_user),
+            "_tool_outputs": [],
+            "_ready_at": time.time() + think_ms / 1000,
+        }
+        return public_run(runs[run_id])
+
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    async def retrieve_run(thread_id: str, run_id: str):
+        await simulate("runs.retrieve")
+        run = runs.get(run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail={"error": {"message": f"No run found with id '{run_id}'"}})
+
+        if run["status"] in ("queued", "in_progress"):
+            if time.time() < run["_ready_at"]:
+                # The "model" is still thinking about this step
+                run["status"] = "in_progress"
+            elif run["_steps"]:
+                calls = run["_steps"].pop(0)
+                run["status"] = "requires_action"
+                run["required_action"] = {
+                    "type": "submit_tool_outputs",
+                    "submit_tool_outputs": {"tool_calls": [
+                        {"id": _new_id("call"), "type": "function",
+                         "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}}
+                        for call in calls
+                    ]},
+                }
+            else:
+                outputs = " ".join(run["_tool_outputs"])
+                text = run["_reply"].replace("{tool_outputs}", outputs) or "How can I help you today?"
+                get_thread(thread_id)["messages"].append(
+                    message_object(thread_id, "assistant", text, run_id, run["assistant_id"])
+                )
+                run["status"] = "completed"
+                run["required_action"] = None
+        return public_run(run)
+
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/submit_tool_outputs")
+    async def submit_tool_outputs(thread_id: str, run_id: str, request: Request):
+        body = await request.json()
+        await simulate("runs.submit_tool_outputs")
+        run = runs.get(run_id)
+        if run is None or run["status"] != "requires_action":
+            raise HTTPException(status_code=400, detail={"error": {"message": "Run is not waiting for tool outputs"}})
+        run["_tool_outputs"].extend(o.get("output", "") for o in body.get("tool_outputs", []))
+        run["status"] = "in_progress"
+        run["required_action"] = None
+        run["_ready_at"] = time.time() + think_ms / 1000
+        return public_run(run)
+
+    def chat_chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await simulate("chat.completions")
+        messages = body.get("messages", [])
+        last_user_index = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        last_user = messages[last_user_index].get("content") or "" if last_user_index >= 0 else ""
+        if isinstance(last_user, list):
+            last_user = " ".join(part.get("text", "") for part in last_user if isinstance(part, dict))
+        turn = messages[last_user_index + 1:]
+        script = pick_script(last_user)
+        steps = _fill(list(script["steps"]), last_user)
+        step = sum(1 for m in turn if m.get("role") == "assistant" and m.get("tool_calls"))
+
+        if not body.get("tools"):
+            # Plain completion (e.g. SYNTHESIS_MODE=llm): answer with the start of the prompt's context
+            context = last_user.split("Context:", 1)[-1].split("Question:", 1)[0]
+            content = " ".join(context.split())[:300] or "How can I help you today?"
+            tool_calls, finish_reason = None, "stop"
+        elif step < len(steps):
+            tool_calls = [
+                {"index": i, "id": _new_id("call"), "type": "function",
+                 "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}}
+                for i, call in enumerate(steps[step])
+            ]
+            content, finish_reason = None, "tool_calls"
+        else:
+            outputs = " ".join(m.get("content") or "" for m in turn if m.get("role") == "tool")
+            content = _fill(script.get("reply", "{tool_outputs}"), last_user).replace("{tool_outputs}", outputs)
+            content = content or "How can I help you today?"
+            tool_calls, finish_reason = None, "stop"
+
+        completion_id = _new_id("chatcmpl")
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            await asyncio.sleep(think_ms / 1000)
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = [{k: v for k, v in call.items() if k != "index"} for call in tool_calls]
+            return {"id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+
+        async def stream():
+            await asyncio.sleep(think_ms / 1000)
+            yield chat_chunk(completion_id, model, {"role": "assistant", "content": "" if content else None})
+            if tool_calls:
+                yield chat_chunk(completion_id, model, {"tool_calls": tool_calls})
+            else:
+                for word in re.findall(r"\S+\s*", content):
+                    yield chat_chunk(completion_id, model, {"content": word})
+            yield chat_chunk(completion_id, model, {}, finish_reason)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/emails")
+    async def send_email(request: Request):
+        """Resend stub: accept the email and return an id"""
+        body = await request.json()
+        await simulate("emails.send")
+        email_id = _new_id("email")
+        emails.append({"id": email_id, **body})
+        return {"id": email_id}
+
+    return app
+
+
+app = create_app()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the mock OpenAI / Resend server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--config", help="JSON file with latency_ms, jitter_ms, think_ms and scripts")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Redis commands used by RedisStateBackend, so
+multi-worker state can be exercised without installing Redis.
+
+Speaks RESP over TCP and implements HELLO, PING, GET, SET (NX, EX, PX), DEL,
+EXISTS, RPUSH, LRANGE and LREM with Redis semantics (empty lists disappear,
+expired keys read as missing). Commands run one at a time on the event loop,
+so each is atomic like on a real server. Point the backend at it with:
+
+    STATE_BACKEND=redis STATE_REDIS_URL=redis://127.0.0.1:<port>/0
+
+Usage: python benchmarks/mock_redis.py --port 6390
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+Value = Union[bytes, List[bytes]]
+
+
+class MockRedis:
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[Optional[float], Value]] = {}
+        self.commands = 0
+
+    def _get(self, key: bytes) -> Optional[Value]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]):
+        """Run one command; returns a reply value (bytes, int, list, None) or an Exception"""
+        self.commands += 1
+        command = args[0].upper().decode()
+        if command == "PING":
+            return "PONG"
+        if command in ("CLIENT", "SELECT"):
+            return "OK"
+        if command == "HELLO":
+            # redis-py 5+ negotiates RESP3; see encode_reply
+            proto = int(args[1]) if len(args) > 1 else 2
+            return {"server": "mock-redis", "version": "7.0.0", "proto": proto}
+        if command == "GET":
+            value = self._get(args[1])
+            if isinstance(value, list):
+                return ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+            return value
+        if command == "SET":
+            return self._set(args[1], args[2], [a.upper() for a in args[3:]], args[3:])
+        if command == "DEL":
+            return sum(1 for key in args[1:] if self._get(key) is not None and self.data.pop(key))
+        if command == "EXISTS":
+            return sum(1 for key in args[1:] if self._get(key) is not None)
+        if command == "RPUSH":
+            items = self._get(args[1]) or []
+            items.extend(args[2:])
+            self.data[args[1]] = (None, items)
+            return len(items)
+        if command == "LRANGE":
+            items = self._get(args[1]) or []
+            start, stop = int(args[2]), int(args[3])
+            stop = len(items) if stop == -1 else stop + 1
+            return items[start:stop]
+        if command == "LREM":
+            return self._lrem(args[1], int(args[2]), args[3])
+        return ValueError(f"ERR unknown command '{command}'")
+
+    def _set(self, key: bytes, value: bytes, options: List[bytes], raw: List[bytes]):
+        expires_at = None
+        for i, option in enumerate(options):
+            if option == b"EX":
+                expires_at = time.monotonic() + int(raw[i + 1])
+            elif option == b"PX":
+                expires_at = time.monotonic() + int(raw[i + 1]) / 1000
+        if b"NX" in options and self._get(key) is not None:
+            return None
+        self.data[key] = (expires_at, value)
+        return "OK"
+
+    def _lrem(self, key: bytes, count: int, value: bytes) -> int:
+        items = self._get(key) or []
+        removed = 0
+        kept = []
+        for item in items:
+            if item == value and (count == 0 or removed < abs(count)):
+                removed += 1
+            else:
+                kept.append(item)
+        if kept:
+            self.data[key] = (None, kept)
+        else:
+            self.data.pop(key, None)
+        return removed
+
+
+def encode_reply(reply, resp3: bool = False) -> bytes:
+    """RESP encoding; RESP3 differs only in how nulls and maps are written"""
+    if reply is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, dict):
+        fields = [item for pair in reply.items() for item in pair]
+        head = b"%%%d\r\n" % len(reply) if resp3 else b"*%d\r\n" % len(fields)
+        return head + b"".join(encode_reply(item, resp3) for item in fields)
+    return b"*%d\r\n" % len(reply) + b"".join(encode_reply(item, resp3) for item in reply)
+
+
+async def read_command(reader: asyncio.StreamReader) -> List[bytes]:
+    line = await reader.readline()
+    if not line:
+        raise EOFError
+    if not line.startswith(b"*"):
+        # Inline command (e.g. from telnet or redis-cli's inline mode)
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock Redis server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    store = MockRedis()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        resp3 = False
+        try:
+            while True:
+                command = await read_command(reader)
+                if command:
+                    reply = store.execute(command)
+                    if command[0].upper() == b"HELLO":
+                        resp3 = reply["proto"] == 3
+                    writer.write(encode_reply(reply, resp3))
+                    await writer.drain()
+        except (EOFError, asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, args.host, args.port)
+        print(f"Mock Redis listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
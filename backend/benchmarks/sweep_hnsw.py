@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Sweep of the retrieval settings: HNSW M / construction_ef / search_ef and k.
+
+Embeds the real data/ corpus (or a synthetic one of --chunks chunks) with the
+configured EMBED_MODEL/EMBED_BACKEND, derives a labeled question set from it
+(a sentence of a chunk, labeled with that chunk), and builds a ChromaDB
+collection for every M x construction_ef x search_ef. For every k it reports:
+
+- recall@k: overlap of the HNSW top-k with the exact (brute-force cosine) top-k
+- hit@k: how often the labeled chunk is in the HNSW top-k (exact_hit@k for exact search)
+- p50/p99 query latency, build time and estimated index memory (hnswlib layout)
+
+With RETRIEVAL_MMR the apps query the index for k * MMR_FETCH_MULTIPLIER
+candidates, so include those k values. The fastest configuration reaching
+--target-recall at every k is printed as HNSW_* settings for .env.
+
+Usage: python benchmarks/sweep_hnsw.py [--chunks 20000] [--m 8 16 32] [--construction-ef 50 100 200]
+                                       [--search-ef 10 50 100 200] [--k 3 5 10 20] [--output results.json]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from common import DATA_DIR, latency_summary, write_results
+from corpus import generate_synthetic_corpus, real_chunks
+
+ADD_BATCH = 5000
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+
+
+def labeled_questions(chunks, n: int, seed: int = 0):
+    """Up to n (question, chunk index) pairs: a random sentence of a random chunk, labeled with the chunk"""
+    rng = random.Random(seed)
+    questions = []
+    for i in rng.sample(range(len(chunks)), min(n, len(chunks))):
+        sentences = [s.strip(" #*-") for s in _SENTENCE_RE.findall(chunks[i]) if len(s.strip(" #*-")) > 20]
+        if sentences:
+            questions.append((rng.choice(sentences), i))
+    return questions
+
+
+def embed(texts, model_name: str, backend: str) -> np.ndarray:
+    """Unit-length embeddings"""
+    from embeddings import load_embedding_model
+
+    vectors = np.asarray(load_embedding_model(model_name, backend).encode(texts), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k nearest chunks per query by brute-force cosine similarity"""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def index_bytes(n: int, dim: int, m: int) -> int:
+    """Memory of an hnswlib index: level-0 vectors and 2M links per element, plus M links per upper level"""
+    level0 = dim * 4 + 2 * m * 4 + 4 + 8
+    # An element reaches each higher level with probability 1/M
+    upper = (m * 4 + 4) / (m - 1)
+    return int(n * (level0 + upper))
+
+
+def build(chunks, vectors: np.ndarray, m: int, construction_ef: int, search_ef: int):
+    import chromadb
+    from retrieval import hnsw_metadata
+
+    client = chromadb.EphemeralClient()
+    name = f"sweep-{m}-{construction_ef}-{search_ef}"
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(m, construction_ef, search_ef))
+    for start in range(0, len(chunks), ADD_BATCH):
+        end = min(start + ADD_BATCH, len(chunks))
+        collection.add(ids=[str(i) for i in range(start, end)], documents=chunks[start:end],
+                       embeddings=vectors[start:end].tolist())
+    return client, collection
+
+
+def measure(collection, queries: np.ndarray, labels, exact: dict, k: int) -> dict:
+    latencies = []
+    recalls = []
+    hits = 0
+    for query, label, truth in zip(queries, labels, exact[k]):
+        start = time.perf_counter()
+        ids = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(i) for i in ids}
+        recalls.append(len(found & set(truth.tolist())) / k)
+        hits += label in found
+    latency = latency_summary(latencies)
+    return {
+        "k": k,
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "hit_at_k": round(hits / len(labels), 4),
+        "p50_ms": latency["p50"],
+        "p99_ms": latency["p99"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters and k against exact search")
+    parser.add_argument("--chunks", type=int, help="Synthetic corpus size in chunks (default: the real data/ corpus)")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10, 20])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", default=os.getenv("EMBED_BACKEND", "torch"))
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.chunks:
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_synthetic_corpus(tmp, args.chunks)
+            chunks = real_chunks(tmp)
+    else:
+        chunks = real_chunks(DATA_DIR)
+    questions = labeled_questions(chunks, args.questions)
+    ks = sorted(k for k in set(args.k) if k <= len(chunks))
+    print(f"Corpus: {len(chunks)} chunks, {len(questions)} questions, k: {ks}")
+
+    start = time.perf_counter()
+    vectors = embed(chunks + [question for question, _ in questions], args.model, args.backend)
+    corpus, queries = vectors[:len(chunks)], vectors[len(chunks):]
+    labels = [label for _, label in questions]
+    print(f"Embedded in {time.perf_counter() - start:.1f}s")
+
+    exact = {k: exact_top_k(corpus, queries, k) for k in ks}
+    exact_hits = {k: round(float(np.mean([label in set(top.tolist()) for label, top in zip(labels, exact[k])])), 4)
+                  for k in ks}
+
+    runs = []
+    for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+        start = time.perf_counter()
+        client, collection = build(chunks, corpus, m, construction_ef, search_ef)
+        build_seconds = time.perf_counter() - start
+        # Warm up so lazy index loading doesn't count towards latency
+        collection.query(query_embeddings=[queries[0].tolist()], n_results=ks[0], include=[])
+        run = {
+            "M": m,
+            "construction_ef": construction_ef,
+            "search_ef": search_ef,
+            "build_seconds": round(build_seconds, 2),
+            "index_mb": round(index_bytes(len(chunks), corpus.shape[1], m) / (1024 * 1024), 2),
+            "by_k": [measure(collection, queries, labels, exact, k) for k in ks],
+        }
+        client.delete_collection(collection.name)
+        runs.append(run)
+        print(f"M={m:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+              f"build {run['build_seconds']}s, {run['index_mb']}MB | "
+              + " | ".join(f"k={r['k']}: recall {r['recall_at_k']:.3f} hit {r['hit_at_k']:.3f} "
+                           f"p99 {r['p99_ms']}ms" for r in run["by_k"]))
+
+    print("exact search hit@k: " + ", ".join(f"k={k}: {hit:.3f}" for k, hit in exact_hits.items()))
+
+    # Fastest (worst-k p50, steadier than p99 over a few hundred queries), then smallest,
+    # configuration reaching the target recall at every k
+    eligible = [run for run in runs if min(r["recall_at_k"] for r in run["by_k"]) >= args.target_recall]
+    recommended = min(eligible, key=lambda run: (max(r["p50_ms"] for r in run["by_k"]), run["index_mb"]),
+                      default=None)
+    if recommended:
+        print(f"Recommended (recall@k >= {args.target_recall} for every k): HNSW_M={recommended['M']} "
+              f"HNSW_CONSTRUCTION_EF={recommended['construction_ef']} HNSW_SEARCH_EF={recommended['search_ef']}")
+    else:
+        print(f"No configuration reached recall@k >= {args.target_recall}; try larger --search-ef/--m values")
+
+    write_results("sweep_hnsw", {
+        "chunks": len(chunks),
+        "questions": len(questions),
+        "model": args.model,
+        "backend": args.backend,
+        "target_recall": args.target_recall,
+        "exact_hit_at_k": exact_hits,
+        "runs": runs,
+        "recommended": recommended and {key: recommended[key] for key in ("M", "construction_ef", "search_ef")},
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
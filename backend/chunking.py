@@ -0,0 +1,73 @@
+"""Simple text splitter shared by the apps, ingestion and benchmarks"""
+
+from typing import Iterable, Iterator
+
+
+def _chunk_end(text: str, start: int, chunk_size: int) -> int:
+    """End of the chunk starting at `start`, moved back to a sentence, paragraph or line break if possible"""
+    end = start + chunk_size
+
+    # Look for sentence endings
+    sentence_end = text.rfind('.', start, end)
+    if sentence_end > start + chunk_size // 2:
+        return sentence_end + 1
+
+    # Look for paragraph breaks
+    para_end = text.rfind('\n\n', start, end)
+    if para_end > start + chunk_size // 2:
+        return para_end + 2
+
+    # Look for line breaks
+    line_end = text.rfind('\n', start, end)
+    if line_end > start + chunk_size // 2:
+        return line_end + 1
+    return end
+
+
+def iter_text_chunks(pieces: Iterable[str], chunk_size: int = 800, chunk_overlap: int = 150) -> Iterator[str]:
+    """Split text that arrives in pieces into overlapping chunks, lazily.
+
+    Yields exactly the chunks split_text_into_chunks would return for the
+    concatenated text, but only holds the unchunked tail (at most about one
+    piece plus one chunk) in memory.
+    """
+    buffer = ""
+    start = 0
+    split = False
+
+    for piece in pieces:
+        buffer += piece
+        # A chunk is only cut once the text past its end has arrived, so the break search sees what it would in one string
+        while start + chunk_size < len(buffer):
+            end = _chunk_end(buffer, start, chunk_size)
+            chunk = buffer[start:end].strip()
+            if chunk:
+                yield chunk
+            start = end - chunk_overlap
+            split = True
+        buffer = buffer[start:]
+        start = 0
+
+    if not split and len(buffer) <= chunk_size:
+        yield buffer
+        return
+
+    while start < len(buffer):
+        end = start + chunk_size
+
+        # Try to break at sentence boundary
+        if end < len(buffer):
+            end = _chunk_end(buffer, start, chunk_size)
+
+        chunk = buffer[start:end].strip()
+        if chunk:
+            yield chunk
+
+        start = end - chunk_overlap
+        if start >= len(buffer):
+            break
+
+
+def split_text_into_chunks(text: str, chunk_size: int = 800, chunk_overlap: int = 150) -> list[str]:
+    """Split text into overlapping chunks"""
+    return list(iter_text_chunks([text], chunk_size, chunk_overlap))
@@ -0,0 +1,166 @@
+"""
+Compact embedding storage for the in-process (snapshot) search path.
+
+Two optional, independent stages shrink the [chunks, dim] float32 matrix:
+
+- projection to fewer dimensions: "pca" (fitted on the corpus vectors at
+  export time) or "truncate" (keep the leading dimensions, Matryoshka-style;
+  only sensible for models trained that way, all-MiniLM is not)
+- storage type: float16, or int8 with a per-dimension scale
+
+Queries go through the same projection, and scores are computed block by
+block against the stored matrix, so the full-precision matrix is never
+materialized. recall_at_k() measures what a configuration costs against
+full-precision exact search.
+"""
+
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+PROJECTIONS = ("pca", "truncate")
+DTYPES = ("float32", "float16", "int8")
+# Rows processed at a time when fitting PCA or scoring a float16/int8 matrix
+BLOCK_ROWS = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a float32 matrix"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class Projection:
+    """Linear map to `dim` dimensions that approximately preserves dot products between unit vectors"""
+
+    def __init__(self, method: str, components: Optional[np.ndarray], dim: int):
+        self.method = method
+        self.components = components
+        self.dim = dim
+
+    @classmethod
+    def fit(cls, method: str, vectors: np.ndarray, dim: int) -> "Projection":
+        if method not in PROJECTIONS:
+            raise ValueError(f"Unknown projection {method!r}; expected one of {', '.join(PROJECTIONS)}")
+        if not 0 < dim < vectors.shape[1]:
+            raise ValueError(f"Projection dimension must be between 1 and {vectors.shape[1] - 1}, got {dim}")
+        if method == "truncate":
+            return cls(method, None, dim)
+        # Uncentered second moments, accumulated block by block so a large corpus isn't copied whole;
+        # its top axes keep the most of every dot product (centering would distort cosine scores)
+        moments = np.zeros((vectors.shape[1], vectors.shape[1]))
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float64)
+            moments += block.T @ block
+        _, axes = np.linalg.eigh(moments)
+        return cls(method, np.ascontiguousarray(axes[:, ::-1][:, :dim], dtype=np.float32), dim)
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Project without renormalizing, so scores stay close to the full-dimension cosine"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.components is None:
+            return np.ascontiguousarray(vectors[..., :self.dim])
+        return vectors @ self.components
+
+    def save(self, path: str):
+        arrays = {} if self.components is None else {"components": self.components}
+        np.savez(path, method=np.array(self.method), dim=np.array(self.dim), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        data = np.load(path)
+        components = data["components"] if "components" in data.files else None
+        return cls(str(data["method"]), components, int(data["dim"]))
+
+
+class CompactVectors:
+    """Unit vectors stored as float32, float16 or int8 (with a per-dimension scale), scored by dot product"""
+
+    def __init__(self, stored: np.ndarray, scale: Optional[np.ndarray] = None):
+        self.stored = stored
+        self.scale = scale
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray, dtype: str) -> "CompactVectors":
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown storage type {dtype!r}; expected one of {', '.join(DTYPES)}")
+        if dtype != "int8":
+            return cls(np.ascontiguousarray(vectors, dtype=dtype))
+        scale = np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127
+        stored = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        return cls(stored, scale.astype(np.float32))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.stored.nbytes + (self.scale.nbytes if self.scale is not None else 0))
+
+    def __len__(self) -> int:
+        return int(self.stored.shape[0])
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Dot product of every stored vector with a float32 query"""
+        if self.scale is not None:
+            # (stored * scale) @ query == stored @ (scale * query)
+            query = query * self.scale
+        if self.stored.dtype == np.float32:
+            return self.stored @ query
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            scores[start:start + BLOCK_ROWS] = self.stored[start:start + BLOCK_ROWS].astype(np.float32) @ query
+        return scores
+
+    def rows(self, indexes) -> np.ndarray:
+        """Stored vectors decoded back to float32"""
+        rows = np.asarray(self.stored[indexes], dtype=np.float32)
+        return rows * self.scale if self.scale is not None else rows
+
+    def save(self, directory: str):
+        np.save(os.path.join(directory, "embeddings.npy"), self.stored)
+        if self.scale is not None:
+            np.save(os.path.join(directory, "scale.npy"), self.scale)
+
+    @classmethod
+    def load(cls, directory: str) -> "CompactVectors":
+        scale_path = os.path.join(directory, "scale.npy")
+        scale = np.load(scale_path) if os.path.exists(scale_path) else None
+        return cls(np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r"), scale)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if not k:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def recall_at_k(full: np.ndarray, queries: np.ndarray, vectors: CompactVectors,
+                projection: Optional[Projection] = None, k: int = 10) -> float:
+    """Mean overlap of the compact top-k with the full-precision exact top-k for unit-length `queries`"""
+    overlaps = []
+    for query in queries:
+        truth = set(top_k(full @ query, k).tolist())
+        compact_query = projection.apply(query) if projection else query
+        found = set(top_k(vectors.scores(compact_query), k).tolist())
+        overlaps.append(len(truth & found) / max(len(truth), 1))
+    return round(float(np.mean(overlaps)), 4) if overlaps else 1.0
+
+
+def compact_report(full: np.ndarray, vectors: CompactVectors, projection: Optional[Projection],
+                   k: int = 10, sample: int = 500, seed: int = 0) -> Dict[str, float]:
+    """Size and recall@k against full precision, using a sample of the corpus vectors as queries.
+
+    Each sampled query also finds itself, so this is somewhat kinder than
+    recall for real questions (benchmarks/bench_compact.py measures those).
+    """
+    rng = np.random.default_rng(seed)
+    queries = full[rng.choice(len(full), size=min(sample, len(full)), replace=False)] if len(full) else full
+    return {
+        "k": k,
+        "queries": int(len(queries)),
+        "recall_at_k": recall_at_k(full, queries, vectors, projection, k),
+        "full_mb": round(full.nbytes / (1024 * 1024), 2),
+        "compact_mb": round(vectors.nbytes / (1024 * 1024), 2),
+    }
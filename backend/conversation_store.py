@@ -0,0 +1,72 @@
+"""
+Conversation store for the agent engines.
+
+Conversations are kept per `thread_id` as ConversationHistory objects (see
+history.py). The least recently used conversations are dropped once more
+than `max_conversations` are held.
+
+With a shared state backend (STATE_BACKEND=redis), histories are instead
+loaded from it at the start of every turn and saved back with `save()`, so
+a conversation can continue on any worker. Saved conversations expire after
+AGENT_CONVERSATION_TTL seconds without a turn.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from history import ConversationHistory
+from state_backend import StateBackend
+
+AGENT_MAX_CONVERSATIONS = int(os.getenv("AGENT_MAX_CONVERSATIONS", "10000"))
+AGENT_CONVERSATION_TTL = float(os.getenv("AGENT_CONVERSATION_TTL", "86400"))
+
+
+class ConversationStore:
+    """Conversation histories keyed by thread_id, in-process (LRU-bounded) or in a shared state backend"""
+
+    def __init__(self, max_conversations: int = AGENT_MAX_CONVERSATIONS, state: Optional[StateBackend] = None,
+                 ttl: float = AGENT_CONVERSATION_TTL):
+        self.max_conversations = max_conversations
+        self.state = state
+        self.ttl = ttl
+        self._conversations: "OrderedDict[str, ConversationHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_thread_id() -> str:
+        return f"conv_{uuid.uuid4().hex}"
+
+    def get(self, thread_id: str, create: Callable[[], ConversationHistory]) -> ConversationHistory:
+        """History of a conversation, created with `create()` for unknown thread ids"""
+        if self.state is not None:
+            history = create()
+            data = self.state.get(f"conversation:{thread_id}")
+            if data:
+                history.restore(data)
+            return history
+
+        with self._lock:
+            history = self._conversations.get(thread_id)
+            if history is None:
+                history = self._conversations[thread_id] = create()
+                while len(self._conversations) > self.max_conversations:
+                    self._conversations.popitem(last=False)
+            self._conversations.move_to_end(thread_id)
+            return history
+
+    def save(self, thread_id: str, history: ConversationHistory):
+        """Store a history after a turn; a no-op for in-process histories, which are shared objects"""
+        if self.state is not None:
+            self.state.set(f"conversation:{thread_id}", history.to_dict(), ttl=self.ttl)
+
+    def delete(self, thread_id: str):
+        if self.state is not None:
+            self.state.delete(f"conversation:{thread_id}")
+        with self._lock:
+            self._conversations.pop(thread_id, None)
+
+    def __len__(self) -> int:
+        return len(self._conversations)
@@ -0,0 +1,209 @@
+"""
+Near-duplicate chunk detection at ingest and diversified (MMR) retrieval.
+
+The documents in data/ repeat boilerplate (contact details, pricing lines),
+which otherwise becomes many near-identical vectors that crowd the top-k.
+
+- At ingest, every chunk gets a 64-bit SimHash of its word shingles. Chunks
+  within DEDUP_MAX_DISTANCE bits of an already kept chunk are skipped and
+  their source is recorded on the kept chunk (`also_in` metadata).
+- At query time, max_marginal_relevance() re-ranks a wider candidate set so
+  the returned chunks are relevant but not redundant with each other.
+"""
+
+import hashlib
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "true").lower() in ("1", "true", "yes")
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", "4"))
+
+SHINGLE_SIZE = 3
+HASH_BITS = 64
+# With 4 bands of 16 bits, two hashes within 3 bits of each other share at least one band
+BANDS = 4
+
+
+def _shingles(text: str) -> List[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles"""
+    weights = [0] * HASH_BITS
+    for shingle in _shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(HASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(HASH_BITS) if weights[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """SimHash index answering "is there a kept chunk within max_distance bits?" via band buckets"""
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance must be below {BANDS} for band lookups to be exact")
+        self.max_distance = max_distance
+        self._buckets: Dict[Tuple[int, int], List[Tuple[int, Any]]] = {}
+
+    @staticmethod
+    def _bands(fingerprint: int):
+        width = HASH_BITS // BANDS
+        for band in range(BANDS):
+            yield band, fingerprint >> (band * width) & ((1 << width) - 1)
+
+    def find(self, fingerprint: int) -> Any:
+        """Key of a near-duplicate already in the index, or None"""
+        for band in self._bands(fingerprint):
+            for other, key in self._buckets.get(band, ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint: int, key: Any):
+        for band in self._bands(fingerprint):
+            self._buckets.setdefault(band, []).append((fingerprint, key))
+
+
+class ChunkDeduplicator:
+    """Near-duplicate filter over a stream of chunk entries.
+
+    Kept chunks are passed on as they arrive, so only fingerprints and ids are
+    held, not chunk text. Sources of skipped duplicates are collected in
+    `also_in` (kept chunk id -> other sources) once the stream is consumed.
+    """
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.index = NearDuplicateIndex(max_distance)
+        self.skipped = 0
+        self.also_in: Dict[str, List[str]] = {}
+
+    def filter(self, documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for doc in documents:
+            fingerprint = simhash(doc["text"])
+            duplicate_of = self.index.find(fingerprint)
+            if duplicate_of is None:
+                self.index.add(fingerprint, (doc["id"], doc["source"]))
+                yield doc
+                continue
+            self.skipped += 1
+            original_id, original_source = duplicate_of
+            sources = self.also_in.setdefault(original_id, [])
+            if doc["source"] != original_source and doc["source"] not in sources:
+                sources.append(doc["source"])
+
+
+def deduplicate_chunks(documents: List[Dict[str, Any]],
+                       max_distance: int = DEDUP_MAX_DISTANCE) -> Tuple[List[Dict[str, Any]], int]:
+    """Drop chunks that nearly duplicate an earlier one.
+
+    The kept chunk's `also_in` lists the other sources the text appeared in.
+    Returns the kept documents and the number skipped.
+    """
+    deduplicator = ChunkDeduplicator(max_distance)
+    kept = list(deduplicator.filter(documents))
+    for doc in kept:
+        if deduplicator.also_in.get(doc["id"]):
+            doc["also_in"] = deduplicator.also_in[doc["id"]]
+    return kept, deduplicator.skipped
+
+
+def record_also_in(collection, also_in: Dict[str, List[str]]):
+    """Add `also_in` metadata to chunks that were indexed before their duplicates were seen"""
+    ids = [chunk_id for chunk_id, sources in also_in.items() if sources]
+    if not ids:
+        return
+    existing = collection.get(ids=ids, include=["metadatas"])
+    metadatas = [{**(metadata or {}), "also_in": ",".join(also_in[chunk_id])}
+                 for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])]
+    collection.update(ids=existing["ids"], metadatas=metadatas)
+
+
+def dependent_sources(collection, sources: Iterable[str]) -> Set[str]:
+    """Other sources whose duplicate chunks were skipped in favour of chunks of `sources`.
+
+    Their text is in the index only as those kept chunks, so re-indexing or
+    removing `sources` has to re-index these too. Followed transitively, as
+    their own kept chunks may stand in for further sources.
+    """
+    seen = set(sources)
+    pending = set(seen)
+    while pending:
+        result = collection.get(where={"source": {"$in": sorted(pending)}}, include=["metadatas"])
+        pending = set()
+        for metadata in result["metadatas"]:
+            for source in (metadata or {}).get("also_in", "").split(","):
+                if source and source not in seen:
+                    seen.add(source)
+                    pending.add(source)
+    return seen - set(sources)
+
+
+def max_marginal_relevance(query_embedding, candidate_embeddings, k: int, lambda_mult: float = MMR_LAMBDA,
+                           relevance: Optional[np.ndarray] = None) -> List[int]:
+    """Indices of k candidates balancing similarity to the query against similarity to those already picked.
+
+    `relevance` (cosine similarity of each candidate to the query) replaces
+    the query embedding when given, e.g. for candidates in a projected space.
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if len(candidates) == 0:
+        return []
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        relevance = candidates @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        relevance = np.array(relevance, dtype=np.float32)
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to anything selected so far
+    redundancy = candidates @ candidates[selected[0]]
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
+
+
+def diverse_query(collection, query_embedding: np.ndarray, n_results: int) -> Dict[str, Any]:
+    """collection.query() for one embedding, re-ranked with MMR when RETRIEVAL_MMR is on.
+
+    Returns the same shape as collection.query (lists of lists).
+    """
+    if not RETRIEVAL_MMR:
+        return collection.query(query_embeddings=[query_embedding], n_results=n_results)
+
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_results * MMR_FETCH_MULTIPLIER,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
+    if not results["ids"] or not results["ids"][0]:
+        return results
+
+    # Both ChromaDB (cosine space) and snapshots return cosine distances; a snapshot's
+    # candidate embeddings may be projected, so relevance comes from the distances
+    relevance = 1 - np.asarray(results["distances"][0], dtype=np.float32)
+    order = max_marginal_relevance(query_embedding, results["embeddings"][0], n_results, relevance=relevance)
+    picked = {}
+    for field in ("ids", "documents", "metadatas", "distances"):
+        values = results.get(field)
+        picked[field] = [[values[0][i] for i in order]] if values else values
+    return picked
@@ -0,0 +1,124 @@
+"""
+Persistent, content-addressed embedding cache used by ingestion.
+
+Vectors are stored in SQLite as float32 blobs keyed by
+sha256(model namespace + chunk text). Rebuilding a collection, wiping
+CHROMA_DIR or standing up a new node from a copied cache file then costs disk
+reads instead of model inference; only new or edited chunks are encoded.
+The cache lives outside CHROMA_DIR and is shared by all tenants.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import record_cache
+
+# SQLite's default limit on host parameters is 999
+LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """SQLite store of embeddings keyed by model namespace and text hash"""
+
+    def __init__(self, path: str, namespace: str, resolve_namespace: Optional[Callable[[], str]] = None):
+        self.path = path
+        self.namespace = namespace
+        # Re-checked on every encode() when the vectors come from another process that may change
+        self.resolve_namespace = resolve_namespace
+        self.stats = {"hits": 0, "misses": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, None where missing"""
+        keys = [self.key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, dim, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32, count=dim)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows = [(self.key(text), int(vector.shape[0]), vector.tobytes()) for text, vector in zip(texts, vectors)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def encode(self, embedding_model, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """Embeddings for texts, encoding only those not cached; returns (vectors, cache hits)"""
+        if self.resolve_namespace is not None:
+            self.namespace = self.resolve_namespace()
+        cached = self.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        hits = len(texts) - len(missing)
+        self.stats["hits"] += hits
+        self.stats["misses"] += len(missing)
+        for vector in cached:
+            record_cache("embedding_store", vector is not None)
+
+        if missing:
+            # Duplicate texts in one batch are encoded once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = np.asarray(embedding_model.encode(unique_texts), dtype=np.float32)
+            self.put_many(unique_texts, encoded)
+            by_text = dict(zip(unique_texts, encoded))
+            for i in missing:
+                cached[i] = by_text[texts[i]]
+
+        if not cached:
+            return np.zeros((0, 0), dtype=np.float32), 0
+        return np.stack(cached), hits
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def cache_namespace(model_name: str, backend: str) -> str:
+    """Namespace of the vectors a model produces with a backend"""
+    # torch and fp32 ONNX produce the same vectors; int8 quantization changes them
+    return f"{model_name}:int8" if backend == "onnx-int8" else model_name
+
+
+def create_embedding_cache(model_name: str, backend: str, embedding_model=None) -> Optional[EmbeddingCache]:
+    """EmbeddingCache configured from the environment, or None when disabled.
+
+    Reads EMBED_CACHE_ENABLED and EMBED_CACHE_PATH. With the remote backend
+    the namespace is the model and backend the embedding server reports.
+    """
+    if os.getenv("EMBED_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    path = os.getenv("EMBED_CACHE_PATH", "./embedding_cache.sqlite3")
+    if backend != "remote":
+        return EmbeddingCache(path, cache_namespace(model_name, backend))
+
+    def resolve_namespace() -> str:
+        server = embedding_model.stats()
+        if not server.get("model") or not server.get("backend"):
+            # A server that doesn't say what it runs gets entries of its own
+            return f"{model_name}:remote"
+        return cache_namespace(server["model"], server["backend"])
+
+    return EmbeddingCache(path, f"{model_name}:remote", resolve_namespace)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Shared embedding server
+
+One process owns the embedding model and every uvicorn worker sends it
+encode requests over a local Unix socket, so memory stays flat as workers are
+added. Requests arriving from different workers within a short window are
+merged into a single model batch.
+
+Usage:
+    python embedding_server.py --backend onnx-int8 &
+    EMBED_BACKEND=remote uvicorn app_enhanced:app --workers 4
+
+Wire format (both directions): 4-byte big-endian header length, JSON header,
+then an optional binary payload whose size is given by the header. Responses
+to encode requests carry the embeddings as raw float32 row-major bytes.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_SOCKET_PATH = "/tmp/heygen-embed.sock"
+
+_HEADER = struct.Struct(">I")
+
+
+def _encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    header = dict(header, payload_bytes=len(payload))
+    raw = json.dumps(header).encode("utf-8")
+    return _HEADER.pack(len(raw)) + raw + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader):
+    size = _HEADER.unpack(await reader.readexactly(_HEADER.size))[0]
+    header = json.loads(await reader.readexactly(size))
+    payload = await reader.readexactly(header.get("payload_bytes", 0))
+    return header, payload
+
+
+class EmbeddingServer:
+    """Serves encode requests from many clients, batching them together"""
+
+    def __init__(self, model, socket_path: str = DEFAULT_SOCKET_PATH,
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 model_name: Optional[str] = None, backend: Optional[str] = None):
+        self.model = model
+        # Reported in stats, so clients (e.g. the embedding cache) know which vectors they get
+        self.model_name = model_name
+        self.backend = backend
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self.stats = {"requests": 0, "batches": 0, "texts": 0, "errors": 0}
+
+    async def serve(self):
+        """Listen on the Unix socket until cancelled"""
+        self.queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        batcher = asyncio.create_task(self._batch_loop())
+        print(f"Embedding server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header, _ = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                op = header.get("op", "encode")
+                if op == "stats":
+                    writer.write(_encode_frame(dict(self.stats, queue_depth=self.queue.qsize(),
+                                                    model=self.model_name, backend=self.backend)))
+                elif op == "encode":
+                    self.stats["requests"] += 1
+                    future = asyncio.get_running_loop().create_future()
+                    await self.queue.put((header.get("texts", []), future))
+                    try:
+                        vectors = await future
+                        writer.write(_encode_frame({"shape": list(vectors.shape)}, vectors.tobytes()))
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        writer.write(_encode_frame({"error": str(e)}))
+                else:
+                    writer.write(_encode_frame({"error": f"Unknown op '{op}'"}))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _batch_loop(self):
+        """Collect queued requests into batches and run the model on them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            n_texts = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Keep pulling requests until the batch is full or the window closes
+            while n_texts < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_texts += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(None, self._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(self.model.encode(texts), dtype=np.float32)
+
+
+class RemoteEmbeddingModel:
+    """Client for EmbeddingServer with the same `encode()` interface as the local models"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # One connection per thread; requests on a connection are strictly sequential
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _recv_exactly(self, sock: socket.socket, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("Embedding server closed the connection")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _request(self, header: dict):
+        frame = _encode_frame(header)
+        # Retry once on a stale connection (e.g. the server was restarted)
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(frame)
+                size = _HEADER.unpack(self._recv_exactly(sock, _HEADER.size))[0]
+                response = json.loads(self._recv_exactly(sock, size))
+                payload = self._recv_exactly(sock, response.get("payload_bytes", 0))
+                return response, payload
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt == 1:
+                    raise
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        """Encode texts on the shared embedding server"""
+        if isinstance(texts, str):
+            texts = [texts]
+        response, payload = self._request({"op": "encode", "texts": list(texts)})
+        if "error" in response:
+            raise RuntimeError(f"Embedding server error: {response['error']}")
+        return np.frombuffer(payload, dtype=np.float32).reshape(response["shape"])
+
+    def stats(self) -> dict:
+        """Server-side counters, the current queue depth and the model and backend the server runs"""
+        response, _ = self._request({"op": "stats"})
+        response.pop("payload_bytes", None)
+        return response
+
+
+def wait_for_server(socket_path: str, timeout: float = 60.0) -> bool:
+    """Block until the embedding server accepts connections"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared embedding server")
+    parser.add_argument("--model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", default=os.getenv("EMBED_SERVER_BACKEND", "torch"),
+                        help="Backend that actually runs the model: torch | onnx | onnx-int8")
+    parser.add_argument("--socket", default=os.getenv("EMBED_SERVER_SOCKET", DEFAULT_SOCKET_PATH))
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="How long to wait for more requests before running a batch")
+    args = parser.parse_args()
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from embeddings import load_embedding_model
+
+    if args.backend == "remote":
+        parser.error("The embedding server cannot itself use the remote backend")
+
+    print(f"Loading {args.model} ({args.backend})...")
+    model = load_embedding_model(args.model, args.backend)
+    server = EmbeddingServer(model, args.socket, args.max_batch_size, args.max_wait_ms,
+                             model_name=args.model, backend=args.backend)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
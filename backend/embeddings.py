@@ -0,0 +1,148 @@
+"""
+Embedding model backends.
+
+The default backend is full-precision PyTorch via SentenceTransformer. For
+CPU-only deployments the same model can be run through ONNX Runtime, with
+optional int8 dynamic quantization:
+
+    EMBED_BACKEND=torch      # SentenceTransformer (default)
+    EMBED_BACKEND=onnx       # ONNX Runtime, fp32
+    EMBED_BACKEND=onnx-int8  # ONNX Runtime, int8 dynamic quantization
+    EMBED_BACKEND=remote     # shared model served by embedding_server.py
+
+Every backend exposes `encode(texts)` returning a float32 NumPy array, which
+the rest of the app passes on to ChromaDB and snapshot indexes as is.
+"""
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+EMBED_BACKENDS = ["torch", "onnx", "onnx-int8", "remote"]
+
+
+class OnnxEmbeddingModel:
+    """Sentence embedding model running on ONNX Runtime (mean pooling + L2 norm)"""
+
+    def __init__(self, model_name: str, quantize: bool = False, cache_dir: Optional[str] = None,
+                 max_seq_length: int = 256, normalize: bool = True):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                f"EMBED_BACKEND=onnx requires onnxruntime and transformers ({e}). "
+                "Install them with: pip install onnxruntime optimum[onnxruntime]"
+            )
+
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+
+        # Exported models are cached so the export only happens once per node
+        cache_dir = cache_dir or os.getenv("ONNX_CACHE_DIR", "./onnx_models")
+        model_dir = Path(cache_dir) / model_name.replace("/", "__")
+        onnx_path = model_dir / "model.onnx"
+        if not onnx_path.exists():
+            export_onnx_model(model_name, model_dir)
+
+        if quantize:
+            quantized_path = model_dir / "model_int8.onnx"
+            if not quantized_path.exists():
+                quantize_onnx_model(onnx_path, quantized_path)
+            onnx_path = quantized_path
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Inference is dispatched one request at a time from the event loop, so
+        # let ORT use every core for that single request
+        options.intra_op_num_threads = int(os.getenv("ONNX_NUM_THREADS", "0"))
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.encode(["dimension probe"]).shape[1])
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Encode texts into L2-normalized float32 embeddings"""
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Sort by length so each batch pads to a similar size, then restore order
+        order = np.argsort([-len(t) for t in texts])
+        embeddings = [None] * len(texts)
+
+        for start in range(0, len(texts), batch_size):
+            batch_idx = order[start:start + batch_size]
+            batch = [texts[i] for i in batch_idx]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            inputs = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            # Mean pooling over non-padding tokens
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            counts = np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled = summed / counts
+
+            if self.normalize:
+                norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+                pooled = pooled / np.clip(norms, 1e-12, None)
+
+            for i, vec in zip(batch_idx, pooled):
+                embeddings[i] = vec
+
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+def export_onnx_model(model_name: str, model_dir: Path):
+    """Export a Hugging Face sentence-transformers model to ONNX"""
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise RuntimeError(f"Exporting {model_name} to ONNX requires optimum[onnxruntime] ({e})")
+
+    print(f"Exporting {model_name} to ONNX in {model_dir}...")
+    model_dir.mkdir(parents=True, exist_ok=True)
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(str(model_dir))
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(str(model_dir))
+
+
+def quantize_onnx_model(onnx_path: Path, quantized_path: Path):
+    """Apply int8 dynamic quantization to the weights of an ONNX model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"Quantizing {onnx_path} to int8...")
+    quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+
+
+def load_embedding_model(model_name: str, backend: str = "torch"):
+    """Load the embedding model with the requested backend"""
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND '{backend}'. Choose one of: {', '.join(EMBED_BACKENDS)}")
+
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    if backend == "remote":
+        # The model itself lives in the embedding server process; model_name is
+        # decided there (see embedding_server.py)
+        from embedding_server import DEFAULT_SOCKET_PATH, RemoteEmbeddingModel
+        return RemoteEmbeddingModel(os.getenv("EMBED_SERVER_SOCKET", DEFAULT_SOCKET_PATH))
+
+    return OnnxEmbeddingModel(model_name, quantize=(backend == "onnx-int8"))
@@ -0,0 +1,124 @@
+"""
+Cached component health for liveness/readiness probes.
+
+Probes never touch the model or the database themselves. A background task
+runs the registered checks every HEALTH_CHECK_INTERVAL seconds and the
+`/readyz` endpoint just returns the last result. Until the registered
+warm-up has succeeded once, each round retries it first, so a dependency
+that comes up late (e.g. the embedding server) doesn't leave the node
+unready for good.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+
+class HealthChecker:
+    """Runs component checks in the background and caches the result"""
+
+    def __init__(self, interval: float = 15.0):
+        self.interval = interval
+        self.checks: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.queues: Dict[str, Callable[[], int]] = {}
+        self.info: Dict[str, Callable[[], Any]] = {}
+        self.warmed_up = False
+        self._warm_up: Optional[Callable[[], Any]] = None
+        self.state: Dict[str, Any] = {
+            "ready": False,
+            "checked_at": None,
+            "components": {},
+            "queues": {},
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def register_check(self, name: str, check: Callable[[], Dict[str, Any]]):
+        """Register a component check; it returns details or raises if the component is down"""
+        self.checks[name] = check
+
+    def register_queue(self, name: str, depth: Callable[[], int]):
+        """Register a queue whose current depth is reported in readiness"""
+        self.queues[name] = depth
+
+    def register_info(self, name: str, value: Callable[[], Any]):
+        """Register a value (e.g. index version) that is reported as-is"""
+        self.info[name] = value
+
+    def register_warm_up(self, warm_up: Callable[[], Any]):
+        """Register the (blocking) warm-up that readiness waits for"""
+        self._warm_up = warm_up
+
+    def warm_up(self) -> bool:
+        """Run the warm-up unless it already succeeded; returns whether the node is warmed up"""
+        if self.warmed_up or self._warm_up is None:
+            return self.warmed_up
+        try:
+            self._warm_up()
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+            return False
+        self.warmed_up = True
+        return True
+
+    def refresh(self) -> Dict[str, Any]:
+        """Run every check once (retrying a failed warm-up first) and update the cached state"""
+        started = time.perf_counter()
+        self.warm_up()
+        components = {}
+        ready = self.warmed_up
+        for name, check in self.checks.items():
+            try:
+                components[name] = {"status": "operational", **(check() or {})}
+            except Exception as e:
+                components[name] = {"status": "unavailable", "error": str(e)}
+                ready = False
+
+        queues = {}
+        for name, depth in self.queues.items():
+            try:
+                queues[name] = depth()
+            except Exception:
+                queues[name] = None
+
+        info = {}
+        for name, value in self.info.items():
+            try:
+                info[name] = value()
+            except Exception:
+                info[name] = None
+
+        self.state = {
+            "ready": ready,
+            "warmed_up": self.warmed_up,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "check_duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "components": components,
+            "queues": queues,
+            **info,
+        }
+        return self.state
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Checks may block (database, sockets), so keep them off the event loop
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:
+                print(f"Health check failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background checker on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,143 @@
+"""
+Token-budgeted conversation history for the agent.
+
+Every message's token count is computed once, when it is added, and kept
+next to the message, so enforcing the budget only costs O(new messages)
+instead of re-tokenizing the whole conversation each turn. When the history
+goes over budget the oldest whole turns (a user message and everything up
+to the next one) are folded into a short running summary and dropped.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+# Tokens of conversation history kept verbatim per conversation
+AGENT_HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "3000"))
+# Tokens allowed for the running summary of dropped turns (0 disables summaries)
+AGENT_SUMMARY_TOKEN_BUDGET = int(os.getenv("AGENT_SUMMARY_TOKEN_BUDGET", "300"))
+
+# Role/formatting overhead of one chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_WORDS_PER_MESSAGE = 30
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Text of a chat message that counts towards the prompt"""
+    text = message.get("content") or ""
+    for call in message.get("tool_calls") or []:
+        text += call["function"]["name"] + call["function"]["arguments"]
+    return text
+
+
+def extractive_summary(summary: str, dropped: List[Dict[str, Any]]) -> str:
+    """Append the opening words of each dropped user/assistant message to the summary.
+
+    Tool calls and tool results are left out; the assistant reply that
+    follows them already states what came of them.
+    """
+    lines = [summary] if summary else []
+    for message in dropped:
+        if message["role"] not in ("user", "assistant") or not message.get("content"):
+            continue
+        words = message["content"].split()
+        text = " ".join(words[:SUMMARY_WORDS_PER_MESSAGE]) + (" ..." if len(words) > SUMMARY_WORDS_PER_MESSAGE else "")
+        lines.append(f"{message['role'].capitalize()}: {text}")
+    return "\n".join(lines)
+
+
+class ConversationHistory:
+    """Messages of one conversation plus a summary of the turns dropped from it"""
+
+    def __init__(self, count_tokens_func: Callable[[str], int], token_budget: int = AGENT_HISTORY_TOKEN_BUDGET,
+                 summary_token_budget: int = AGENT_SUMMARY_TOKEN_BUDGET,
+                 summarize_func: Callable[[str, List[Dict[str, Any]]], str] = extractive_summary):
+        self.count_tokens = count_tokens_func
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.summarize = summarize_func
+
+        self.messages: List[Dict[str, Any]] = []
+        self._token_counts: List[int] = []
+        self.tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
+        self.dropped_messages = 0
+
+    def _count(self, message: Dict[str, Any]) -> int:
+        return self.count_tokens(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+
+    def extend(self, messages: List[Dict[str, Any]]):
+        """Add messages, counting tokens for the new messages only"""
+        for message in messages:
+            count = self._count(message)
+            self.messages.append(message)
+            self._token_counts.append(count)
+            self.tokens += count
+
+    def compact(self, reserve_tokens: int = 0) -> int:
+        """Drop the oldest turns until the history plus `reserve_tokens` fits the budget.
+
+        The latest turn is always kept. Returns the number of messages dropped.
+        """
+        # Turns start at user messages; never cut a tool call off from its results
+        turn_starts = [i for i, message in enumerate(self.messages) if message["role"] == "user"]
+        cut = 0
+        remaining = self.tokens
+        for next_start in turn_starts[1:]:
+            if remaining + reserve_tokens <= self.token_budget:
+                break
+            remaining -= sum(self._token_counts[cut:next_start])
+            cut = next_start
+        if cut == 0:
+            return 0
+
+        dropped = self.messages[:cut]
+        self.messages = self.messages[cut:]
+        self._token_counts = self._token_counts[cut:]
+        self.tokens = remaining
+        self.dropped_messages += cut
+        if self.summary_token_budget > 0:
+            self._set_summary(self.summarize(self.summary, dropped))
+        return cut
+
+    def _set_summary(self, summary: str):
+        # Keep the newest summary lines that fit; the summary itself is small so recounting it is cheap
+        lines = summary.splitlines()
+        tokens = self.count_tokens(summary)
+        while lines and tokens > self.summary_token_budget:
+            lines.pop(0)
+            summary = "\n".join(lines)
+            tokens = self.count_tokens(summary)
+        self.summary = summary
+        self.summary_tokens = tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state, for keeping histories in a shared state backend"""
+        return {
+            "messages": self.messages,
+            "token_counts": self._token_counts,
+            "summary": self.summary,
+            "summary_tokens": self.summary_tokens,
+            "dropped_messages": self.dropped_messages,
+        }
+
+    def restore(self, data: Dict[str, Any]):
+        """Load state saved by to_dict(); token counts are reused, not recomputed"""
+        self.messages = list(data["messages"])
+        self._token_counts = list(data["token_counts"])
+        self.tokens = sum(self._token_counts)
+        self.summary = data["summary"]
+        self.summary_tokens = data["summary_tokens"]
+        self.dropped_messages = data["dropped_messages"]
+
+    def summary_instructions(self) -> Optional[str]:
+        if not self.summary:
+            return None
+        return f"Summary of the earlier part of this conversation:\n{self.summary}"
+
+    def context(self) -> List[Dict[str, Any]]:
+        """Messages to send to the model: the summary (if any) followed by the kept messages"""
+        instructions = self.summary_instructions()
+        if instructions is None:
+            return list(self.messages)
+        return [{"role": "system", "content": instructions}] + self.messages
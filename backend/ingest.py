@@ -1,35 +1,69 @@
 #!/usr/bin/env python3
 """
 Helper script to ingest documents into ChromaDB
-Usage: python ingest.py
+Usage: python ingest.py [--snapshot DIR [--dim N] [--projection pca|truncate] [--dtype float16|int8]] [--no-ingest]
+
+With --snapshot the index is also exported as a portable snapshot that new
+nodes can serve at startup (SNAPSHOT_PATH=DIR); --no-ingest exports the
+existing index without rebuilding it. --dim and --dtype store the snapshot's
+vectors reduced and/or quantized, and report recall against full precision.
 """
 
+import argparse
 import asyncio
 import sys
 import os
+import time
 from pathlib import Path
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import app
 from app import ingest_documents, initialize_collection
+from compact import DTYPES, PROJECTIONS
+from snapshot import export_snapshot
 
-async def main():
+async def main(args):
     """Main function to run document ingestion"""
     try:
         print("Initializing ChromaDB collection...")
         initialize_collection()
         
-        print("Starting document ingestion...")
-        result = await ingest_documents()
-        
-        print(f"✅ Success: {result.message}")
-        print(f"📄 Documents processed: {result.documents_processed}")
-        print(f"🔗 Chunks created: {result.chunks_created}")
+        if not args.no_ingest:
+            print("Starting document ingestion...")
+            result = await ingest_documents()
+
+            print(f"✅ Success: {result.message}")
+            print(f"📄 Documents processed: {result.documents_processed}")
+            print(f"🔗 Chunks created: {result.chunks_created}")
+            print(f"♻️  Near-duplicate chunks skipped: {result.duplicates_skipped}")
+            print(f"💾 Embeddings from cache: {result.embeddings_cached} ({result.embedding_cache_hit_ratio:.0%})")
+            print(f"⏱️  Load time: {sum(f['load_seconds'] for f in result.files):.2f}s")
+            for file in result.files:
+                if file["error"]:
+                    print(f"⚠️  {file['source']}: {file['error']}")
         
+        if args.snapshot:
+            start = time.perf_counter()
+            manifest = export_snapshot(app.collection, args.snapshot, app.index_version or app.read_index_version(),
+                                       app.EMBED_MODEL, dim=args.dim, projection=args.projection, dtype=args.dtype)
+            print(f"📦 Snapshot written to {args.snapshot}: {manifest['chunks']} chunks, "
+                  f"version {manifest['index_version']} ({time.perf_counter() - start:.2f}s)")
+            if manifest["compact"]:
+                compact = manifest["compact"]
+                print(f"🗜️  {manifest['dim']} dims as {manifest['dtype']}: {compact['compact_mb']}MB "
+                      f"(full precision {compact['full_mb']}MB), recall@{compact['k']} {compact['recall_at_k']:.3f}")
+
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Ingest documents into ChromaDB")
+    parser.add_argument("--snapshot", metavar="DIR", help="Also export the index as a snapshot to DIR")
+    parser.add_argument("--no-ingest", action="store_true", help="Export the existing index without re-ingesting")
+    parser.add_argument("--dim", type=int, default=0, help="Reduce snapshot vectors to this many dimensions")
+    parser.add_argument("--projection", choices=PROJECTIONS, default="pca", help="How --dim reduces them")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32", help="Stored type of snapshot vectors")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,256 @@
+"""
+Document loaders for ingestion.
+
+Each format registers a loader that streams a file's text in pieces
+(incremental reads for text and HTML, an mmap for JSONL and PDF), and the
+pieces go straight into the streaming chunker. Chunk entries are produced
+lazily, one file at a time, so a multi-hundred-MB source is never held in
+memory whole:
+
+    .md .markdown .txt   text, read READ_SIZE characters at a time
+    .html .htm           visible text (no script/style), block tags as paragraph breaks
+    .jsonl               one record per line: a string, or its text/content/body field
+    .pdf                 page text (needs the optional pypdf package)
+
+Every file gets a FileReport with its size, chunk count, load time and
+error, if any. A file that fails part-way keeps the chunks produced before
+the error; when re-indexing, iter_replacing_chunks() and restore_chunks()
+put back the file's previous chunks instead.
+"""
+
+import json
+import mmap
+import os
+import re
+import time
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from chunking import iter_text_chunks
+
+READ_SIZE = 1 << 20
+JSONL_TEXT_FIELDS = ("text", "content", "body")
+
+Loader = Callable[[str], Iterator[str]]
+
+LOADERS: Dict[str, Loader] = {}
+
+
+@dataclass
+class FileReport:
+    """Outcome of loading one file"""
+    source: str
+    format: str
+    bytes: int = 0
+    chunks: int = 0
+    load_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def register_loader(*extensions: str):
+    """Decorator registering a loader (path -> iterator of text pieces) for file extensions"""
+    def register(loader: Loader) -> Loader:
+        for extension in extensions:
+            LOADERS[extension.lower()] = loader
+        return loader
+    return register
+
+
+def document_patterns() -> List[str]:
+    """Glob patterns of every supported format, e.g. for DataDirWatcher"""
+    return [f"*{extension}" for extension in LOADERS]
+
+
+def find_documents(data_dir: str) -> List[str]:
+    """Supported files directly in data_dir, sorted"""
+    return sorted(
+        os.path.join(data_dir, name) for name in os.listdir(data_dir)
+        if os.path.splitext(name)[1].lower() in LOADERS and os.path.isfile(os.path.join(data_dir, name))
+    )
+
+
+@register_loader(".md", ".markdown", ".txt")
+def load_text(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for piece in iter(lambda: f.read(READ_SIZE), ""):
+            yield piece
+
+
+class _HTMLText(HTMLParser):
+    """Collects the visible text of an HTML document fed to it in pieces"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template"}
+    # What <head> may contain; HTML5 lets pages omit </head>, so any other start tag (or stray text) ends it
+    HEAD_TAGS = {"title", "meta", "link", "base"} | SKIP_TAGS
+    BLOCK_TAGS = {"p", "div", "section", "article", "header", "footer", "li", "ul", "ol", "table", "tr",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "br", "hr", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+        self._in_head = False
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "head":
+            self._in_head = True
+            return
+        if self._in_head and tag not in self.HEAD_TAGS:
+            self._in_head = False
+        if tag in self.SKIP_TAGS:
+            self._skipping += 1
+        elif tag == "title" and self._in_head:
+            self._in_title = True
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self._in_head = False
+        elif tag in self.SKIP_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag == "title" and self._in_title:
+            self._in_title = False
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if self._skipping:
+            return
+        if self._in_head:
+            if self._in_title or not data.strip():
+                return
+            self._in_head = False
+        self.parts.append(data)
+
+    def take(self) -> str:
+        """Text collected since the last call, with markup whitespace collapsed"""
+        text = "".join(self.parts)
+        self.parts.clear()
+        text = re.sub(r"[^\S\n]+", " ", text)
+        text = re.sub(r" *\n *", "\n", text)
+        return re.sub(r"\n{3,}", "\n\n", text)
+
+
+@register_loader(".html", ".htm")
+def load_html(path: str) -> Iterator[str]:
+    parser = _HTMLText()
+    started = False
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for piece in iter(lambda: f.read(READ_SIZE), ""):
+            parser.feed(piece)
+            text = parser.take() if started else parser.take().lstrip()
+            if text:
+                started = True
+                yield text
+    parser.close()
+    text = parser.take()
+    if text:
+        yield text
+
+
+def _mapped(path: str) -> Optional[mmap.mmap]:
+    """Read-only map of a file (None if empty); pages are read in by the OS as they are touched"""
+    if os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@register_loader(".jsonl")
+def load_jsonl(path: str) -> Iterator[str]:
+    data = _mapped(path)
+    if data is None:
+        return
+    with data:
+        for line_number, line in enumerate(iter(data.readline, b""), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {line_number}: {e}")
+            if isinstance(record, dict):
+                record = next((record[field] for field in JSONL_TEXT_FIELDS if isinstance(record.get(field), str)), "")
+            if isinstance(record, str) and record.strip():
+                yield record + "\n\n"
+
+
+@register_loader(".pdf")
+def load_pdf(path: str) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError(f"PDF documents require the pypdf package ({e}). Install it with: pip install pypdf")
+    data = _mapped(path)
+    if data is None:
+        return
+    with data:
+        for page in PdfReader(data).pages:
+            text = page.extract_text() or ""
+            if text.strip():
+                yield text + "\n\n"
+
+
+def iter_document_chunks(path: str, report: FileReport) -> Iterator[Dict[str, Any]]:
+    """Chunk entries of one file, produced lazily; size, chunk count, load time and any error go into `report`"""
+    filename = os.path.basename(path)
+    started = time.perf_counter()
+    try:
+        report.bytes = os.path.getsize(path)
+        pieces = LOADERS[os.path.splitext(path)[1].lower()](path)
+        for i, chunk in enumerate(iter_text_chunks(pieces)):
+            if chunk.strip():  # Skip empty chunks
+                report.chunks += 1
+                # Time spent downstream (embedding, indexing) while this generator is suspended isn't load time
+                report.load_seconds += time.perf_counter() - started
+                yield {
+                    "id": f"{filename}_chunk_{i}",
+                    "text": chunk,
+                    "source": filename,
+                    "chunk_index": i
+                }
+                started = time.perf_counter()
+    except Exception as e:
+        report.error = f"{type(e).__name__}: {e}"
+        print(f"Error processing {path}: {report.error}")
+    finally:
+        report.load_seconds = round(report.load_seconds + time.perf_counter() - started, 4)
+
+
+def iter_files_chunks(paths: Iterable[str], reports: List[FileReport]) -> Iterator[Dict[str, Any]]:
+    """Chunk entries of several files in order, appending one FileReport per file to `reports`"""
+    for path in paths:
+        report = FileReport(source=os.path.basename(path), format=os.path.splitext(path)[1].lower().lstrip("."))
+        reports.append(report)
+        yield from iter_document_chunks(path, report)
+
+
+def iter_replacing_chunks(collection, paths: Iterable[str], reports: List[FileReport],
+                          previous: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Chunk entries of several files, each replacing that file's chunks in `collection`.
+
+    A file's old chunks are deleted as its new ones start streaming. If the
+    file fails to load, its old chunks are left in `previous` (by source) for
+    restore_chunks() once the stream has been indexed.
+    """
+    for path in paths:
+        source = os.path.basename(path)
+        old = collection.get(where={"source": source}, include=["documents", "embeddings", "metadatas"])
+        collection.delete(where={"source": source})
+        report = FileReport(source=source, format=os.path.splitext(path)[1].lower().lstrip("."))
+        reports.append(report)
+        yield from iter_document_chunks(path, report)
+        if report.error:
+            previous[source] = old
+
+
+def restore_chunks(collection, previous: Dict[str, Dict[str, Any]]):
+    """Swap the partly loaded chunks of failed files back to the chunks they had before"""
+    for source, old in previous.items():
+        collection.delete(where={"source": source})
+        if old["ids"]:
+            collection.add(ids=old["ids"], documents=old["documents"], embeddings=old["embeddings"],
+                           metadatas=old["metadatas"])
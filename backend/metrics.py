@@ -0,0 +1,169 @@
+"""
+Prometheus-style metrics.
+
+A small dependency-free registry rendered in the Prometheus text exposition
+format by the `/metrics` endpoint. Stage timers are plain context managers so
+they can wrap any block in app.py, app_enhanced.py and agent_fixed.py:
+
+    with stage_timer("embed"):
+        question_embedding = embedding_model.encode([question])
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with optional labels"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels, values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose samples are read from callbacks at scrape time"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set_function(self, callback: Callable[[], float], *label_values: str):
+        self._callbacks[label_values] = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for values, callback in sorted(self._callbacks.items(), key=lambda item: item[0]):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {float(value)}")
+        return lines
+
+
+# Metric definitions shared by the apps and the agent
+REQUESTS = Counter("heygen_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "status"))
+REQUEST_LATENCY = Histogram("heygen_request_duration_seconds", "HTTP request latency by endpoint", ("endpoint",))
+STAGE_LATENCY = Histogram("heygen_stage_duration_seconds", "Latency of individual request stages", ("stage", "detail"))
+STAGE_ERRORS = Counter("heygen_stage_errors_total", "Stages that raised an exception", ("stage", "detail"))
+CACHE_REQUESTS = Counter("heygen_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("heygen_cache_hit_ratio", "Cache hit ratio since process start", ("cache",))
+QUEUE_DEPTH = Gauge("heygen_queue_depth", "Current depth of work queues", ("queue",))
+PREFETCH_SAVED = Counter("heygen_prefetch_saved_seconds_total", "Retrieval time hidden by speculative knowledge prefetch")
+PREFETCH_UNUSED = Counter("heygen_prefetch_unused_total", "Speculative knowledge prefetches the model never asked for")
+
+METRICS = [REQUESTS, REQUEST_LATENCY, STAGE_LATENCY, STAGE_ERRORS, CACHE_REQUESTS, CACHE_HIT_RATIO, QUEUE_DEPTH,
+           PREFETCH_SAVED, PREFETCH_UNUSED]
+
+
+@contextmanager
+def stage_timer(stage: str, detail: str = ""):
+    """Time a block and record it under heygen_stage_duration_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage, detail)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage, detail)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; the hit ratio gauge is registered on first use"""
+    if (cache,) not in CACHE_HIT_RATIO._callbacks:
+        CACHE_HIT_RATIO.set_function(lambda: cache_hit_ratio(cache), cache)
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def cache_hit_ratio(cache: str) -> float:
+    hits = CACHE_REQUESTS.get(cache, "hit")
+    total = hits + CACHE_REQUESTS.get(cache, "miss")
+    return hits / total if total else 0.0
+
+
+def register_queue(name: str, depth: Callable[[], int]):
+    """Expose a queue depth callback as heygen_queue_depth{queue=name}"""
+    QUEUE_DEPTH.set_function(depth, name)
+
+
+def render_metrics() -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,92 @@
+"""
+Speculative knowledge prefetch for agent turns.
+
+Most receptionist questions end in a search_knowledge call whose question is
+close to the user's literal message. A KnowledgePrefetch starts that
+retrieval in a worker thread as soon as the turn begins, overlapping it with
+thread/run setup and the model's first step. If the model then asks for a
+similar question the prefetched result (the retrieved chunks; synthesis is
+left to the tool call) is used; otherwise it is discarded.
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Any, Callable, Optional
+
+from metrics import PREFETCH_SAVED, PREFETCH_UNUSED, record_cache
+
+AGENT_PREFETCH = os.getenv("AGENT_PREFETCH", "true").lower() in ("1", "true", "yes")
+AGENT_PREFETCH_SIMILARITY = float(os.getenv("AGENT_PREFETCH_SIMILARITY", "0.6"))
+
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "about", "is", "are", "do", "does",
+    "can", "could", "would", "you", "your", "i", "me", "my", "we", "us", "our", "what", "how", "tell", "please",
+    "it", "this", "that", "be", "there", "any",
+}
+
+
+def content_words(text: str) -> set:
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOP_WORDS}
+
+
+def question_similarity(a: str, b: str) -> float:
+    """Share of the shorter question's content words that also appear in the other one"""
+    words_a, words_b = content_words(a), content_words(b)
+    if not words_a or not words_b:
+        return 1.0 if " ".join(a.lower().split()) == " ".join(b.lower().split()) else 0.0
+    return len(words_a & words_b) / min(len(words_a), len(words_b))
+
+
+class KnowledgePrefetch:
+    """One speculative retrieval for the message of an agent turn"""
+
+    def __init__(self, question: str, retrieve: Callable[[str], Any],
+                 min_similarity: float = AGENT_PREFETCH_SIMILARITY):
+        self.question = question
+        self.min_similarity = min_similarity
+        self.duration = 0.0
+        self.used = False
+        self.future = asyncio.get_running_loop().run_in_executor(None, self._run, retrieve)
+        # Mark errors as retrieved so unused prefetches that failed don't log warnings
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+    def _run(self, retrieve: Callable[[str], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return retrieve(self.question)
+        finally:
+            self.duration = time.perf_counter() - start
+
+    async def take(self, question: str) -> Optional[Any]:
+        """The prefetched result if `question` is close enough to the prefetched one, else None"""
+        if self.used or question_similarity(question, self.question) < self.min_similarity:
+            record_cache("knowledge_prefetch", False)
+            return None
+
+        start = time.perf_counter()
+        try:
+            result = await self.future
+        except Exception:
+            record_cache("knowledge_prefetch", False)
+            return None
+        waited = time.perf_counter() - start
+
+        self.used = True
+        record_cache("knowledge_prefetch", True)
+        # Whatever ran before the model asked for it is time the turn didn't have to wait
+        PREFETCH_SAVED.inc(amount=max(self.duration - waited, 0.0))
+        return result
+
+    def finish(self):
+        """Call at the end of the turn; counts prefetches the model never asked for"""
+        if not self.used:
+            PREFETCH_UNUSED.inc()
+
+
+def start_prefetch(question: str, retrieve: Callable[[str], Any]) -> Optional[KnowledgePrefetch]:
+    """Start a prefetch for the turn, or None when prefetching is disabled"""
+    if not AGENT_PREFETCH or not question.strip():
+        return None
+    return KnowledgePrefetch(question, retrieve)
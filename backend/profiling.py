@@ -0,0 +1,257 @@
+"""
+On-demand sampling profiler for live hot-path analysis.
+
+An admin (ADMIN_TOKEN) starts a session for the next N profiled requests
+(/ask, /ask/stream, /agent, /ingest) and/or T seconds:
+
+    curl -X POST -H "X-Admin-Token: $ADMIN_TOKEN" "localhost:8000/admin/profile?requests=20&memory=true"
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" localhost:8000/admin/profile/folded > ask.folded
+    flamegraph.pl ask.folded > ask.svg      # or load ask.folded into speedscope
+
+While a session runs, a background thread samples the Python stack of
+every thread (event loop, executor and scheduler workers, so embedding,
+retrieval and ingestion batches are covered) every PROFILE_INTERVAL_MS and
+counts them as folded stacks, rooted at the thread name. Threads parked in
+a selector, queue, lock or event wait are skipped unless `idle=true`. With
+`memory=true`, tracemalloc runs for the session and a snapshot taken as each
+profiled request finishes is diffed against the previous one, so every
+request reports the lines whose allocations grew the most since the last.
+
+When no session is running the only cost is one attribute check per
+request: no sampler thread exists and tracemalloc is off.
+"""
+
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "15"))
+PROFILED_ENDPOINTS = ("/ask", "/ask/stream", "/agent", "/ingest")
+
+# Innermost Python frames of a thread that is waiting rather than working
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+}
+# Keep the profiler's own bookkeeping out of the samples and allocation diffs
+_OWN_FILES = {__file__, tracemalloc.__file__}
+
+
+def _thread_label(name: str) -> str:
+    """Thread name without its pool index, so the workers of one pool share a flame graph root"""
+    return re.sub(r"_\d+$", "", name)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples all thread stacks into folded-stack counts for a bounded session"""
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stacks: Counter = Counter()
+        self.allocations: deque = deque(maxlen=100)
+        self.session: Dict[str, Any] = {}
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+
+    def start(self, requests: int = 0, seconds: float = 0, interval_ms: float = PROFILE_INTERVAL_MS,
+              memory: bool = False, idle: bool = False) -> Dict[str, Any]:
+        """Start a session ending after `requests` profiled requests or `seconds` (capped at PROFILE_MAX_SECONDS)"""
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profiling session is already running")
+            seconds = min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+            self.stacks = Counter()
+            self.allocations.clear()
+            self.session = {
+                "requests_limit": requests or None,
+                "seconds_limit": seconds,
+                "interval_ms": max(interval_ms, 0.5),
+                "memory": memory,
+                "idle": idle,
+                "started_at": time.time(),
+                "stopped_at": None,
+                "requests": 0,
+                "samples": 0,
+            }
+            if memory:
+                self._started_tracemalloc = not tracemalloc.is_tracing()
+                if self._started_tracemalloc:
+                    tracemalloc.start(25)
+                self._snapshot = tracemalloc.take_snapshot()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(time.monotonic() + seconds,),
+                                            name="profiler", daemon=True)
+            self.active = True
+            self._thread.start()
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """End the running session (if any); its results stay available until the next start"""
+        self._stop.set()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join()
+        return self.status()
+
+    def _finish(self):
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            self.session["stopped_at"] = time.time()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            self._snapshot = None
+
+    def _run(self, deadline: float):
+        interval = self.session["interval_ms"] / 1000
+        own = threading.get_ident()
+        try:
+            while not self._stop.wait(interval) and time.monotonic() < deadline:
+                self._sample(own)
+        finally:
+            self._finish()
+
+    def _sample(self, own: int):
+        names = {thread.ident: _thread_label(thread.name) for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            if leaf in _IDLE_FRAMES and not self.session["idle"]:
+                continue
+            stack = []
+            while frame is not None and frame.f_code.co_filename not in _OWN_FILES:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            # A request thread busy diffing allocations for this profiler
+            if frame is not None:
+                continue
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.session["samples"] += 1
+
+    def request_done(self, endpoint: str, seconds: float):
+        """Called as each request finishes; counts profiled ones and diffs allocations since the previous"""
+        if endpoint not in PROFILED_ENDPOINTS:
+            return
+        with self._lock:
+            if not self.active:
+                return
+            self.session["requests"] += 1
+            if self._snapshot is not None:
+                snapshot = tracemalloc.take_snapshot()
+                diff = [stat for stat in snapshot.compare_to(self._snapshot, "lineno")
+                        if stat.traceback[0].filename not in _OWN_FILES]
+                self._snapshot = snapshot
+                self.allocations.append({
+                    "request": self.session["requests"],
+                    "endpoint": endpoint,
+                    "seconds": round(seconds, 4),
+                    "size_diff_kb": round(sum(stat.size_diff for stat in diff) / 1024, 1),
+                    "top": [{
+                        "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_diff_kb": round(stat.size_diff / 1024, 1),
+                        "count_diff": stat.count_diff,
+                    } for stat in diff[:PROFILE_TOP_ALLOCATIONS]],
+                })
+            done = self.session["requests_limit"] and self.session["requests"] >= self.session["requests_limit"]
+        if done:
+            self._stop.set()
+
+    def folded(self) -> str:
+        """Folded stacks ("frame;frame;frame count" per line) for flamegraph.pl, speedscope or inferno"""
+        # Copies: the sampler thread keeps adding to the live counter
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.copy().most_common())
+
+    def status(self) -> Dict[str, Any]:
+        stacks = self.stacks.copy()
+        total = sum(stacks.values())
+        return {
+            "active": self.active,
+            **self.session,
+            "stacks": len(self.stacks),
+            # Innermost frames that were on-CPU (or blocked in C) most often
+            "top_frames": [{"frame": frame, "samples": count, "share": round(count / total, 4)}
+                           for frame, count in _leaf_counts(stacks).most_common(20)],
+            "allocations": list(self.allocations),
+        }
+
+
+def _leaf_counts(stacks: Counter) -> Counter:
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return leaves
+
+
+profiler = SamplingProfiler()
+
+
+def require_admin(request: Request):
+    """Allow only callers presenting ADMIN_TOKEN (X-Admin-Token or Bearer); 404 when no token is configured"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = request.headers.get("authorization", "")
+    supplied = request.headers.get("x-admin-token") or authorization.removeprefix("Bearer ").strip()
+    if not secrets.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/admin/profile")
+
+
+@router.post("")
+async def start_profile(request: Request, requests: int = 0, seconds: float = 0,
+                        interval_ms: float = PROFILE_INTERVAL_MS, memory: bool = False, idle: bool = False):
+    """Profile the next `requests` /ask, /agent and /ingest requests and/or `seconds`"""
+    require_admin(request)
+    try:
+        return profiler.start(requests=requests, seconds=seconds, interval_ms=interval_ms, memory=memory, idle=idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("")
+async def profile_status(request: Request):
+    """Current or last session: limits, sample and request counts, hottest frames, allocation diffs"""
+    require_admin(request)
+    return profiler.status()
+
+
+@router.get("/folded", response_class=PlainTextResponse)
+async def profile_folded(request: Request):
+    """Folded stacks of the current or last session"""
+    require_admin(request)
+    return profiler.folded()
+
+
+@router.delete("")
+async def stop_profile(request: Request):
+    """End the running session early"""
+    require_admin(request)
+    return profiler.stop()
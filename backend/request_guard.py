@@ -0,0 +1,137 @@
+"""
+Per-conversation concurrency control and deduplication for /agent (and
+idempotency keys for /ask, which the voice path uses).
+
+- Turns on the same thread_id run one at a time (a per-thread asyncio lock),
+  so two runs never post into one OpenAI thread concurrently.
+- Requests with the same idempotency_key share one result: while the first
+  is in flight duplicates wait for it, and for IDEMPOTENCY_TTL seconds
+  afterwards they get the stored response. Keys are scoped to the caller
+  (endpoint, tenant, client and thread), and reusing one for a different
+  message is refused with 409 rather than answered with another result.
+- Without a key, identical in-flight requests (same thread_id and message)
+  are coalesced onto the request already running.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from metrics import Counter, METRICS
+
+IDEMPOTENCY_TTL = float(os.getenv("AGENT_IDEMPOTENCY_TTL", "300"))
+IDEMPOTENCY_MAX_KEYS = 10000
+
+AGENT_DEDUPLICATED = Counter("heygen_agent_deduplicated_total",
+                             "Duplicate /agent requests served from another request's result", ("reason",))
+METRICS.append(AGENT_DEDUPLICATED)
+
+
+class AgentRequestGuard:
+    """Serializes turns per thread and shares results between duplicate requests"""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        # Request key -> (message digest, running task)
+        self._in_flight: Dict[Tuple, Tuple[str, asyncio.Future]] = {}
+        # Scoped idempotency key -> (stored at, message digest, result)
+        self._completed: "OrderedDict[Tuple, Tuple[float, str, Any]]" = OrderedDict()
+        self._thread_locks: Dict[str, asyncio.Lock] = {}
+        self._thread_waiters: Dict[str, int] = {}
+
+    @staticmethod
+    def request_key(message: str, thread_id: Optional[str], idempotency_key: Optional[str],
+                    scope: str = "") -> Optional[Tuple]:
+        if idempotency_key:
+            return ("key", scope, thread_id or "", idempotency_key)
+        if thread_id:
+            # Two users starting new conversations may well both say "hi", so only
+            # coalesce unkeyed requests that continue an existing thread
+            return ("message", scope, thread_id, " ".join(message.split()).lower())
+        return None
+
+    @staticmethod
+    def digest(message: str) -> str:
+        return hashlib.sha256(" ".join(message.split()).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _check_payload(stored: str, digest: str):
+        if stored != digest:
+            raise HTTPException(status_code=409, detail="idempotency_key was already used for a different message")
+
+    def _completed_result(self, key: Tuple, digest: str) -> Optional[Any]:
+        entry = self._completed.get(key)
+        if entry is None:
+            return None
+        stored_at, stored_digest, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._completed[key]
+            return None
+        self._check_payload(stored_digest, digest)
+        return result
+
+    def _store_result(self, key: Tuple, digest: str, result: Any):
+        self._completed[key] = (time.monotonic(), digest, result)
+        self._completed.move_to_end(key)
+        while len(self._completed) > self.max_keys:
+            self._completed.popitem(last=False)
+
+    async def _run_serialized(self, thread_id: Optional[str], handler: Callable[[], Awaitable[Any]]) -> Any:
+        if not thread_id:
+            return await handler()
+
+        lock = self._thread_locks.setdefault(thread_id, asyncio.Lock())
+        self._thread_waiters[thread_id] = self._thread_waiters.get(thread_id, 0) + 1
+        try:
+            async with lock:
+                return await handler()
+        finally:
+            self._thread_waiters[thread_id] -= 1
+            if not self._thread_waiters[thread_id]:
+                del self._thread_waiters[thread_id]
+                del self._thread_locks[thread_id]
+
+    async def run(self, message: str, thread_id: Optional[str], idempotency_key: Optional[str],
+                  handler: Callable[[], Awaitable[Any]], scope: str = "") -> Any:
+        """Run `handler` for this request, or share the result of an identical one.
+
+        `scope` (endpoint, tenant and client) keeps callers from reaching each other's results.
+        """
+        key = self.request_key(message, thread_id, idempotency_key, scope)
+        digest = self.digest(message)
+        if idempotency_key:
+            result = self._completed_result(key, digest)
+            if result is not None:
+                AGENT_DEDUPLICATED.inc("completed")
+                return result
+
+        if key is not None and key in self._in_flight:
+            running_digest, running = self._in_flight[key]
+            self._check_payload(running_digest, digest)
+            AGENT_DEDUPLICATED.inc("in_flight")
+            return await asyncio.shield(running)
+
+        # Run the turn as its own task so a client disconnecting doesn't cancel
+        # it for the duplicates waiting on the same result
+        task = asyncio.ensure_future(self._execute(thread_id, key if idempotency_key else None, digest, handler))
+        if key is not None:
+            self._in_flight[key] = (digest, task)
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _execute(self, thread_id: Optional[str], completed_key: Optional[Tuple], digest: str,
+                       handler: Callable[[], Awaitable[Any]]) -> Any:
+        result = await self._run_serialized(thread_id, handler)
+        if completed_key is not None:
+            self._store_result(completed_key, digest, result)
+        return result
+
+    def waiting(self) -> int:
+        """Requests currently waiting for or holding a thread lock"""
+        return sum(self._thread_waiters.values())
@@ -0,0 +1,87 @@
+"""
+Retrieval settings: the HNSW parameters of the ChromaDB collections and how
+many chunks /ask and the agent's search_knowledge tool retrieve.
+
+HNSW_M and HNSW_CONSTRUCTION_EF are fixed when a collection is built, so a
+collection built with other values is recreated by the next full ingest;
+HNSW_SEARCH_EF is applied to existing collections where ChromaDB allows it
+and never causes a rebuild.
+benchmarks/sweep_hnsw.py measures recall@k against exact search, latency
+and index size for a grid of these values.
+"""
+
+import os
+from typing import Any, Dict
+
+HNSW_SPACE = "cosine"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "100"))
+ASK_TOP_K = int(os.getenv("ASK_TOP_K", "5"))
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "3"))
+
+# What ChromaDB uses for collections created without these keys (0.4/0.5 metadata defaults)
+_CHROMA_DEFAULTS = {"M": 16, "construction_ef": 100, "search_ef": 10}
+
+
+def hnsw_metadata(m: int = HNSW_M, construction_ef: int = HNSW_CONSTRUCTION_EF,
+                  search_ef: int = HNSW_SEARCH_EF) -> Dict[str, Any]:
+    """Collection metadata creating an HNSW index with these parameters"""
+    return {
+        "hnsw:space": HNSW_SPACE,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    }
+
+
+def hnsw_settings(collection) -> Dict[str, int]:
+    """M, construction_ef and search_ef a collection's index actually uses"""
+    # ChromaDB 1.x keeps them in the collection configuration (and search_ef can change there)
+    configuration = getattr(collection, "configuration", None)
+    hnsw = configuration.get("hnsw") if isinstance(configuration, dict) else None
+    if hnsw:
+        return {"M": hnsw["max_neighbors"], "construction_ef": hnsw["ef_construction"],
+                "search_ef": hnsw["ef_search"]}
+    metadata = collection.metadata or {}
+    return {key: int(metadata.get(f"hnsw:{key}", default)) for key, default in _CHROMA_DEFAULTS.items()}
+
+
+def apply_search_ef(collection, search_ef: int = HNSW_SEARCH_EF) -> bool:
+    """Change the search_ef of an existing collection; False if this ChromaDB can't"""
+    if hnsw_settings(collection)["search_ef"] == search_ef:
+        return True
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    except (TypeError, ValueError):
+        return False
+    return hnsw_settings(collection)["search_ef"] == search_ef
+
+
+def open_collection(client, name: str, rebuild: bool = False):
+    """Get or create a collection with the configured HNSW parameters.
+
+    An existing collection whose index was built with a different M or
+    construction_ef is kept with a warning unless `rebuild`, in which case it
+    is dropped and created empty, ready to be re-ingested. A search_ef this
+    ChromaDB can't change on an existing collection only warns: it is no
+    reason to throw the index away.
+    """
+    try:
+        collection = client.get_collection(name)
+    except Exception:
+        return client.create_collection(name=name, metadata=hnsw_metadata())
+
+    settings = hnsw_settings(collection)
+    built_with = ", ".join(f"{key}={value}" for key, value in settings.items())
+    if (settings["M"], settings["construction_ef"]) != (HNSW_M, HNSW_CONSTRUCTION_EF):
+        if rebuild:
+            print(f"Recreating collection {name} (built with {built_with})")
+            client.delete_collection(name)
+            return client.create_collection(name=name, metadata=hnsw_metadata())
+        print(f"Collection {name} was built with {built_with}; the next full ingest rebuilds it with "
+              f"M={HNSW_M}, construction_ef={HNSW_CONSTRUCTION_EF}, search_ef={HNSW_SEARCH_EF}")
+    if not apply_search_ef(collection):
+        print(f"Collection {name} keeps search_ef={settings['search_ef']}: this ChromaDB can't change it "
+              f"to HNSW_SEARCH_EF={HNSW_SEARCH_EF} on an existing collection")
+    return collection
@@ -0,0 +1,348 @@
+"""
+Admission control and priority scheduling for embedding and retrieval work.
+
+Voice turns, text chat and bulk ingestion all share the embedding model and
+the vector index. Every such job takes one of SCHEDULER_WORKERS slots, and
+waiting jobs get the next free slot by priority class:
+
+    voice > text > batch
+
+- Batch work (ingestion, re-indexing) uses at most SCHEDULER_WORKERS - 1
+  slots, so one is always left for interactive requests. Ingestion embeds in
+  chunks of SCHEDULER_BATCH_SIZE texts, giving its slot back between chunks.
+- Each client gets a token bucket (SCHEDULER_CLIENT_RATE requests/second,
+  bursts of SCHEDULER_CLIENT_BURST). Over the limit, requests are rejected
+  with RateLimited (HTTP 429). Clients are identified by client_address():
+  X-Forwarded-For is only believed when it was added by one of
+  TRUSTED_PROXIES. Requests may only ask for the interactive classes; batch
+  is for the backend's own ingestion.
+- Load shedding: at most SCHEDULER_MAX_QUEUE interactive jobs wait. When the
+  queue is full, a new job displaces the newest waiting job of a lower class,
+  or is itself rejected. Jobs that wait longer than their class allows
+  (SCHEDULER_VOICE_MAX_WAIT, SCHEDULER_TEXT_MAX_WAIT) are dropped too, since
+  a late answer is no use to a caller that has moved on. Both raise
+  Overloaded (HTTP 503). Batch jobs are never shed; they wait.
+
+Slots can be taken from worker threads (`with scheduler.slot(priority)`) or
+from the event loop (`await scheduler.run(priority, fn, *args)`, which waits
+without blocking the loop and then runs `fn` in the default executor).
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from metrics import Counter, Histogram, METRICS
+
+PRIORITIES = ("voice", "text", "batch")
+INTERACTIVE = ("voice", "text")
+# What a request body may ask for
+RequestPriority = Literal["voice", "text"]
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "32"))
+SCHEDULER_VOICE_MAX_WAIT = float(os.getenv("SCHEDULER_VOICE_MAX_WAIT", "2"))
+SCHEDULER_TEXT_MAX_WAIT = float(os.getenv("SCHEDULER_TEXT_MAX_WAIT", "10"))
+SCHEDULER_CLIENT_RATE = float(os.getenv("SCHEDULER_CLIENT_RATE", "2"))
+SCHEDULER_CLIENT_BURST = float(os.getenv("SCHEDULER_CLIENT_BURST", "10"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "64"))
+SCHEDULER_MAX_CLIENTS = 10000
+# Peers whose X-Forwarded-For is believed (the frontend proxy, a load balancer)
+TRUSTED_PROXIES = {address.strip() for address in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+                   if address.strip()}
+
+SCHEDULER_WAIT = Histogram("heygen_scheduler_wait_seconds", "Time jobs waited for a scheduler slot", ("priority",))
+SCHEDULER_REJECTED = Counter("heygen_scheduler_rejected_total", "Jobs rejected or shed by the scheduler",
+                             ("priority", "reason"))
+METRICS.extend([SCHEDULER_WAIT, SCHEDULER_REJECTED])
+
+
+class SchedulerRejected(Exception):
+    """A job the scheduler refused to run; `retry_after` is a hint in seconds"""
+
+    status_code = 503
+
+    def __init__(self, priority: str, reason: str, retry_after: float):
+        super().__init__(f"Server busy ({reason}), retry in {retry_after:.0f}s")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Overloaded(SchedulerRejected):
+    status_code = 503
+
+
+class RateLimited(SchedulerRejected):
+    status_code = 429
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, else the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def client_address(peer: Optional[str], forwarded: Optional[str], trusted=TRUSTED_PROXIES) -> str:
+    """Client identity for rate limiting.
+
+    Walks X-Forwarded-For from the nearest hop back while the hop is a
+    trusted proxy; anything further left could have been sent by the client
+    itself. Without a trusted peer the header is ignored.
+    """
+    address = peer or "unknown"
+    if not forwarded or address not in trusted:
+        return address
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if hop not in trusted:
+            break
+    return address
+
+
+class _Waiter:
+    def __init__(self, priority: str, wake: Callable[[], None]):
+        self.priority = priority
+        self.wake = wake
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.done = False
+        self.error: Optional[SchedulerRejected] = None
+
+
+class WorkScheduler:
+    """Priority slots for embedding/retrieval jobs, with per-client rate limits and load shedding"""
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS, max_queue: int = SCHEDULER_MAX_QUEUE,
+                 max_wait: Optional[Dict[str, float]] = None, client_rate: float = SCHEDULER_CLIENT_RATE,
+                 client_burst: float = SCHEDULER_CLIENT_BURST, batch_size: int = SCHEDULER_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.batch_workers = max(1, self.workers - 1)
+        self.max_queue = max_queue
+        self.max_wait = max_wait if max_wait is not None else {
+            "voice": SCHEDULER_VOICE_MAX_WAIT, "text": SCHEDULER_TEXT_MAX_WAIT, "batch": 0}
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.batch_size = batch_size
+        self._active = {priority: 0 for priority in PRIORITIES}
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Moving average of how long a job holds its slot, for Retry-After hints
+        self._service_time = 0.05
+        self._lock = threading.Lock()
+        self.stats = {"completed": 0, "rate_limited": 0, "queue_full": 0, "deadline": 0}
+
+    @staticmethod
+    def _check(priority: str):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+
+    def admit(self, client_id: str, priority: str = "text"):
+        """Charge one request to the client's token bucket; raises RateLimited when it is empty"""
+        self._check(priority)
+        if self.client_rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = self._buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+                while len(self._buckets) > SCHEDULER_MAX_CLIENTS:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(client_id)
+            wait = bucket.take()
+            if wait:
+                self.stats["rate_limited"] += 1
+        if wait:
+            SCHEDULER_REJECTED.inc(priority, "rate_limited")
+            raise RateLimited(priority, "rate_limited", max(1.0, math.ceil(wait)))
+
+    # Slot bookkeeping; everything below runs with self._lock held
+
+    def _can_start(self, priority: str) -> bool:
+        if sum(self._active.values()) >= self.workers:
+            return False
+        return priority != "batch" or self._active["batch"] < self.batch_workers
+
+    def _grant(self, waiter: _Waiter):
+        waiter.granted = True
+        waiter.done = True
+        self._active[waiter.priority] += 1
+        SCHEDULER_WAIT.observe(time.monotonic() - waiter.enqueued, waiter.priority)
+
+    def _retry_after(self) -> float:
+        queued = sum(self._queued.values())
+        return max(1.0, math.ceil(self._service_time * (queued + 1) / self.workers))
+
+    def _reject(self, priority: str, reason: str) -> Overloaded:
+        self.stats[reason] += 1
+        SCHEDULER_REJECTED.inc(priority, reason)
+        return Overloaded(priority, reason, self._retry_after())
+
+    def _dispatch(self):
+        """Hand free slots to the highest-priority waiters"""
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.done:
+                heapq.heappop(self._queue)
+                continue
+            # Waiters behind the head are of equal or lower priority, so if the head can't start nobody can
+            if not self._can_start(waiter.priority):
+                return
+            heapq.heappop(self._queue)
+            self._queued[waiter.priority] -= 1
+            self._grant(waiter)
+            waiter.wake()
+
+    def _shed_for(self, priority: str) -> bool:
+        """Drop the newest waiting job of the lowest class below `priority`; False if there is none"""
+        rank = PRIORITIES.index(priority)
+        victim = None
+        for victim_rank, seq, waiter in self._queue:
+            if waiter.done or waiter.priority == "batch" or victim_rank <= rank:
+                continue
+            if victim is None or (victim_rank, seq) > victim[:2]:
+                victim = (victim_rank, seq, waiter)
+        if victim is None:
+            return False
+        waiter = victim[2]
+        waiter.done = True
+        self._queued[waiter.priority] -= 1
+        waiter.error = self._reject(waiter.priority, "queue_full")
+        waiter.wake()
+        return True
+
+    def _enqueue(self, priority: str, wake: Callable[[], None]) -> _Waiter:
+        self._check(priority)
+        waiter = _Waiter(priority, wake)
+        with self._lock:
+            if not self._queued["voice"] and not self._queued["text"] and not self._queued["batch"] \
+                    and self._can_start(priority):
+                self._grant(waiter)
+                return waiter
+            if priority != "batch" and self._queued["voice"] + self._queued["text"] >= self.max_queue:
+                if not self._shed_for(priority):
+                    raise self._reject(priority, "queue_full")
+            heapq.heappush(self._queue, (PRIORITIES.index(priority), next(self._seq), waiter))
+            self._queued[priority] += 1
+            return waiter
+
+    def _abandon(self, waiter: _Waiter, reason: Optional[str] = None) -> bool:
+        """Withdraw a waiter that stopped waiting; True if it was granted a slot in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            if not waiter.done:
+                waiter.done = True
+                self._queued[waiter.priority] -= 1
+                if reason:
+                    waiter.error = self._reject(waiter.priority, reason)
+            return False
+
+    def release(self, priority: str, held: float = 0.0):
+        """Give a slot back after a job that held it for `held` seconds"""
+        with self._lock:
+            self._active[priority] -= 1
+            self.stats["completed"] += 1
+            if held:
+                self._service_time = 0.9 * self._service_time + 0.1 * held
+            self._dispatch()
+
+    # Public ways to hold a slot
+
+    def acquire(self, priority: str):
+        """Block the calling thread until a slot is free; raises Overloaded if the job is shed"""
+        event = threading.Event()
+        waiter = self._enqueue(priority, event.set)
+        max_wait = self.max_wait.get(priority) or None
+        if not waiter.granted and not event.wait(max_wait):
+            if not self._abandon(waiter, "deadline"):
+                raise waiter.error
+        if waiter.error:
+            raise waiter.error
+
+    @contextmanager
+    def slot(self, priority: str):
+        """Hold a slot for the duration of the block (from a worker thread)"""
+        self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(priority, time.perf_counter() - start)
+
+    async def acquire_async(self, priority: str):
+        """Wait for a slot without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self._enqueue(priority, wake)
+        if waiter.granted:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), self.max_wait.get(priority) or None)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter, "deadline"):
+                raise waiter.error
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the caller went away
+            if self._abandon(waiter):
+                self.release(priority)
+            raise
+        if waiter.error:
+            raise waiter.error
+
+    def _run_holding(self, priority: str, fn: Callable[..., Any], args: tuple) -> Any:
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.release(priority, time.perf_counter() - start)
+
+    async def run(self, priority: str, fn: Callable[..., Any], *args) -> Any:
+        """Run blocking `fn(*args)` in the default executor once a slot of `priority` is free"""
+        await self.acquire_async(priority)
+        try:
+            future = asyncio.get_running_loop().run_in_executor(None, self._run_holding, priority, fn, args)
+        except BaseException:
+            self.release(priority)
+            raise
+        # The slot is released by the worker thread, so a cancelled caller can't free it while fn still runs
+        return await future
+
+    def queued(self, priority: str) -> int:
+        return self._queued[priority]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "active": dict(self._active),
+            "queued": dict(self._queued),
+            "service_ms": round(self._service_time * 1000, 1),
+            **self.stats,
+        }
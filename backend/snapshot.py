@@ -0,0 +1,168 @@
+"""
+Portable index snapshots for fast cold start on new nodes.
+
+`python ingest.py --snapshot DIR` exports the collection as
+
+    DIR/manifest.json    format, index version, model, shape and sha256 of every file
+    DIR/embeddings.npy   [chunks, dim], L2-normalized; float32, float16 or int8
+    DIR/scale.npy        float32 per-dimension scale of int8 embeddings
+    DIR/projection.npz   PCA or truncation applied to the embeddings (and queries)
+    DIR/chunks.jsonl     one {"id", "text", "metadata"} object per row
+    DIR/offsets.npy      int64 byte offset of every row in chunks.jsonl (+ end)
+
+Projection and compact storage are optional (see compact.py); the manifest
+then records recall@k against the full-precision vectors.
+
+A node started with SNAPSHOT_PATH and an empty ChromaDB collection maps the
+files instead of ingesting. SnapshotIndex answers `query()` like a ChromaDB
+collection with an exact cosine search over the memory-mapped matrix, and
+only parses the chunk rows it returns. Snapshots are read-only; the first
+/ingest or watcher re-index moves the node back to ChromaDB.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from compact import CompactVectors, Projection, compact_report, normalize, top_k
+
+SNAPSHOT_FORMAT = 2
+# Format 1 snapshots are float32 without projection, which format 2 readers handle
+SUPPORTED_FORMATS = (1, 2)
+SNAPSHOT_FILES = ["embeddings.npy", "scale.npy", "projection.npz", "chunks.jsonl", "offsets.npy"]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_snapshot(collection, path: str, index_version: Optional[str] = None,
+                    embed_model: Optional[str] = None, dim: int = 0, projection: str = "pca",
+                    dtype: str = "float32") -> Dict[str, Any]:
+    """Write the collection to a snapshot directory; returns the manifest.
+
+    With `dim`, embeddings are reduced to that many dimensions by `projection`
+    ("pca" or "truncate"); `dtype` is the stored type (float32, float16 or int8).
+    The snapshot is written next to `path` and moved into place once complete,
+    so readers never see a partial snapshot.
+    """
+    data = collection.get(include=["documents", "metadatas", "embeddings"])
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    if embeddings.ndim != 2:
+        embeddings = embeddings.reshape(len(data["ids"]), -1)
+    embeddings = normalize(embeddings)
+
+    reducer = Projection.fit(projection, embeddings, dim) if dim and len(embeddings) else None
+    vectors = CompactVectors.encode(reducer.apply(embeddings) if reducer else embeddings, dtype)
+
+    tmp_path = f"{path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    vectors.save(tmp_path)
+    if reducer:
+        reducer.save(os.path.join(tmp_path, "projection.npz"))
+    offsets = [0]
+    with open(os.path.join(tmp_path, "chunks.jsonl"), "wb") as f:
+        for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+            line = json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(tmp_path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "index_version": index_version,
+        "embed_model": embed_model,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "chunks": int(embeddings.shape[0]),
+        "dim": int(vectors.stored.shape[1]) if embeddings.size else 0,
+        "embedding_dim": int(embeddings.shape[1]) if embeddings.size else 0,
+        "dtype": dtype,
+        "projection": {"method": reducer.method, "dim": reducer.dim} if reducer else None,
+        # What the projection and storage type cost against the full-precision vectors
+        "compact": compact_report(embeddings, vectors, reducer)
+        if (reducer or dtype != "float32") and len(embeddings) else None,
+        "files": {name: file_sha256(os.path.join(tmp_path, name)) for name in SNAPSHOT_FILES
+                  if os.path.exists(os.path.join(tmp_path, name))},
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+class SnapshotIndex:
+    """Read-only, memory-mapped index answering ChromaDB-style queries"""
+
+    def __init__(self, path: str, manifest: Dict[str, Any]):
+        self.path = path
+        self.manifest = manifest
+        self.vectors = CompactVectors.load(path)
+        projection_path = os.path.join(path, "projection.npz")
+        self.projection = Projection.load(projection_path) if os.path.exists(projection_path) else None
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "chunks.jsonl"), "rb") as f:
+            # An empty file can't be mapped
+            self._chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count() else b""
+
+    def count(self) -> int:
+        return len(self.vectors)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return json.loads(self._chunks[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def query(self, query_embeddings, n_results: int = 10,
+              include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        """Exact cosine search; same result shape as Collection.query (`where` filters aren't supported).
+
+        `query_embeddings` is a [queries, dim] array (or list of vectors) in the
+        model's full dimension; returned embeddings are in the stored (projected) space.
+        """
+        include = include or ["documents", "metadatas", "distances"]
+        results: Dict[str, Any] = {"ids": []}
+        for field in ("documents", "metadatas", "distances", "embeddings"):
+            results[field] = [] if field in include else None
+
+        queries = normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        if self.projection:
+            queries = self.projection.apply(queries)
+        for query in queries:
+            scores = self.vectors.scores(query)
+            top = top_k(scores, n_results)
+            rows = [self.row(i) for i in top]
+            results["ids"].append([row["id"] for row in rows])
+            if results["documents"] is not None:
+                results["documents"].append([row["text"] for row in rows])
+            if results["metadatas"] is not None:
+                results["metadatas"].append([row["metadata"] for row in rows])
+            if results["distances"] is not None:
+                results["distances"].append([float(1 - scores[i]) for i in top])
+            if results["embeddings"] is not None:
+                results["embeddings"].append(self.vectors.rows(top))
+        return results
+
+
+def load_snapshot(path: str, verify: bool = True) -> SnapshotIndex:
+    """Map a snapshot directory; with `verify`, checksums are checked first (raises ValueError)"""
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {path}")
+    if verify:
+        for name, checksum in manifest["files"].items():
+            if file_sha256(os.path.join(path, name)) != checksum:
+                raise ValueError(f"Checksum mismatch for {name} in snapshot {path}")
+    return SnapshotIndex(path, manifest)
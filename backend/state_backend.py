@@ -0,0 +1,171 @@
+"""
+Shared state for the agent: bookings, availability and conversation histories.
+
+With one process, state can live in Python objects. With several uvicorn
+workers or nodes behind a load balancer, every worker must see the same
+bookings, so the agent keeps that state in a StateBackend:
+
+    STATE_BACKEND=memory   # in-process (default, single worker)
+    STATE_BACKEND=redis    # Redis at STATE_REDIS_URL, shared by all workers
+
+Values are JSON. Lists support an atomic `list_remove`, which is how a slot is
+reserved: of any number of concurrent bookings for the same slot, exactly one
+removes it and succeeds. `benchmarks/mock_redis.py` is a local stand-in for
+Redis that needs no installation.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _encode(value: Any) -> str:
+    # Sorted keys so equal values are byte-identical (list_remove compares encodings)
+    return json.dumps(value, sort_keys=True)
+
+
+class StateBackend:
+    """Key-value store shared by all workers"""
+
+    name = "base"
+
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Atomically set `key` unless it exists; True if this call set it"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def list_items(self, key: str) -> List[Any]:
+        raise NotImplementedError
+
+    def list_append(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def list_remove(self, key: str, value: Any) -> bool:
+        """Atomically remove one occurrence of `value`; True if this call removed it"""
+        raise NotImplementedError
+
+    def ping(self) -> bool:
+        return True
+
+
+class InProcessStateBackend(StateBackend):
+    """State in this process only; correct for a single worker"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], Any]] = {}
+        self._lists: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[Optional[float], Any]]:
+        entry = self._values.get(key)
+        if entry is not None and entry[0] is not None and time.monotonic() >= entry[0]:
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else json.loads(entry[1])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl if ttl else None, _encode(value))
+
+    def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._values[key] = (time.monotonic() + ttl if ttl else None, _encode(value))
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+            self._lists.pop(key, None)
+
+    def list_items(self, key: str) -> List[Any]:
+        with self._lock:
+            return [json.loads(item) for item in self._lists.get(key, [])]
+
+    def list_append(self, key: str, value: Any):
+        with self._lock:
+            self._lists.setdefault(key, []).append(_encode(value))
+
+    def list_remove(self, key: str, value: Any) -> bool:
+        with self._lock:
+            items = self._lists.get(key)
+            encoded = _encode(value)
+            if not items or encoded not in items:
+                return False
+            items.remove(encoded)
+            return True
+
+
+class RedisStateBackend(StateBackend):
+    """State in Redis, shared by every worker and node"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "heygen:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(f"STATE_BACKEND=redis requires the redis package ({e}). "
+                               "Install it with: pip install redis")
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, _encode(value), px=int(ttl * 1000) if ttl else None)
+
+    def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, _encode(value), nx=True,
+                                    px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def list_items(self, key: str) -> List[Any]:
+        return [json.loads(item) for item in self.client.lrange(self.prefix + key, 0, -1)]
+
+    def list_append(self, key: str, value: Any):
+        self.client.rpush(self.prefix + key, _encode(value))
+
+    def list_remove(self, key: str, value: Any) -> bool:
+        # LREM is atomic on the server, so concurrent removals of the same item can't both succeed
+        return self.client.lrem(self.prefix + key, 1, _encode(value)) == 1
+
+    def ping(self) -> bool:
+        return bool(self.client.ping())
+
+
+def load_state_backend(name: str, redis_url: str = "redis://localhost:6379/0") -> StateBackend:
+    if name == "memory":
+        return InProcessStateBackend()
+    if name == "redis":
+        return RedisStateBackend(redis_url)
+    raise ValueError(f"Unknown STATE_BACKEND '{name}', expected 'memory' or 'redis'")
+
+
+def create_state_backend() -> StateBackend:
+    """StateBackend configured from the environment (STATE_BACKEND, STATE_REDIS_URL)"""
+    return load_state_backend(os.getenv("STATE_BACKEND", "memory"),
+                              os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0"))
@@ -0,0 +1,167 @@
+"""
+Generative answer synthesis for /ask (SYNTHESIS_MODE=llm).
+
+Retrieved chunks are packed into a token budget in relevance order. Chunks
+from split_text_into_chunks overlap their neighbours by ~150 characters, so
+overlapping text is merged instead of being paid for twice. The packed
+context goes to a pluggable ModelClient that streams the answer: OpenAI chat
+completions in production, or a local stub that needs no network.
+"""
+
+import os
+import re
+from typing import Callable, Dict, Iterator, List, Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_CONTEXT_TOKENS = 1500
+DEFAULT_MAX_TOKENS = 300
+
+# Overlaps shorter than this are treated as coincidence rather than chunk overlap
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+
+SYSTEM_PROMPT = """You are a friendly receptionist answering questions about the company.
+Answer only from the provided context, in two or three short spoken sentences.
+If the context doesn't contain the answer, say so and suggest calling (555) 123-4567."""
+
+
+class ModelClient:
+    """Streams a chat completion; implementations must yield text deltas"""
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class OpenAIModelClient(ModelClient):
+    """Chat completions via the OpenAI SDK (honours OPENAI_BASE_URL)"""
+
+    def __init__(self, model: str = DEFAULT_MODEL, client=None):
+        if client is None:
+            import openai
+            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = client
+        self.model = model
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.2,
+            stream=True,
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubModelClient(ModelClient):
+    """Offline stand-in: streams the first sentences of the packed context word by word"""
+
+    def __init__(self, sentences: int = 2):
+        self.sentences = sentences
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int) -> Iterator[str]:
+        prompt = messages[-1]["content"]
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0]
+        context = re.sub(r"\[\d+\]\s*", "", context)
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", " ".join(context.split())) if s.strip()]
+        answer = " ".join(sentences[:self.sentences]) or "I don't have information about that topic."
+        for word in answer.split()[:max_tokens]:
+            yield word + " "
+
+
+def load_model_client(name: str, model: str = DEFAULT_MODEL) -> ModelClient:
+    if name == "openai":
+        return OpenAIModelClient(model)
+    if name == "stub":
+        return StubModelClient()
+    raise ValueError(f"Unknown SYNTHESIS_CLIENT '{name}', expected 'openai' or 'stub'")
+
+
+def overlap_length(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`"""
+    for k in range(min(len(a), len(b), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+
+def pack_context(chunks: List[str], count_tokens_func: Callable[[str], int],
+                 token_budget: int = DEFAULT_CONTEXT_TOKENS) -> List[str]:
+    """Pack chunks (most relevant first) into the token budget, merging overlapping text.
+
+    A chunk that continues or precedes an already packed passage is joined to
+    it and only its new text is counted; chunks contained in a packed passage
+    are skipped. Chunks that don't fit are skipped so smaller ones may still fit.
+    """
+    passages: List[str] = []
+    used = 0
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk or any(chunk in passage for passage in passages):
+            continue
+
+        for i, passage in enumerate(passages):
+            after = overlap_length(passage, chunk)
+            before = overlap_length(chunk, passage) if not after else 0
+            if after or before:
+                added = chunk[after:] if after else chunk[:len(chunk) - before]
+                tokens = count_tokens_func(added)
+                if used + tokens <= token_budget:
+                    passages[i] = passage + added if after else added + passage
+                    used += tokens
+                break
+        else:
+            tokens = count_tokens_func(chunk)
+            if used + tokens <= token_budget:
+                passages.append(chunk)
+                used += tokens
+    return passages
+
+
+def build_messages(question: str, passages: List[str], sources: List[str]) -> List[Dict[str, str]]:
+    context = "\n\n".join(f"[{i}] {passage}" for i, passage in enumerate(passages, 1))
+    source_line = f"Sources: {', '.join(sources)}\n\n" if sources else ""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{source_line}Context:\n{context}\n\nQuestion: {question}"},
+    ]
+
+
+class LLMSynthesizer:
+    """Answers questions from retrieved chunks with a model client"""
+
+    def __init__(self, client: ModelClient, count_tokens_func: Callable[[str], int],
+                 context_tokens: int = DEFAULT_CONTEXT_TOKENS, max_tokens: int = DEFAULT_MAX_TOKENS):
+        self.client = client
+        self.count_tokens = count_tokens_func
+        self.context_tokens = context_tokens
+        self.max_tokens = max_tokens
+
+    def stream_answer(self, question: str, relevant_chunks: List[str], sources: List[str]) -> Iterator[str]:
+        passages = pack_context(relevant_chunks, self.count_tokens, self.context_tokens)
+        return self.client.stream(build_messages(question, passages, sources), self.max_tokens)
+
+    def answer(self, question: str, relevant_chunks: List[str], sources: List[str]) -> str:
+        return "".join(self.stream_answer(question, relevant_chunks, sources)).strip()
+
+
+def create_synthesizer(count_tokens_func: Callable[[str], int]) -> Optional[LLMSynthesizer]:
+    """LLMSynthesizer configured from the environment, or None for the template answers.
+
+    Reads SYNTHESIS_MODE (template | llm), SYNTHESIS_CLIENT (openai | stub),
+    SYNTHESIS_MODEL, SYNTHESIS_CONTEXT_TOKENS and SYNTHESIS_MAX_TOKENS.
+    """
+    mode = os.getenv("SYNTHESIS_MODE", "template")
+    if mode == "template":
+        return None
+    if mode != "llm":
+        raise ValueError(f"Unknown SYNTHESIS_MODE '{mode}', expected 'template' or 'llm'")
+    client = load_model_client(os.getenv("SYNTHESIS_CLIENT", "openai"), os.getenv("SYNTHESIS_MODEL", DEFAULT_MODEL))
+    return LLMSynthesizer(
+        client,
+        count_tokens_func,
+        context_tokens=int(os.getenv("SYNTHESIS_CONTEXT_TOKENS", str(DEFAULT_CONTEXT_TOKENS))),
+        max_tokens=int(os.getenv("SYNTHESIS_MAX_TOKENS", str(DEFAULT_MAX_TOKENS))),
+    )
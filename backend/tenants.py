@@ -0,0 +1,182 @@
+"""
+Tenant-scoped knowledge bases for serving many client companies from one deployment.
+
+Each tenant has its own ChromaDB collection, data directory and, optionally,
+agent instructions:
+
+    TENANTS_DIR/<tenant_id>/data/*.md, *.txt
+    TENANTS_DIR/<tenant_id>/instructions.md
+
+The default tenant keeps the single-tenant layout (DATA_DIR and the
+"documents" collection) and is never unloaded. Other tenants are loaded on
+first use and kept in an LRU; when the estimated memory of the loaded
+indexes exceeds the cap (or more than `max_loaded` are resident), the least
+recently used tenants are unloaded. ChromaDB's own segment cache should be
+given the same limit (chroma_segment_cache_policy="LRU") so unloaded
+tenants' HNSW indexes are actually freed.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from metrics import record_cache
+
+DEFAULT_TENANT = "default"
+DEFAULT_COLLECTION = "documents"
+
+# Lowercase, 1-56 characters, so "tenant_<id>" is a valid ChromaDB collection name
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9_-]{0,54}[a-z0-9])?$")
+
+# Rough resident cost of one chunk: a 384-dim float32 vector, its HNSW links, and the text and metadata
+BYTES_PER_CHUNK = 4096
+
+
+class Tenant:
+    """One client company's knowledge base"""
+
+    def __init__(self, tenant_id: str, data_dir: str, collection_name: str, instructions: Optional[str] = None):
+        self.tenant_id = tenant_id
+        self.data_dir = data_dir
+        self.collection_name = collection_name
+        # Replaces the default agent instructions when set
+        self.instructions = instructions
+        self.collection = None
+        self.chunks = 0
+
+    @property
+    def knowledge_scope(self) -> Optional[str]:
+        """Key separating this tenant's cached knowledge answers; None for the default tenant"""
+        return None if self.tenant_id == DEFAULT_TENANT else self.tenant_id
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.chunks * BYTES_PER_CHUNK
+
+
+class TenantRegistry:
+    """Loads tenants on demand and unloads the least recently used under a memory cap"""
+
+    def __init__(self, tenants_dir: str, default_data_dir: str, open_collection: Callable[[str], Any],
+                 on_load: Optional[Callable[[Tenant], None]] = None,
+                 on_evict: Optional[Callable[[Tenant], None]] = None,
+                 memory_limit_bytes: int = 0, max_loaded: int = 0):
+        self.tenants_dir = tenants_dir
+        self.default_data_dir = default_data_dir
+        self.open_collection = open_collection
+        self.on_load = on_load
+        self.on_evict = on_evict
+        # 0 disables the respective limit
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_loaded = max_loaded
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+        self._loaded: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per tenant being loaded, so a burst of requests for one tenant opens (or ingests) it once
+        # while other tenants load in parallel; _lock only guards the bookkeeping
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def _describe(self, tenant_id: str) -> Tenant:
+        if tenant_id == DEFAULT_TENANT:
+            return Tenant(DEFAULT_TENANT, self.default_data_dir, DEFAULT_COLLECTION)
+
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise KeyError(f"Invalid tenant id '{tenant_id}'")
+        tenant_dir = os.path.join(self.tenants_dir, tenant_id)
+        if not os.path.isdir(tenant_dir):
+            raise KeyError(f"Unknown tenant '{tenant_id}'")
+
+        instructions = None
+        try:
+            with open(os.path.join(tenant_dir, "instructions.md"), encoding="utf-8") as f:
+                instructions = f.read().strip() or None
+        except OSError:
+            pass
+        return Tenant(tenant_id, os.path.join(tenant_dir, "data"), f"tenant_{tenant_id}", instructions)
+
+    def get(self, tenant_id: Optional[str] = None) -> Tenant:
+        """The loaded tenant, loading it (and unloading cold ones) if needed.
+
+        Raises KeyError for ids without a tenant directory.
+        """
+        tenant_id = tenant_id or DEFAULT_TENANT
+        tenant = self._touch(tenant_id)
+        if tenant is not None:
+            return tenant
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+        with load_lock:
+            try:
+                # Another request may have loaded it while we waited
+                tenant = self._touch(tenant_id)
+                if tenant is not None:
+                    return tenant
+
+                tenant = self._describe(tenant_id)
+                record_cache("tenant_index", False)
+                tenant.collection = self.open_collection(tenant.collection_name)
+                tenant.chunks = tenant.collection.count()
+                if self.on_load:
+                    self.on_load(tenant)
+                with self._lock:
+                    self._loaded[tenant_id] = tenant
+                    self.stats["loads"] += 1
+            finally:
+                with self._lock:
+                    self._load_locks.pop(tenant_id, None)
+        self._evict()
+        return tenant
+
+    def _touch(self, tenant_id: str) -> Optional[Tenant]:
+        with self._lock:
+            tenant = self._loaded.get(tenant_id)
+            if tenant is None:
+                return None
+            self._loaded.move_to_end(tenant_id)
+            self.stats["hits"] += 1
+        record_cache("tenant_index", True)
+        return tenant
+
+    def resized(self, tenant: Tenant):
+        """Re-count a tenant's chunks after (re)ingestion and enforce the cap"""
+        tenant.chunks = tenant.collection.count()
+        self._evict()
+
+    def _over_limit(self) -> bool:
+        if self.max_loaded and len(self._loaded) > self.max_loaded:
+            return True
+        return bool(self.memory_limit_bytes) and self.memory_bytes() > self.memory_limit_bytes
+
+    def _evict(self):
+        evicted = []
+        with self._lock:
+            # The most recently used tenant is always kept, even if it alone exceeds the cap
+            candidates = [tid for tid in list(self._loaded)[:-1] if tid != DEFAULT_TENANT]
+            for tenant_id in candidates:
+                if not self._over_limit():
+                    break
+                tenant = self._loaded.pop(tenant_id)
+                self.stats["evictions"] += 1
+                evicted.append(tenant)
+        for tenant in evicted:
+            print(f"Unloaded tenant {tenant.tenant_id} ({tenant.chunks} chunks)")
+            if self.on_evict:
+                self.on_evict(tenant)
+
+    def memory_bytes(self) -> int:
+        """Estimated memory of the loaded tenants' indexes"""
+        return sum(tenant.memory_bytes for tenant in self._loaded.values())
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "loaded": len(self._loaded),
+            "memory_mb": round(self.memory_bytes() / 1e6, 1),
+            "memory_limit_mb": round(self.memory_limit_bytes / 1e6, 1),
+            **self.stats,
+        }
+
+    def __len__(self) -> int:
+        return len(self._loaded)
@@ -0,0 +1,177 @@
+"""
+HeyGen streaming-token broker.
+
+Minting a streaming token is an external round trip that otherwise sits in
+front of every avatar session. The broker keeps a small pool of pre-minted,
+unexpired tokens, hands one out per request (tokens are single use) and
+refills the pool in the background. Upstreams are pluggable: HeyGen's
+`streaming.create_token` in production, a local stub in tests.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import httpx
+
+from metrics import record_cache
+
+HEYGEN_TOKEN_URL = "https://api.heygen.com/v1/streaming.create_token"
+
+
+class TokenUpstream:
+    """Mints one streaming token; returns (token, expires_at as a unix timestamp)"""
+
+    def create_token(self) -> Tuple[str, float]:
+        raise NotImplementedError
+
+
+class HeyGenUpstream(TokenUpstream):
+    def __init__(self, api_key: str, url: str = HEYGEN_TOKEN_URL, token_ttl: float = 900.0, timeout: float = 10.0):
+        self.api_key = api_key
+        self.url = url
+        self.token_ttl = token_ttl
+        self.client = httpx.Client(timeout=timeout)
+
+    def create_token(self) -> Tuple[str, float]:
+        response = self.client.post(self.url, headers={"x-api-key": self.api_key, "Content-Type": "application/json"})
+        response.raise_for_status()
+        data = response.json()
+        token = (data.get("data") or {}).get("token") or data.get("token")
+        if not token:
+            raise RuntimeError(f"No token in HeyGen response: {data}")
+        # The response carries no expiry, so assume the configured lifetime from now
+        return token, time.time() + self.token_ttl
+
+
+class StubUpstream(TokenUpstream):
+    """Offline stand-in returning fake tokens after a simulated delay"""
+
+    def __init__(self, latency: float = 0.0, token_ttl: float = 900.0):
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.minted = 0
+
+    def create_token(self) -> Tuple[str, float]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.minted += 1
+        return f"stub-token-{uuid.uuid4().hex}", time.time() + self.token_ttl
+
+
+def load_upstream(name: str, api_key: Optional[str], token_ttl: float) -> Optional[TokenUpstream]:
+    """Upstream for HEYGEN_TOKEN_UPSTREAM; None when HeyGen is selected but no API key is set"""
+    if name == "stub":
+        return StubUpstream(token_ttl=token_ttl)
+    if name != "heygen":
+        raise ValueError(f"Unknown HEYGEN_TOKEN_UPSTREAM '{name}', expected 'heygen' or 'stub'")
+    if not api_key:
+        return None
+    return HeyGenUpstream(api_key, token_ttl=token_ttl)
+
+
+class TokenBroker:
+    """Pool of pre-minted streaming tokens with background refill"""
+
+    def __init__(self, upstream: TokenUpstream, pool_size: int = 2, min_remaining: float = 120.0,
+                 refill_interval: float = 30.0):
+        self.upstream = upstream
+        self.pool_size = pool_size
+        # Tokens closer than this to expiry aren't handed out; a session must have time to start
+        self.min_remaining = min_remaining
+        self.refill_interval = refill_interval
+        self.stats = {"minted": 0, "served_from_pool": 0, "minted_on_demand": 0, "expired": 0, "errors": 0}
+        self._pool: Deque[Tuple[str, float]] = deque()
+        self._refill_needed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _drop_expiring(self):
+        cutoff = time.time() + self.min_remaining
+        while self._pool and self._pool[0][1] <= cutoff:
+            self._pool.popleft()
+            self.stats["expired"] += 1
+
+    async def _mint(self) -> Tuple[str, float]:
+        try:
+            token = await asyncio.get_running_loop().run_in_executor(None, self.upstream.create_token)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self.stats["minted"] += 1
+        return token
+
+    async def get_token(self) -> Dict[str, object]:
+        """Hand out a token, from the pool when possible"""
+        self._drop_expiring()
+        pooled = bool(self._pool)
+        record_cache("heygen_token_pool", pooled)
+        if pooled:
+            token, expires_at = self._pool.popleft()
+            self.stats["served_from_pool"] += 1
+        else:
+            token, expires_at = await self._mint()
+            self.stats["minted_on_demand"] += 1
+        if self._refill_needed is not None:
+            self._refill_needed.set()
+        return {"token": token, "expires_at": expires_at, "pooled": pooled}
+
+    async def refill(self):
+        """Top the pool up to pool_size with fresh tokens"""
+        self._drop_expiring()
+        while len(self._pool) < self.pool_size:
+            token = await self._mint()
+            self._pool.append(token)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refill()
+            except Exception as e:
+                print(f"HeyGen token refill failed: {e}")
+            try:
+                # Wake up when a token is taken, or periodically to replace expiring ones
+                await asyncio.wait_for(self._refill_needed.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refill_needed.clear()
+
+    def start(self):
+        """Start refilling on the running event loop"""
+        if self._task is None:
+            self._refill_needed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+
+def create_token_broker() -> Optional[TokenBroker]:
+    """TokenBroker configured from the environment, or None when no upstream is available.
+
+    Reads HEYGEN_API_KEY, HEYGEN_TOKEN_UPSTREAM (heygen | stub), HEYGEN_TOKEN_POOL_SIZE,
+    HEYGEN_TOKEN_TTL and HEYGEN_TOKEN_MIN_REMAINING.
+    """
+    upstream = load_upstream(
+        os.getenv("HEYGEN_TOKEN_UPSTREAM", "heygen"),
+        os.getenv("HEYGEN_API_KEY"),
+        float(os.getenv("HEYGEN_TOKEN_TTL", "900")),
+    )
+    if upstream is None:
+        return None
+    return TokenBroker(
+        upstream,
+        pool_size=int(os.getenv("HEYGEN_TOKEN_POOL_SIZE", "2")),
+        min_remaining=float(os.getenv("HEYGEN_TOKEN_MIN_REMAINING", "120")),
+    )
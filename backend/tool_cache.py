@@ -0,0 +1,139 @@
+"""
+Result cache for agent tools.
+
+Each tool declares a ToolPolicy: pure tools are cached for `ttl` seconds
+under a key built from their normalized arguments and labelled with tags;
+mutating tools are never cached and instead invalidate the tags their
+arguments touch (e.g. booking a slot invalidates availability for that date).
+Tools without a policy are passed through untouched. Tools report failures
+as ToolFailure strings, which reach the model like any result but are never
+cached.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from metrics import record_cache
+
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "5000"))
+
+TagsFunc = Callable[[dict], List[str]]
+
+
+@dataclass
+class ToolPolicy:
+    """How results of one tool are cached"""
+    pure: bool
+    ttl: float = 60.0
+    # Tags attached to a cached result (pure tools) or invalidated by a call (mutating tools)
+    tags: Optional[TagsFunc] = None
+
+
+class ToolFailure(str):
+    """A tool result describing a failure (e.g. a shed or failed retrieval); not cached"""
+
+
+def normalize_args(args: dict) -> str:
+    """Stable cache key for tool arguments: sorted keys, empty values dropped, strings case/whitespace-folded"""
+    def normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return " ".join(value.split()).lower().rstrip("?.! ")
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items() if v not in (None, "")}
+        if isinstance(value, list):
+            return [normalize(v) for v in value]
+        return value
+
+    return json.dumps(normalize(args), sort_keys=True)
+
+
+class ToolCache:
+    """TTL cache of pure tool results with tag-based invalidation"""
+
+    def __init__(self, policies: Dict[str, ToolPolicy], max_entries: int = TOOL_CACHE_MAX_ENTRIES,
+                 enabled: bool = TOOL_CACHE_ENABLED):
+        self.policies = policies
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, List[str]]]" = OrderedDict()
+        self._tag_index: Dict[str, Set[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result, _ = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def _put(self, key: Tuple[str, str], result: str, ttl: float, tags: List[str]):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, result, tags)
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[str, str]):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every cached result carrying any of the tags; returns how many were dropped"""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tag_index.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    async def call(self, name: str, args: dict, func: Callable[[], Awaitable[str]]) -> str:
+        """Run a tool through its policy"""
+        policy = self.policies.get(name)
+        if policy is None or not self.enabled:
+            return await func()
+
+        if not policy.pure:
+            try:
+                return await func()
+            finally:
+                if policy.tags:
+                    self.invalidate(*policy.tags(args))
+
+        key = (name, normalize_args(args))
+        cached = self._get(key)
+        record_cache(f"tool:{name}", cached is not None)
+        if cached is not None:
+            return cached
+
+        result = await func()
+        if not isinstance(result, ToolFailure):
+            self._put(key, result, policy.ttl, policy.tags(args) if policy.tags else [])
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,208 @@
+"""
+Lightweight request tracing.
+
+Spans follow the OpenTelemetry data model (trace/span ids, parent links,
+nanosecond timestamps, attributes, status) and are exported as OTLP-style
+JSON, so they can be loaded into any OTel-compatible tool for offline
+analysis. Incoming W3C `traceparent` headers are continued.
+
+    TRACE_EXPORTER=memory   # keep the last TRACE_MEMORY_SPANS spans in memory (default)
+    TRACE_EXPORTER=file     # append one JSON span per line to TRACE_FILE
+    TRACE_EXPORTER=none     # disable tracing
+"""
+
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """A single timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self.status = "UNSET"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status = "ERROR"
+        self.status_message = str(error)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time_unix_nano or time.time_ns()
+        return (end - self.start_time_unix_nano) / 1e6
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP JSON representation of the span"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_time_unix_nano),
+            "endTimeUnixNano": str(self.end_time_unix_nano or ""),
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent spans in memory, queryable by trace id"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s for s in self.spans if s["traceId"] == trace_id]
+
+
+class FileSpanExporter:
+    """Appends finished spans as JSON lines to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        spans = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if trace_id in line:
+                        span = json.loads(line)
+                        if span["traceId"] == trace_id:
+                            spans.append(span)
+        except OSError:
+            pass
+        return spans
+
+
+def _create_exporter():
+    kind = os.getenv("TRACE_EXPORTER", "memory")
+    if kind == "none":
+        return None
+    if kind == "file":
+        return FileSpanExporter(os.getenv("TRACE_FILE", "./traces.jsonl"))
+    return InMemorySpanExporter(int(os.getenv("TRACE_MEMORY_SPANS", "10000")))
+
+
+_UNSET = object()
+_exporter = _UNSET
+
+
+def get_exporter():
+    """Exporter selected by TRACE_EXPORTER (created on first use, after .env is loaded)"""
+    global _exporter
+    if _exporter is _UNSET:
+        _exporter = _create_exporter()
+    return _exporter
+
+
+def set_exporter(exporter):
+    """Replace the span exporter (None disables tracing)"""
+    global _exporter
+    _exporter = exporter
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_span.get()
+    return active.trace_id if active else None
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, **attributes):
+    """Run a block inside a span; nested calls become child spans.
+
+    `traceparent` (W3C header value) continues a trace started upstream when
+    there is no active span.
+    """
+    exporter = get_exporter()
+    if exporter is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_span_id = parent.trace_id, parent.span_id
+    else:
+        match = _TRACEPARENT_RE.match((traceparent or "").strip().lower())
+        if match:
+            trace_id, parent_span_id = match.group(1), match.group(2)
+        else:
+            trace_id, parent_span_id = secrets.token_hex(16), None
+
+    active = Span(name, trace_id, parent_span_id, attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.set_error(e)
+        raise
+    finally:
+        active.end_time_unix_nano = time.time_ns()
+        _current_span.reset(token)
+        try:
+            exporter.export(active)
+        except Exception as e:
+            print(f"Span export failed: {e}")
+
+
+def get_trace(trace_id: str) -> List[Dict[str, Any]]:
+    """Spans recorded for a trace, ordered by start time"""
+    exporter = get_exporter()
+    if exporter is None:
+        return []
+    return sorted(exporter.get_trace(trace_id), key=lambda s: int(s["startTimeUnixNano"]))
@@ -0,0 +1,143 @@
+"""
+Polling watcher for DATA_DIR that drives incremental re-indexing.
+
+Every `interval` seconds the directory is snapshotted as {path: (mtime, size)}.
+Changes are collected until the directory has been quiet for `debounce`
+seconds (editors and copies write files in several steps), then the changed
+and removed paths are handed to `on_change` in a worker thread so indexing
+never blocks request handling. `on_change` may return the changed paths that
+failed to load; each is retried after `debounce`, up to `max_retries` times
+until the file changes again.
+"""
+
+import asyncio
+import glob
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def snapshot(directory: str, patterns: List[str]) -> Snapshot:
+    """mtime and size of every file in `directory` matching `patterns`"""
+    files = {}
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(directory, pattern)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted between glob and stat
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> Tuple[List[str], List[str]]:
+    """Paths added or modified, and paths removed"""
+    changed = [path for path, state in new.items() if old.get(path) != state]
+    removed = [path for path in old if path not in new]
+    return sorted(changed), sorted(removed)
+
+
+class DataDirWatcher:
+    """Watches a directory and reports debounced batches of changed files"""
+
+    def __init__(self, directory: str, patterns: List[str],
+                 on_change: Callable[[List[str], List[str]], Optional[List[str]]],
+                 interval: float = 1.0, debounce: float = 2.0, max_retries: int = 3):
+        self.directory = directory
+        self.patterns = patterns
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.max_retries = max_retries
+        self.stats = {"batches": 0, "files_changed": 0, "files_removed": 0, "last_reindex_at": None,
+                      "last_reindex_ms": None, "errors": 0, "files_failed": 0}
+        self._snapshot: Snapshot = {}
+        self._pending_changed: set = set()
+        self._pending_removed: set = set()
+        self._retries: Dict[str, int] = {}
+        self._last_change = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def poll(self) -> Optional[Tuple[List[str], List[str]]]:
+        """Scan once; returns a batch once changes have been quiet for `debounce` seconds"""
+        current = snapshot(self.directory, self.patterns)
+        changed, removed = diff_snapshots(self._snapshot, current)
+        self._snapshot = current
+        now = time.monotonic()
+
+        if changed or removed:
+            for path in changed + removed:
+                self._retries.pop(path, None)
+            self._pending_changed.update(changed)
+            self._pending_changed.difference_update(removed)
+            self._pending_removed.update(removed)
+            self._pending_removed.difference_update(changed)
+            self._last_change = now
+            return None
+
+        if (self._pending_changed or self._pending_removed) and now - self._last_change >= self.debounce:
+            batch = sorted(self._pending_changed), sorted(self._pending_removed)
+            self._pending_changed, self._pending_removed = set(), set()
+            return batch
+        return None
+
+    def _requeue(self, changed: List[str], removed: List[str]):
+        """Put a failed batch back, unless the files changed again since; it is retried after `debounce`"""
+        self._pending_changed.update(path for path in changed if path not in self._pending_removed)
+        self._pending_removed.update(path for path in removed if path not in self._pending_changed)
+        self._last_change = time.monotonic()
+
+    def _reindex(self, changed: List[str], removed: List[str]):
+        start = time.perf_counter()
+        try:
+            failed = self.on_change(changed, removed) or []
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Re-indexing {len(changed) + len(removed)} files failed: {e}")
+            self._requeue(changed, removed)
+            return
+        if failed:
+            self.stats["files_failed"] += len(failed)
+            for path in failed:
+                self._retries[path] = self._retries.get(path, 0) + 1
+            retry = [path for path in failed if self._retries[path] <= self.max_retries]
+            print(f"Re-indexing {len(failed)} files failed to load; retrying {len(retry)}")
+            self._requeue(retry, [])
+        for path in changed:
+            if path not in failed:
+                self._retries.pop(path, None)
+        self.stats["batches"] += 1
+        self.stats["files_changed"] += len(changed)
+        self.stats["files_removed"] += len(removed)
+        self.stats["last_reindex_at"] = time.time()
+        self.stats["last_reindex_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # The current contents are already indexed; only react to what changes from here on
+        self._snapshot = await loop.run_in_executor(None, snapshot, self.directory, self.patterns)
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                batch = await loop.run_in_executor(None, self.poll)
+                if batch:
+                    await loop.run_in_executor(None, self._reindex, *batch)
+            except Exception as e:
+                print(f"Watching {self.directory} failed: {e}")
+
+    def start(self):
+        """Start watching on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -3,6 +3,8 @@ import { NextRequest, NextResponse } from 'next/server';
 interface AgentRequest {
   message: string;
   thread_id?: string;
+  idempotency_key?: string;
+  priority?: 'voice' | 'text';
 }
 
 interface AgentResponse {
@@ -14,7 +16,7 @@ interface AgentResponse {
 export async function POST(request: NextRequest) {
   try {
     const body: AgentRequest = await request.json();
-    const { message, thread_id } = body;
+    const { message, thread_id, idempotency_key, priority } = body;
 
     console.log('🎤 Agent API received request:', { message: message?.substring(0, 50) + '...', thread_id });
 
@@ -32,17 +34,39 @@ export async function POST(request: NextRequest) {
     console.log('🔄 Forwarding request to backend:', backendUrl);
     console.log('📝 Full message:', message);
     
+    // The backend rate-limits per client, so pass on who the caller is: append the peer to the
+    // chain (the backend only believes hops added by its TRUSTED_PROXIES)
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    const forwardedFor = [request.headers.get('x-forwarded-for'), request.ip].filter(Boolean).join(', ');
+    if (forwardedFor) {
+      headers['X-Forwarded-For'] = forwardedFor;
+    }
+
     // Forward the request to the Python backend
     const response = await fetch(`${backendUrl}/ask`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
+      headers,
       body: JSON.stringify({
-        question: message
+        question: message,
+        priority: priority ?? 'text',
+        // Voice retries of the same utterance reuse the key, so the backend answers them once
+        idempotency_key
       }),
     });
 
+    if (response.status === 429 || response.status === 503) {
+      // Rate-limited or shed under load: have the avatar ask the user to retry rather than failing the turn
+      console.warn('⏳ Backend busy:', response.status, response.headers.get('Retry-After'));
+      return NextResponse.json(
+        {
+          reply: "I'm handling a lot of requests right now. Please give me a moment and ask again.",
+          thread_id: thread_id || `thread_${Date.now()}`,
+          actions_performed: []
+        },
+        { status: 200, headers: { 'Retry-After': response.headers.get('Retry-After') ?? '1' } }
+      );
+    }
+
     if (!response.ok) {
       console.error('❌ Backend request failed:', response.status, response.statusText);
       const errorText = await response.text();
@@ -15,6 +15,7 @@ import { useStreamingAvatarSession } from '@/lib/hooks/useStreamingAvatarSession
 import { useVoiceChatAgent } from '@/lib/hooks/useVoiceChatAgent';
 import AvatarVideo from '@/components/AvatarVideo';
 import ChatInterface from '@/components/ChatInterface';
+import { fetchBrokerToken } from '@/lib/heygenToken';
 
 // Configuration from environment variables
 const HEYGEN_API_KEY = process.env.NEXT_PUBLIC_HEYGEN_API_KEY;
@@ -58,8 +59,14 @@ async function fetchAccessToken() {
       return 'demo-token-for-testing';
     }
     
+    // Prefer the backend broker: it hands out pre-minted tokens and keeps the API key server-side
+    const brokerToken = await fetchBrokerToken();
+    if (brokerToken) {
+      return brokerToken;
+    }
+    
     if (!HEYGEN_API_KEY || HEYGEN_API_KEY === 'your_heygen_api_key_here') {
-      throw new Error('HeyGen API key not configured. Please add your API key to .env.local');
+      throw new Error('HeyGen API key not configured. Set HEYGEN_API_KEY for the backend or add your API key to .env.local');
     }
     
     // Try the newer API endpoint first
@@ -13,6 +13,7 @@ import { useStreamingAvatarSession } from '@/lib/hooks/useStreamingAvatarSession
 import { useVoiceChatAgent } from '@/lib/hooks/useVoiceChatAgent';
 import { validator, SystemHealth, getSystemStatus } from '@/lib/validation';
 import AvatarVideo from './AvatarVideo';
+import { fetchBrokerToken } from '@/lib/heygenToken';
 
 type VoiceState = 'idle' | 'starting' | 'ready' | 'listening' | 'processing' | 'speaking' | 'error';
 
@@ -48,8 +49,14 @@ async function fetchAccessToken() {
       return 'demo-token-for-testing';
     }
     
+    // Prefer the backend broker: it hands out pre-minted tokens and keeps the API key server-side
+    const brokerToken = await fetchBrokerToken();
+    if (brokerToken) {
+      return brokerToken;
+    }
+    
     if (!HEYGEN_API_KEY || HEYGEN_API_KEY === 'your_heygen_api_key_here') {
-      throw new Error('HeyGen API key not configured. Please add your API key to .env.local');
+      throw new Error('HeyGen API key not configured. Set HEYGEN_API_KEY for the backend or add your API key to .env.local');
     }
     
     const response = await fetch('https://api.heygen.com/v1/streaming.create_token', {
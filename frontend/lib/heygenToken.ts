@@ -0,0 +1,29 @@
+/**
+ * HeyGen streaming tokens from the backend token broker.
+ * The backend keeps a pool of pre-minted tokens, so this is usually a local
+ * round trip instead of a call to HeyGen.
+ */
+
+const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
+
+/**
+ * Get a token from the backend broker (POST /heygen/token).
+ * Returns null when the broker is unavailable so callers can fall back.
+ */
+export async function fetchBrokerToken(): Promise<string | null> {
+  try {
+    const response = await fetch(`${BACKEND_URL}/heygen/token`, { method: 'POST' });
+
+    if (!response.ok) {
+      console.warn('🔑 Token broker unavailable:', response.status, response.statusText);
+      return null;
+    }
+
+    const data = await response.json();
+    console.log('🔑 Token from broker', data.pooled ? '(pre-minted)' : '(minted on demand)');
+    return data.token || null;
+  } catch (error) {
+    console.warn('🔑 Token broker request failed:', error);
+    return null;
+  }
+}
@@ -4,6 +4,31 @@ import { StreamingEvents, TaskType, TaskMode } from "@heygen/streaming-avatar";
 import { useStreamingAvatarContext, MessageSender } from "../streaming-context";
 import { useVoiceChat } from "./useVoiceChat";
 
+const AGENT_REQUEST_TIMEOUT_MS = 20000;
+const AGENT_REQUEST_ATTEMPTS = 2;
+
+// Post a voice turn, retrying after a network error or timeout. The retry carries the same
+// idempotency key, so if the first attempt did reach the backend both get one answer
+async function postAgentMessage(body: Record<string, unknown>): Promise<Response> {
+  for (let attempt = 1; ; attempt++) {
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), AGENT_REQUEST_TIMEOUT_MS);
+    try {
+      return await fetch('/api/agent', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body),
+        signal: controller.signal
+      });
+    } catch (error) {
+      if (attempt >= AGENT_REQUEST_ATTEMPTS) throw error;
+      console.warn('🎤 Agent request failed, retrying:', error);
+    } finally {
+      clearTimeout(timer);
+    }
+  }
+}
+
 export const useVoiceChatAgent = () => {
   const { avatarRef, setMessages } = useStreamingAvatarContext();
   const { 
@@ -54,14 +79,13 @@ export const useVoiceChatAgent = () => {
         return;
       }
       
-      // Send to your agent backend
-      const response = await fetch('/api/agent', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ 
-          message,
-          thread_id: threadId 
-        })
+      // Send to your agent backend. The key is per utterance: only retries of this very request share it
+      const response = await postAgentMessage({
+        message,
+        thread_id: threadId,
+        idempotency_key: `voice-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
+        // Voice turns are scheduled ahead of text chat and ingestion on the backend
+        priority: 'voice'
       });
       
       if (!response.ok) {